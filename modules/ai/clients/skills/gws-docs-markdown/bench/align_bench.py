@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""align_bench — scaling of md2gdoc.align_segments with document size.
+
+Builds a synthetic tab of N top-level segments (headings, paragraphs, list
+items; every paragraph text distinct, with a share of repeated boilerplate
+lines), applies a fixed fraction of local edits — rewording, inserts,
+deletes and a few moved blocks — and times align_segments on the pair. The
+per-segment cost column should stay roughly flat as N grows; a quadratic
+alignment shows up as a cost that grows with N.
+
+Usage:
+    python3 align_bench.py [--sizes 1000,2000,5000,10000,20000]
+                           [--edit-rate 0.05] [--repeat 3] [--seed 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "skill"))
+
+import md2gdoc  # noqa: E402
+from corpus import _WORDS  # noqa: E402
+
+_BOILERPLATE = ("See the runbook for details.", "TODO", "---")
+
+
+def _segment(kind: str, n: int, text: str) -> md2gdoc.Segment:
+    return md2gdoc.Segment(kind=kind, path=(kind, str(n)), text=text, md_start=0, md_end=0)
+
+
+def make_pair(size: int, edit_rate: float, seed: int) -> tuple[list, list]:
+    """Return (old, new) segment lists of ~*size* segments with local edits."""
+    rng = random.Random(seed)
+    blocks: list[tuple[str, str]] = []
+    for i in range(size):
+        roll = rng.random()
+        if roll < 0.05:
+            blocks.append(("paragraph", rng.choice(_BOILERPLATE)))
+        elif roll < 0.15:
+            blocks.append(("heading", f"{' '.join(rng.choices(_WORDS, k=3)).title()} {i}"))
+        elif roll < 0.35:
+            blocks.append(("list-item", f"{' '.join(rng.choices(_WORDS, k=8))} [[{i:05d}-item]]"))
+        else:
+            blocks.append(("paragraph", " ".join(rng.choices(_WORDS, k=rng.randint(20, 60)))))
+
+    edited = list(blocks)
+    for _ in range(int(size * edit_rate)):
+        at = rng.randrange(len(edited))
+        roll = rng.random()
+        kind, text = edited[at]
+        if roll < 0.5:
+            words = text.split(" ")
+            words[rng.randrange(len(words))] = "revised"
+            edited[at] = (kind, " ".join(words))
+        elif roll < 0.7:
+            edited.insert(at, ("paragraph", " ".join(rng.choices(_WORDS, k=30))))
+        elif roll < 0.9:
+            del edited[at]
+        else:
+            edited.insert(rng.randrange(len(edited)), edited.pop(at))
+
+    old = [_segment(k, i, t) for i, (k, t) in enumerate(blocks)]
+    new = [_segment(k, i, t) for i, (k, t) in enumerate(edited)]
+    return old, new
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time align_segments against tab size.")
+    parser.add_argument("--sizes", default="1000,2000,5000,10000,20000",
+                        help="Comma-separated segment counts.")
+    parser.add_argument("--edit-rate", type=float, default=0.05,
+                        help="Local edits per segment.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Timing repetitions; the best is kept.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'segments':>9} {'edits':>6} {'matches':>8} {'align ms':>9} {'us/seg':>7}")
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        old, new = make_pair(size, args.edit_rate, args.seed)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.process_time()
+            matches = md2gdoc.align_segments(old, new)
+            best = min(best, time.process_time() - start)
+        print(f"{size:>9} {int(size * args.edit_rate):>6} {len(matches):>8} "
+              f"{best * 1000:>9.1f} {best / size * 1e6:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""corpus — deterministic synthetic markdown for md2gdoc benchmarks.
+
+Generates a set of cross-linked markdown files of a target size with a
+configurable mix of block features. The same seed always yields the same
+bytes, so benchmark numbers are comparable across runs.
+
+Usage:
+    python3 corpus.py --out DIR [--files 6] [--size 24000] [--seed 1]
+                      [--mix heading=3,paragraph=8,table=1] [--astral 0.02]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+
+_WORDS = (
+    "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima "
+    "mike november oscar papa quebec romeo sierra tango uniform victor whiskey "
+    "xray yankee zulu service cluster deploy rollout latency budget quota "
+    "replica shard index request response cache token window schedule review "
+    "owner runbook incident metric alert dashboard pipeline artifact release"
+).split()
+
+# Astral-plane characters take two UTF-16 code units in the Docs index space.
+_ASTRAL = ["😀", "🚀", "🔥", "✅", "𝑥", "𝔸", "🧪", "📦", "🎯", "𐍈"]
+
+_CALLOUTS = ("note", "tip", "warning", "important", "info")
+
+_LANGS = ("python", "bash", "yaml", "json", "")
+
+# Block kind -> relative weight.
+DEFAULT_MIX: dict[str, float] = {
+    "heading": 3,
+    "paragraph": 8,
+    "list": 2,
+    "nested_list": 1,
+    "task_list": 1,
+    "table": 1,
+    "fence": 1,
+    "callout": 1,
+    "quote": 1,
+    "hr": 0.3,
+}
+
+
+@dataclass
+class CorpusSpec:
+    files: int = 6
+    # Target size of each file in bytes (UTF-8).
+    size: int = 24_000
+    seed: int = 1
+    mix: dict[str, float] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    # Fraction of words replaced by astral-plane characters.
+    astral: float = 0.0
+    # Fraction of paragraphs/list items that carry a wikilink.
+    wikilinks: float = 0.3
+    table_cols: tuple[int, int] = (3, 6)
+    table_rows: tuple[int, int] = (3, 10)
+    paragraph_words: tuple[int, int] = (40, 160)
+
+
+class _Writer:
+    def __init__(self, spec: CorpusSpec, rng: random.Random, stems: list[str],
+                 headings: dict[str, list[str]]) -> None:
+        self.spec = spec
+        self.rng = rng
+        self.stems = stems
+        self.headings = headings
+
+    def word(self) -> str:
+        if self.spec.astral and self.rng.random() < self.spec.astral:
+            return self.rng.choice(_ASTRAL)
+        return self.rng.choice(_WORDS)
+
+    def words(self, n: int) -> str:
+        return " ".join(self.word() for _ in range(n))
+
+    def wikilink(self) -> str:
+        stem = self.rng.choice(self.stems)
+        heads = self.headings.get(stem) or []
+        if heads and self.rng.random() < 0.5:
+            return f"[[{stem}#{self.rng.choice(heads)}]]"
+        return f"[[{stem}]]"
+
+    def inline(self, n: int) -> str:
+        """*n* words with sprinkled emphasis, code spans, links and wikilinks."""
+        parts: list[str] = []
+        i = 0
+        while i < n:
+            roll = self.rng.random()
+            k = self.rng.randint(1, 3)
+            text = self.words(k)
+            if roll < 0.06:
+                parts.append(f"**{text}**")
+            elif roll < 0.10:
+                parts.append(f"*{text}*")
+            elif roll < 0.13:
+                parts.append(f"`{self.rng.choice(_WORDS)}`")
+            elif roll < 0.15:
+                parts.append(f"[{text}](https://example.com/{self.rng.choice(_WORDS)})")
+            elif roll < 0.16:
+                parts.append(f"~~{text}~~")
+            else:
+                parts.append(text)
+            i += k
+        if self.rng.random() < self.spec.wikilinks:
+            parts.insert(self.rng.randint(0, len(parts)), self.wikilink())
+        return " ".join(parts)
+
+    def block(self, kind: str, level_hint: int) -> str:
+        rng = self.rng
+        if kind == "heading":
+            level = min(4, max(2, level_hint + rng.choice((0, 0, 1))))
+            return f"{'#' * level} {self.words(rng.randint(2, 5)).title()}"
+        if kind == "paragraph":
+            return self.inline(rng.randint(*self.spec.paragraph_words))
+        if kind == "list":
+            marker = rng.choice(("-", "1."))
+            return "\n".join(f"{marker} {self.inline(rng.randint(4, 16))}"
+                             for _ in range(rng.randint(3, 8)))
+        if kind == "nested_list":
+            lines = []
+            depth = 0
+            for _ in range(rng.randint(4, 10)):
+                depth = max(0, min(2, depth + rng.choice((-1, 0, 1))))
+                lines.append(f"{'  ' * depth}- {self.inline(rng.randint(3, 10))}")
+            return "\n".join(lines)
+        if kind == "task_list":
+            return "\n".join(f"- [{'x' if rng.random() < 0.4 else ' '}] "
+                             f"{self.inline(rng.randint(3, 10))}"
+                             for _ in range(rng.randint(3, 7)))
+        if kind == "table":
+            cols = rng.randint(*self.spec.table_cols)
+            rows = rng.randint(*self.spec.table_rows)
+            header = "| " + " | ".join(self.words(rng.randint(1, 2)).title()
+                                       for _ in range(cols)) + " |"
+            sep = "|" + "|".join("---" for _ in range(cols)) + "|"
+            body = ["| " + " | ".join(
+                self.inline(rng.randint(1, 4)).replace("|", "/") for _ in range(cols)) + " |"
+                for _ in range(rows)]
+            return "\n".join([header, sep, *body])
+        if kind == "fence":
+            lang = rng.choice(_LANGS)
+            lines = [f"{'    ' * rng.randint(0, 2)}{self.rng.choice(_WORDS)} = "
+                     f"{self.rng.choice(_WORDS)}({rng.randint(0, 99)})"
+                     for _ in range(rng.randint(3, 25))]
+            return f"```{lang}\n" + "\n".join(lines) + "\n```"
+        if kind == "callout":
+            return (f"> [!{rng.choice(_CALLOUTS)}] {self.words(rng.randint(1, 3)).title()}\n"
+                    f"> {self.inline(rng.randint(10, 40))}")
+        if kind == "quote":
+            return f"> {self.inline(rng.randint(10, 50))}"
+        if kind == "hr":
+            return "---"
+        raise ValueError(f"unknown block kind: {kind}")
+
+
+def _slug(text: str) -> str:
+    return "-".join("".join(c for c in w.lower() if c.isalnum()) for w in text.split())
+
+
+def generate(spec: CorpusSpec) -> dict[str, str]:
+    """Return {stem: markdown} for *spec*; deterministic in spec.seed."""
+    rng = random.Random(spec.seed)
+    stems = [f"{i:02d}-{rng.choice(_WORDS)}" for i in range(spec.files)]
+    kinds = [k for k, w in spec.mix.items() if w > 0]
+    weights = [spec.mix[k] for k in kinds]
+    # Pre-draw one heading set per file so wikilinks can target headings
+    # that exist anywhere in the corpus.
+    headings: dict[str, list[str]] = {}
+    titles: dict[str, list[str]] = {}
+    for stem in stems:
+        titles[stem] = [" ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 4))).title()
+                        for _ in range(max(2, min(8, spec.size // 2500)))]
+        headings[stem] = [_slug(t) for t in titles[stem]]
+    out: dict[str, str] = {}
+    for stem in stems:
+        writer = _Writer(spec, rng, stems, headings)
+        blocks = [f"# {stem.split('-', 1)[1].title()} Guide"]
+        planned = list(titles[stem])
+        size = len(blocks[0])
+        while size < spec.size:
+            kind = rng.choices(kinds, weights)[0]
+            if kind == "heading" and planned:
+                text = f"## {planned.pop(0)}"
+            else:
+                text = writer.block(kind, 2)
+            blocks.append(text)
+            size += len(text.encode("utf-8")) + 2
+        for title in planned:
+            blocks.append(f"## {title}")
+            blocks.append(writer.block("paragraph", 2))
+        out[stem] = "\n\n".join(blocks) + "\n"
+    return out
+
+
+def write_corpus(spec: CorpusSpec, out_dir: Path) -> list[Path]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for stem, text in generate(spec).items():
+        path = out_dir / f"{stem}.md"
+        path.write_text(text, encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"unknown block kind {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic markdown corpus.")
+    parser.add_argument("--out", required=True, type=Path)
+    parser.add_argument("--files", type=int, default=6)
+    parser.add_argument("--size", type=int, default=24_000, help="Bytes per file.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mix", default="", help="Overrides, e.g. table=4,fence=0.")
+    parser.add_argument("--astral", type=float, default=0.0,
+                        help="Fraction of words replaced by astral-plane characters.")
+    args = parser.parse_args()
+    spec = CorpusSpec(files=args.files, size=args.size, seed=args.seed,
+                      mix=parse_mix(args.mix), astral=args.astral)
+    for path in write_corpus(spec, args.out):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
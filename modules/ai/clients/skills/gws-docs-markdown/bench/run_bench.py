@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""run_bench — md2gdoc performance benchmarks against the offline Docs emulator.
+
+For each scenario a synthetic corpus is generated (see corpus.py) and
+measured in two ways:
+
+- build: `build_requests_from_text` CPU time (best of --repeat), request
+  count and serialized payload bytes as built and as sent after
+  `optimize_requests`, and batchUpdate count, in-process;
+- commands: `create`, `add-tab`, `extract-tab`, `update-tab` and
+  `sync-local` each run as a real md2gdoc subprocess against an in-thread
+  gdocs_fake_server, recording API round trips per method, bytes on the
+  wire, wall time, peak RSS and exit status; then `update-tab` on a file
+  unchanged since its last push and a repeat `create` served from the
+  request plan cache.
+
+Results are written as JSON and compared with bench/baselines.json. A metric
+that grows past its tolerance (round trips and request counts have none)
+fails the run, so e.g. an extra GET per table is caught automatically. Every
+command must succeed: a failed command fails the run whatever the baseline
+says, and --update-baseline refuses to store results with a failure in them.
+A baseline may override DEFAULT_TOLERANCES per metric with a "tolerances"
+object.
+
+Usage:
+    python3 run_bench.py [--scenario NAME ...] [--out results.json]
+                         [--baseline baselines.json] [--update-baseline]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stderr
+from pathlib import Path
+from typing import Any
+
+BENCH_DIR = Path(__file__).resolve().parent
+SKILL_DIR = BENCH_DIR.parent / "skill"
+sys.path.insert(0, str(SKILL_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+import gdocs_fake_server  # noqa: E402
+import md2gdoc  # noqa: E402
+from corpus import DEFAULT_MIX, CorpusSpec, write_corpus  # noqa: E402
+from gdocs_emulator import DocsEmulator  # noqa: E402
+
+SCENARIOS: dict[str, CorpusSpec] = {
+    "small": CorpusSpec(files=2, size=3_000, seed=11),
+    "handbook": CorpusSpec(files=8, size=20_000, seed=12),
+    "wide-tables": CorpusSpec(
+        files=2, size=30_000, seed=13,
+        mix={"heading": 1, "paragraph": 1, "table": 6},
+        table_cols=(8, 12), table_rows=(6, 20)),
+    "fences-lists": CorpusSpec(
+        files=2, size=20_000, seed=14,
+        mix=dict(DEFAULT_MIX, fence=4, nested_list=4, task_list=3, table=0)),
+    "astral": CorpusSpec(files=2, size=8_000, seed=15, astral=0.05),
+    "emoji": CorpusSpec(files=2, size=20_000, seed=16, astral=0.3),
+}
+
+# Relative tolerance per metric name; None = informational only.
+DEFAULT_TOLERANCES: dict[str, float | None] = {
+    "requests": 0.0,
+    "sent_requests": 0.0,
+    "batches": 0.0,
+    "round_trips": 0.0,
+    "documents.get": 0.0,
+    "documents.batchUpdate": 0.0,
+    "documents.create": 0.0,
+    "payload_bytes": 0.02,
+    "sent_bytes": 0.02,
+    "bytes_sent": 0.05,
+    "bytes_received": 0.10,
+    "build_cpu_s": 1.0,
+    "peak_rss_kb": 0.30,
+    "wall_s": None,
+}
+
+
+# ---------------------------------------------------------------------------
+# Measurements
+# ---------------------------------------------------------------------------
+
+
+def measure_build(paths: list[Path], repeat: int) -> dict[str, Any]:
+    """Time build_requests_from_text over the corpus, in-process."""
+    tab_map = {p.stem: f"t.{i}" for i, p in enumerate(paths)}
+    texts = [p.read_text(encoding="utf-8") for p in paths]
+    best = float("inf")
+    built: list[list[dict]] = []
+    for _ in range(repeat):
+        built = []
+        start = time.process_time()
+        for i, text in enumerate(texts):
+            state = md2gdoc.BuildState(tab_id=f"t.{i}", doc_id="bench", tab_map=tab_map)
+            # Table/fence handlers may log; keep the bench output clean.
+            with redirect_stderr(io.StringIO()):
+                md2gdoc.build_requests_from_text(text, state)
+            built.append(state.requests)
+        best = min(best, time.process_time() - start)
+    requests = [r for reqs in built for r in reqs]
+    # What create would send per tab after ordering and optimizing.
+    sent: list[dict] = []
+    for reqs in built:
+        sent.extend(md2gdoc.optimize_requests(md2gdoc._send_order(reqs), fresh_tab=True)[0])
+    scheduler = md2gdoc.ApiScheduler()
+    return {
+        "build_cpu_s": round(best, 4),
+        "requests": len(requests),
+        "payload_bytes": sum(len(json.dumps(r)) for r in requests),
+        "sent_requests": len(sent),
+        "sent_bytes": sum(len(json.dumps(r)) for r in sent),
+        "batches": len(scheduler.batches(sent)),
+    }
+
+
+_PEAK_MARKER = "@@md2gdoc-bench peak_rss_kb "
+
+# Child wrapper: run md2gdoc.py as __main__ and report the process's own peak
+# RSS (VmHWM) on exit. getrusage() is not usable here because Linux carries
+# the parent's high-water mark across fork+exec into ru_maxrss.
+_CHILD = f"""
+import atexit, os, runpy, sys
+def _report():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    sys.stderr.write("\\n{_PEAK_MARKER}" + line.split()[1] + "\\n")
+    except OSError:
+        import resource
+        sys.stderr.write("\\n{_PEAK_MARKER}%d\\n" % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+atexit.register(_report)
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+class CommandRunner:
+    """Runs md2gdoc subprocesses against one in-thread fake server."""
+
+    def __init__(self, workdir: Path) -> None:
+        self.emulator = DocsEmulator()
+        self.server = gdocs_fake_server.serve(emulator=self.emulator)
+        host, port = self.server.server_address[:2]
+        self.workdir = workdir
+        self.env = dict(
+            os.environ,
+            MD2GDOC_API_BASE=f"http://{host}:{port}",
+            MD2GDOC_BACKEND="http",
+            # Pace nothing: the emulator enforces no quota by default and the
+            # bench measures round trips, not quota waits.
+            MD2GDOC_READS_PER_MINUTE="1000000",
+            MD2GDOC_WRITES_PER_MINUTE="1000000",
+            # Request plans are cached per scenario, never across runs.
+            XDG_CACHE_HOME=str(workdir / ".cache"),
+        )
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run(self, *argv: str) -> tuple[dict[str, Any], str]:
+        stats = self.emulator.stats
+        calls_before = dict(stats.calls)
+        bytes_in, bytes_out = stats.bytes_in, stats.bytes_out
+        cmd = [sys.executable, "-c", _CHILD, str(SKILL_DIR / "md2gdoc.py"), *argv]
+        started = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=self.workdir, env=self.env, text=True,
+                              capture_output=True)
+        wall = time.perf_counter() - started
+        stdout, stderr = proc.stdout, proc.stderr
+        peak_kb = 0
+        marker = stderr.rfind(_PEAK_MARKER)
+        if marker != -1:
+            peak_kb = int(stderr[marker + len(_PEAK_MARKER):].split()[0])
+            stderr = stderr[:marker]
+        calls = {k: v - calls_before.get(k, 0) for k, v in stats.calls.items()
+                 if v - calls_before.get(k, 0)}
+        result = {
+            "ok": proc.returncode == 0,
+            "exit": proc.returncode,
+            "round_trips": sum(calls.values()),
+            **{m: calls.get(m, 0) for m in ("documents.create", "documents.get",
+                                            "documents.batchUpdate")},
+            "bytes_sent": stats.bytes_in - bytes_in,
+            "bytes_received": stats.bytes_out - bytes_out,
+            "wall_s": round(wall, 3),
+            "peak_rss_kb": peak_kb,
+        }
+        if proc.returncode != 0:
+            result["stderr_tail"] = stderr.strip().splitlines()[-3:]
+            result["failure"] = failure_class(stderr)
+        return result, stdout
+
+
+def failure_class(stderr: str) -> str:
+    """The last stderr line of a failed command, numbers masked.
+
+    Indices and sizes in an error shift with every corpus change; the
+    message around them, and the HTTP status an API error starts with,
+    say what went wrong.
+    """
+    lines = [line.strip() for line in stderr.splitlines() if line.strip()]
+    if not lines:
+        return ""
+    status, message = re.match(r"(\d{3}: )?(.*)", lines[-1]).groups()
+    return (status or "") + re.sub(r"\d+", "N", message)
+
+
+def _edit_for_update(path: Path) -> None:
+    """Deterministic local edit: reword one paragraph and append another."""
+    text = path.read_text(encoding="utf-8")
+    blocks = text.split("\n\n")
+    for i in range(len(blocks) // 2, len(blocks)):
+        block = blocks[i]
+        if block and block[0].isalpha() and " " in block:
+            words = block.split(" ")
+            words[len(words) // 2] = "revised"
+            blocks[i] = " ".join(words)
+            break
+    blocks.append("A closing paragraph added by the benchmark edit.\n")
+    path.write_text("\n\n".join(blocks), encoding="utf-8")
+
+
+def measure_commands(paths: list[Path], workdir: Path) -> dict[str, Any]:
+    runner = CommandRunner(workdir)
+    results: dict[str, Any] = {}
+    try:
+        files = [str(p) for p in paths]
+        create, stdout = runner.run("create", *files[:-1])
+        results["create"] = create
+        doc_id = stdout.strip().splitlines()[-1] if create["ok"] and stdout.strip() else ""
+        if not doc_id:
+            return results
+        results["add-tab"], _ = runner.run("add-tab", "--document", doc_id, files[-1])
+        fm, _ = md2gdoc.parse(paths[0].read_text(encoding="utf-8"))
+        tab_id = str(fm.get("gdoc_tab_id", "t.0"))
+        results["extract-tab"], _ = runner.run("extract-tab", "--document", doc_id,
+                                               "--tab", tab_id)
+        original = paths[0].read_text(encoding="utf-8")
+        _edit_for_update(paths[0])
+        results["update-tab"], _ = runner.run(
+            "update-tab", "--document", doc_id, "--tab", tab_id,
+            "--files-dir", str(paths[0].parent), files[0])
+        results["sync-local"], _ = runner.run(
+            "sync-local", "--document", doc_id, "--tab", tab_id,
+            "--files-dir", str(paths[0].parent), files[0])
+        # Unchanged since add-tab pushed it: skipped on gdoc_pushed_hash.
+        fm, _ = md2gdoc.parse(paths[-1].read_text(encoding="utf-8"))
+        results["update-tab-unchanged"], _ = runner.run(
+            "update-tab", "--document", doc_id, "--tab", str(fm.get("gdoc_tab_id", "")),
+            files[-1])
+        # Same bodies as the first create: every tab comes from the plan cache.
+        paths[0].write_text(original, encoding="utf-8")
+        results["create-cached"], _ = runner.run("create", *files[:-1])
+    finally:
+        runner.close()
+    return results
+
+
+def run_scenario(name: str, spec: CorpusSpec, repeat: int) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix=f"md2gdoc-bench-{name}-") as tmp:
+        paths = write_corpus(spec, Path(tmp))
+        corpus = {
+            "files": len(paths),
+            "bytes": sum(p.stat().st_size for p in paths),
+            "astral": spec.astral,
+        }
+        build = measure_build(paths, repeat)
+        commands = measure_commands(paths, Path(tmp))
+    return {"corpus": corpus, "build": build, "commands": commands}
+
+
+# ---------------------------------------------------------------------------
+# Baselines
+# ---------------------------------------------------------------------------
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any]) -> tuple[list[str], list[str]]:
+    """Return (regressions, improvements) of *results* against *baseline*."""
+    tolerances = dict(DEFAULT_TOLERANCES, **baseline.get("tolerances", {}))
+    regressions: list[str] = []
+    improvements: list[str] = []
+    for scen, data in results["scenarios"].items():
+        # A scenario without a baseline is still checked for failures
+        base = baseline.get("scenarios", {}).get(scen, {})
+        sections = [("build", data["build"], base.get("build", {}))]
+        sections += [(f"commands.{cmd}", m, base.get("commands", {}).get(cmd, {}))
+                     for cmd, m in data["commands"].items()]
+        for section, metrics, base_metrics in sections:
+            if metrics.get("ok") is False:
+                regressions.append(f"{scen}.{section}: failed with exit {metrics['exit']} "
+                                   f"({metrics.get('failure', '')})")
+                continue
+            for key, value in metrics.items():
+                tol = tolerances.get(key)
+                old = base_metrics.get(key)
+                if tol is None or not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                    continue
+                if isinstance(value, bool):
+                    continue
+                line = f"{scen}.{section}.{key}: {old} -> {value}"
+                if value > old * (1 + tol) and value - old > 1e-3:
+                    regressions.append(line)
+                elif value < old * (1 - max(tol, 0.05)):
+                    improvements.append(line)
+    return regressions, improvements
+
+
+def failed_commands(results: dict[str, Any]) -> list[str]:
+    """The commands in *results* that did not exit 0, as scenario.command."""
+    return [f"{scen}.{cmd}" for scen, data in results["scenarios"].items()
+            for cmd, m in data["commands"].items() if not m["ok"]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark md2gdoc against the Docs emulator.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Run only these scenarios (repeatable; default all).")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Build timing repetitions; the best is kept.")
+    parser.add_argument("--out", type=Path, help="Write results JSON here.")
+    parser.add_argument("--baseline", type=Path, default=BENCH_DIR / "baselines.json")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Store these results as the new baseline.")
+    args = parser.parse_args()
+
+    names = args.scenario or list(SCENARIOS)
+    results: dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "scenarios": {},
+    }
+    for name in names:
+        print(f"[{name}]", file=sys.stderr)
+        res = results["scenarios"][name] = run_scenario(name, SCENARIOS[name], args.repeat)
+        b = res["build"]
+        print(f"  build: {b['requests']} requests, {b['payload_bytes']} bytes, "
+              f"sent as {b['sent_requests']} requests, {b['sent_bytes']} bytes, "
+              f"{b['batches']} batches, {b['build_cpu_s'] * 1000:.1f} ms", file=sys.stderr)
+        for cmd, m in res["commands"].items():
+            status = "ok" if m["ok"] else f"exit {m['exit']}"
+            print(f"  {cmd:<12} {status:<7} {m['round_trips']:>4} calls "
+                  f"(get {m['documents.get']}, batch {m['documents.batchUpdate']}) "
+                  f"{m['bytes_sent'] + m['bytes_received']:>9} B "
+                  f"{m['wall_s']:>6.2f}s {m['peak_rss_kb'] / 1024:>6.1f} MB", file=sys.stderr)
+
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+    if args.update_baseline:
+        failed = failed_commands(results)
+        if failed:
+            print(f"Not updating the baseline: {', '.join(failed)} failed.", file=sys.stderr)
+            sys.exit(1)
+        baseline: dict[str, Any] = {}
+        if args.baseline.exists():
+            baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        baseline.setdefault("scenarios", {}).update(results["scenarios"])
+        baseline["meta"] = results["meta"]
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline updated: {args.baseline}", file=sys.stderr)
+        return
+
+    if not args.baseline.exists():
+        print("No baseline to compare against (run with --update-baseline).", file=sys.stderr)
+        if failed_commands(results):
+            sys.exit(1)
+        return
+    regressions, improvements = compare(
+        results, json.loads(args.baseline.read_text(encoding="utf-8")))
+    for line in improvements:
+        print(f"improved: {line}", file=sys.stderr)
+    for line in regressions:
+        print(f"REGRESSION: {line}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+    print("No regressions.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1100 @@
+#!/usr/bin/env python3
+"""gdocs_emulator — in-memory model of the Google Docs REST API.
+
+Implements the subset of documents.create / documents.get /
+documents.batchUpdate that md2gdoc uses, closely enough that request index
+arithmetic, table layout, heading ids and revision ids behave like the live
+API. Used by the `emulator` transport backend and by gdocs_fake_server, so
+batching, retry and concurrency changes can be measured without network
+access or credentials.
+
+Model: each tab body is a flat list of units whose position *is* the API
+index. Index 0 is the section break; every UTF-16 code unit of text is one
+unit (astral characters take two); a newline unit ends a paragraph and
+carries its paragraph style and bullet. Tables are a table-start unit, a
+row-start unit per row and a cell-start unit per cell, followed by the
+cell's paragraphs; the newline that ends a table's last cell records how
+many tables it closes. documents.get rebuilds the structural JSON from this
+list.
+
+Deterministic fault injection (fixed latency, every-Nth-call or seeded
+random 429s, per-minute quotas) is configured with EmulatorConfig.
+"""
+
+from __future__ import annotations
+
+import copy
+import itertools
+import json
+import os
+import random
+import string
+import threading
+import time
+from collections import namedtuple
+from dataclasses import dataclass, field
+from typing import Any
+
+
+class EmulatorError(Exception):
+    """A request the live API would reject; carries the HTTP status."""
+
+    def __init__(self, status: int, message: str,
+                 retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+@dataclass
+class EmulatorConfig:
+    """Latency and fault injection; the defaults are a fast, perfect server."""
+
+    # Seconds added to every call, plus per request inside a batchUpdate.
+    latency: float = 0.0
+    latency_per_request: float = 0.0
+    # Answer every Nth call with 429 (0 disables).
+    throttle_every: int = 0
+    # Probability of a 429 per call, drawn from a generator seeded with *seed*.
+    throttle_rate: float = 0.0
+    # Retry-After sent with injected 429s (None omits the header).
+    retry_after: float | None = 1.0
+    # Per-minute quotas enforced in fixed 60 s windows (0 = unlimited).
+    reads_per_minute: int = 0
+    writes_per_minute: int = 0
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls, prefix: str = "MD2GDOC_EMULATOR_") -> "EmulatorConfig":
+        """Build a config from $MD2GDOC_EMULATOR_LATENCY, ..._THROTTLE_EVERY etc."""
+        cfg = cls()
+        for name, f in cls.__dataclass_fields__.items():
+            raw = os.environ.get(prefix + name.upper())
+            if raw is None:
+                continue
+            if name == "retry_after" and raw.lower() in ("", "none"):
+                cfg.retry_after = None
+            elif f.type in ("int",):
+                setattr(cfg, name, int(raw))
+            else:
+                setattr(cfg, name, float(raw))
+        return cfg
+
+
+@dataclass
+class EmulatorStats:
+    calls: dict[str, int] = field(default_factory=dict)
+    requests: dict[str, int] = field(default_factory=dict)
+    throttled: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+
+# ---------------------------------------------------------------------------
+# Document model
+# ---------------------------------------------------------------------------
+
+# kind: "S" section break, "c" text code unit, "x" low half of an astral
+# character (text lives on the preceding "c"), "n" paragraph end,
+# "T" table start, "R" row start, "C" cell start.
+# style: textStyle for c/x/n; tableCellStyle for C.
+# pstyle/bullet: paragraph style and bullet for n.
+# close: number of tables an "n" closes (it ends their last cell).
+Unit = namedtuple("Unit", "kind text style pstyle bullet close")
+
+_EMPTY: dict = {}
+_NORMAL = {"namedStyleType": "NORMAL_TEXT", "direction": "LEFT_TO_RIGHT"}
+_HEADINGS = {f"HEADING_{i}" for i in range(1, 7)} | {"TITLE", "SUBTITLE"}
+
+
+def _text_units(text: str, style: dict, pstyle: dict, bullet: dict | None) -> list[Unit]:
+    units: list[Unit] = []
+    for ch in text:
+        if ch == "\n":
+            units.append(Unit("n", "\n", style, pstyle, bullet, 0))
+        elif ord(ch) > 0xFFFF:
+            units.append(Unit("c", ch, style, None, None, 0))
+            units.append(Unit("x", "", style, None, None, 0))
+        else:
+            units.append(Unit("c", ch, style, None, None, 0))
+    return units
+
+
+def utf16_len(text: str) -> int:
+    return len(text) + sum(1 for ch in text if ord(ch) > 0xFFFF)
+
+
+class Tab:
+    """One tab: properties, body units, lists and child tabs."""
+
+    def __init__(self, tab_id: str, title: str) -> None:
+        self.props: dict[str, Any] = {"tabId": tab_id, "title": title}
+        self.units: list[Unit] = [
+            Unit("S", "", _EMPTY, None, None, 0),
+            Unit("n", "\n", _EMPTY, _NORMAL, None, 0),
+        ]
+        self.lists: dict[str, dict] = {}
+        self.children: list[Tab] = []
+        self.parent: Tab | None = None
+
+
+class Document:
+    def __init__(self, doc_id: str, title: str) -> None:
+        self.doc_id = doc_id
+        self.title = title
+        self.revision = 1
+        self.tabs: list[Tab] = []
+
+    @property
+    def revision_id(self) -> str:
+        return f"r{self.revision}"
+
+    def all_tabs(self) -> list[Tab]:
+        out: list[Tab] = []
+        stack = list(reversed(self.tabs))
+        while stack:
+            tab = stack.pop()
+            out.append(tab)
+            stack.extend(reversed(tab.children))
+        return out
+
+    def find_tab(self, tab_id: str | None) -> Tab | None:
+        if not tab_id:
+            return self.tabs[0] if self.tabs else None
+        for tab in self.all_tabs():
+            if tab.props["tabId"] == tab_id:
+                return tab
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Loading: documents.get JSON -> flat units
+# ---------------------------------------------------------------------------
+
+
+def _load_paragraph(el: dict, units: list[Unit]) -> None:
+    para = el["paragraph"]
+    pstyle = copy.deepcopy(para.get("paragraphStyle", {}))
+    bullet = para.get("bullet")
+    if bullet is not None:
+        bullet = {"listId": bullet.get("listId", ""),
+                  "nestingLevel": bullet.get("nestingLevel", 0)}
+    for pe in para.get("elements", []):
+        run = pe.get("textRun")
+        if run is None:
+            raise EmulatorError(500, f"cannot load paragraph element {sorted(pe)}")
+        style = copy.deepcopy(run.get("textStyle", {}))
+        for ch in run.get("content", ""):
+            if ch == "\n":
+                units.append(Unit("n", "\n", style, pstyle, bullet, 0))
+            elif ord(ch) > 0xFFFF:
+                units.append(Unit("c", ch, style, None, None, 0))
+                units.append(Unit("x", "", style, None, None, 0))
+            else:
+                units.append(Unit("c", ch, style, None, None, 0))
+    if not units or units[-1].kind != "n":
+        raise EmulatorError(500, f"paragraph at {el.get('startIndex')} has no newline")
+
+
+def _load_elements(content: list[dict], units: list[Unit]) -> None:
+    for el in content:
+        if "paragraph" in el:
+            _load_paragraph(el, units)
+        elif "table" in el:
+            units.append(Unit("T", "", _EMPTY, None, None, 0))
+            for row in el["table"].get("tableRows", []):
+                units.append(Unit("R", "", _EMPTY, None, None, 0))
+                for cell in row.get("tableCells", []):
+                    style = {k: v for k, v in cell.get("tableCellStyle", {}).items()
+                             if k not in ("rowSpan", "columnSpan")}
+                    units.append(Unit("C", "", copy.deepcopy(style), None, None, 0))
+                    _load_elements(cell.get("content", []), units)
+            last = units[-1]
+            if last.kind != "n":
+                raise EmulatorError(500, f"table at {el.get('startIndex')} has no cells")
+            units[-1] = last._replace(close=last.close + 1)
+        elif el.get("endIndex") == 1 and not el.get("startIndex"):
+            continue  # the leading section break, always units[0]
+        else:
+            raise EmulatorError(500, f"cannot load structural element {sorted(el)}")
+        end = el.get("endIndex")
+        if end is not None and end != len(units):
+            raise EmulatorError(500, f"element ends at {end}, loaded {len(units)} units")
+
+
+def load_body(body: dict) -> list[Unit]:
+    """Rebuild a tab's unit list from its documents.get body JSON.
+
+    Works on partial responses as long as each element keeps its
+    paragraph text runs (styles may be trimmed). Raises EmulatorError(500)
+    for content the model has no units for (inline objects, page breaks,
+    tables of contents, extra section breaks).
+    """
+    units = [Unit("S", "", _EMPTY, None, None, 0)]
+    _load_elements(body.get("content", []), units)
+    if len(units) == 1:
+        units.append(Unit("n", "\n", _EMPTY, _NORMAL, None, 0))
+    return units
+
+
+def load_document(data: dict) -> Document:
+    """Build a Document from a documents.get (includeTabsContent) response."""
+    doc = Document(data.get("documentId", ""), data.get("title", ""))
+
+    def load_tab(tab_json: dict, parent: Tab | None) -> Tab:
+        props = tab_json.get("tabProperties", {})
+        tab = Tab(props.get("tabId", ""), props.get("title", ""))
+        tab.parent = parent
+        doc_tab = tab_json.get("documentTab", {})
+        tab.units = load_body(doc_tab.get("body", {}))
+        tab.lists = copy.deepcopy(doc_tab.get("lists", {}))
+        tab.children = [load_tab(child, tab) for child in tab_json.get("childTabs", [])]
+        return tab
+
+    doc.tabs = [load_tab(t, None) for t in data.get("tabs", [])]
+    return doc
+
+
+# ---------------------------------------------------------------------------
+# Structure: flat units -> nested elements
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class _Para:
+    start: int
+    end: int
+
+
+@dataclass
+class _Table:
+    start: int
+    end: int = 0
+    # rows[r] = (row_start, row_end, [(cell_start, cell_end, content), ...])
+    rows: list[tuple[int, int, list[tuple[int, int, list]]]] = field(default_factory=list)
+
+
+def _parse_seq(units: list[Unit], i: int, in_cell: bool,
+               tables: list[_Table]) -> tuple[list, int, int]:
+    """Parse elements from *i*; return (elements, next index, pending closes)."""
+    elements: list = []
+    n = len(units)
+    while i < n:
+        kind = units[i].kind
+        if kind == "T":
+            table, i, closes = _parse_table(units, i, tables)
+            elements.append(table)
+            if closes:
+                return elements, i, closes
+            continue
+        if kind in ("R", "C"):
+            if in_cell:
+                return elements, i, 0
+            raise EmulatorError(500, f"corrupt body: stray {kind} at {i}")
+        j = i
+        while j < n and units[j].kind != "n":
+            j += 1
+        if j == n:
+            raise EmulatorError(500, "corrupt body: paragraph without newline")
+        elements.append(_Para(i, j + 1))
+        i = j + 1
+        if units[j].close:
+            return elements, i, units[j].close
+    return elements, i, 0
+
+
+def _parse_table(units: list[Unit], i: int,
+                 tables: list[_Table]) -> tuple[_Table, int, int]:
+    table = _Table(start=i)
+    tables.append(table)
+    i += 1
+    while True:
+        row_start = i
+        i += 1
+        cells: list[tuple[int, int, list]] = []
+        while i < len(units) and units[i].kind == "C":
+            cell_start = i
+            content, i, closes = _parse_seq(units, i + 1, True, tables)
+            cells.append((cell_start, i, content))
+            if closes:
+                table.rows.append((row_start, i, cells))
+                table.end = i
+                return table, i, closes - 1
+        table.rows.append((row_start, i, cells))
+        if i >= len(units) or units[i].kind != "R":
+            raise EmulatorError(500, f"corrupt body: unterminated table at {table.start}")
+
+
+def _structure(units: list[Unit]) -> tuple[list, list[_Table]]:
+    tables: list[_Table] = []
+    elements, _, _ = _parse_seq(units, 1, False, tables)
+    return elements, tables
+
+
+def _para_bounds(units: list[Unit], index: int) -> tuple[int, int]:
+    """Return [start, end) of the paragraph containing *index* (a c/x/n unit)."""
+    start = index
+    while start > 0 and units[start - 1].kind in ("c", "x"):
+        start -= 1
+    end = index
+    while units[end].kind != "n":
+        end += 1
+    return start, end + 1
+
+
+# ---------------------------------------------------------------------------
+# Rendering: units -> documents.get JSON
+# ---------------------------------------------------------------------------
+
+
+def _render_paragraph(units: list[Unit], p: _Para, lists: dict[str, dict]) -> dict:
+    elements: list[dict] = []
+    run_start = p.start
+    run_style = units[p.start].style
+    parts: list[str] = []
+    for i in range(p.start, p.end):
+        u = units[i]
+        if u.style is not run_style and u.style != run_style:
+            elements.append({"startIndex": run_start, "endIndex": i, "textRun": {
+                "content": "".join(parts), "textStyle": copy.deepcopy(run_style)}})
+            run_start, run_style, parts = i, u.style, []
+        parts.append(u.text)
+    elements.append({"startIndex": run_start, "endIndex": p.end, "textRun": {
+        "content": "".join(parts), "textStyle": copy.deepcopy(run_style)}})
+    nl = units[p.end - 1]
+    para: dict[str, Any] = {
+        "elements": elements,
+        "paragraphStyle": copy.deepcopy(nl.pstyle),
+    }
+    if nl.bullet is not None:
+        bullet: dict[str, Any] = {"listId": nl.bullet["listId"], "textStyle": {}}
+        if nl.bullet.get("nestingLevel"):
+            bullet["nestingLevel"] = nl.bullet["nestingLevel"]
+        para["bullet"] = bullet
+    return {"startIndex": p.start, "endIndex": p.end, "paragraph": para}
+
+
+def _render_elements(units: list[Unit], elements: list, lists: dict) -> list[dict]:
+    out: list[dict] = []
+    for el in elements:
+        if isinstance(el, _Para):
+            out.append(_render_paragraph(units, el, lists))
+            continue
+        columns = max((len(cells) for _, _, cells in el.rows), default=0)
+        rows = []
+        for row_start, row_end, cells in el.rows:
+            rows.append({
+                "startIndex": row_start,
+                "endIndex": row_end,
+                "tableCells": [{
+                    "startIndex": cs,
+                    "endIndex": ce,
+                    "content": _render_elements(units, content, lists),
+                    "tableCellStyle": dict({"rowSpan": 1, "columnSpan": 1},
+                                           **copy.deepcopy(units[cs].style)),
+                } for cs, ce, content in cells],
+                "tableRowStyle": {"minRowHeight": {"unit": "PT"}},
+            })
+        out.append({"startIndex": el.start, "endIndex": el.end, "table": {
+            "rows": len(el.rows),
+            "columns": columns,
+            "tableRows": rows,
+            "tableStyle": {"tableColumnProperties": [
+                {"widthType": "EVENLY_DISTRIBUTED"} for _ in range(columns)]},
+        }})
+    return out
+
+
+def render_body(tab: Tab) -> dict:
+    elements, _ = _structure(tab.units)
+    content = [{"endIndex": 1, "sectionBreak": {"sectionStyle": {
+        "columnSeparatorStyle": "NONE",
+        "contentDirection": "LEFT_TO_RIGHT",
+        "sectionType": "CONTINUOUS",
+    }}}]
+    content += _render_elements(tab.units, elements, tab.lists)
+    return {"content": content}
+
+
+def _render_tab(tab: Tab, index: int, depth: int) -> dict:
+    props = dict(tab.props, index=index)
+    if depth:
+        props["nestingLevel"] = depth
+    if tab.parent is not None:
+        props["parentTabId"] = tab.parent.props["tabId"]
+    out: dict[str, Any] = {
+        "tabProperties": props,
+        "documentTab": {
+            "body": render_body(tab),
+            "documentStyle": {"pageSize": {
+                "height": {"magnitude": 792, "unit": "PT"},
+                "width": {"magnitude": 612, "unit": "PT"}}},
+        },
+    }
+    if tab.lists:
+        out["documentTab"]["lists"] = copy.deepcopy(tab.lists)
+    if tab.children:
+        out["childTabs"] = [_render_tab(c, i, depth + 1) for i, c in enumerate(tab.children)]
+    return out
+
+
+def render_document(doc: Document, include_tabs: bool) -> dict:
+    out: dict[str, Any] = {"documentId": doc.doc_id, "title": doc.title}
+    if include_tabs:
+        out["tabs"] = [_render_tab(t, i, 0) for i, t in enumerate(doc.tabs)]
+    else:
+        first = _render_tab(doc.tabs[0], 0, 0)["documentTab"]
+        out.update(first)
+    out["revisionId"] = doc.revision_id
+    out["suggestionsViewMode"] = "SUGGESTIONS_INLINE"
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Partial responses (`fields` masks)
+# ---------------------------------------------------------------------------
+
+
+def parse_fields_mask(mask: str) -> dict[str, Any]:
+    """Parse a partial-response mask ("a,b(c,d/e),f/g") into a nested dict.
+
+    Leaves map to None (select the whole value).
+    """
+    pos = 0
+
+    def parse_list() -> dict[str, Any]:
+        nonlocal pos
+        out: dict[str, Any] = {}
+        while pos < len(mask):
+            start = pos
+            while pos < len(mask) and mask[pos] not in ",()":
+                pos += 1
+            path = [p.strip() for p in mask[start:pos].split("/") if p.strip()]
+            sub: Any = None
+            if pos < len(mask) and mask[pos] == "(":
+                pos += 1
+                sub = parse_list()
+                if pos >= len(mask) or mask[pos] != ")":
+                    raise EmulatorError(400, f"Invalid field selection {mask}")
+                pos += 1
+            if path:
+                node = out
+                for name in path[:-1]:
+                    if name in node and node[name] is None:
+                        break  # the whole value is already selected
+                    node = node.setdefault(name, {})
+                else:
+                    _merge_mask(node, path[-1], sub)
+            if pos < len(mask) and mask[pos] == ",":
+                pos += 1
+                continue
+            break
+        return out
+
+    tree = parse_list()
+    if pos != len(mask):
+        raise EmulatorError(400, f"Invalid field selection {mask}")
+    return tree
+
+
+def _merge_mask(node: dict[str, Any], name: str, sub: Any) -> None:
+    if name not in node:
+        node[name] = sub
+    elif node[name] is None or sub is None:
+        node[name] = None
+    else:
+        for k, v in sub.items():
+            _merge_mask(node[name], k, v)
+
+
+def apply_fields_mask(value: Any, tree: dict[str, Any] | None) -> Any:
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [apply_fields_mask(v, tree) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "*" in tree:
+        return value
+    return {k: apply_fields_mask(value[k], sub) for k, sub in tree.items() if k in value}
+
+
+# ---------------------------------------------------------------------------
+# Lists
+# ---------------------------------------------------------------------------
+
+
+_BULLET_GLYPHS = {
+    "BULLET_DISC_CIRCLE_SQUARE": "●○■",
+    "BULLET_DIAMONDX_ARROW3D_SQUARE": "❖➢■",
+    "BULLET_ARROW_DIAMOND_DISC": "➔◆●",
+    "BULLET_STAR_CIRCLE_SQUARE": "★○■",
+    "BULLET_ARROW3D_CIRCLE_SQUARE": "➢○■",
+    "BULLET_LEFTTRIANGLE_DIAMOND_DISC": "◀◆●",
+    "BULLET_DIAMONDX_HOLLOWDIAMOND_SQUARE": "❖◇■",
+    "BULLET_DIAMOND_CIRCLE_SQUARE": "◆○■",
+}
+
+_NUMBERED_GLYPHS = {
+    "NUMBERED_DECIMAL_ALPHA_ROMAN": ("DECIMAL", "ALPHA", "ROMAN"),
+    "NUMBERED_DECIMAL_ALPHA_ROMAN_PARENS": ("DECIMAL", "ALPHA", "ROMAN"),
+    "NUMBERED_DECIMAL_NESTED": ("DECIMAL", "DECIMAL", "DECIMAL"),
+    "NUMBERED_UPPERALPHA_ALPHA_ROMAN": ("UPPER_ALPHA", "ALPHA", "ROMAN"),
+    "NUMBERED_UPPERROMAN_UPPERALPHA_DECIMAL": ("UPPER_ROMAN", "UPPER_ALPHA", "DECIMAL"),
+    "NUMBERED_ZERODECIMAL_ALPHA_ROMAN": ("ZERO_DECIMAL", "ALPHA", "ROMAN"),
+}
+
+
+def _list_properties(preset: str) -> dict:
+    levels = []
+    for level in range(9):
+        indent = {"magnitude": 18 + 36 * level, "unit": "PT"}
+        first = {"magnitude": 36 * level, "unit": "PT"}
+        entry: dict[str, Any] = {
+            "bulletAlignment": "START",
+            "indentFirstLine": first,
+            "indentStart": indent,
+            "textStyle": {"underline": False},
+            "startNumber": 1,
+        }
+        if preset in _BULLET_GLYPHS:
+            entry["glyphSymbol"] = _BULLET_GLYPHS[preset][level % 3]
+            entry["glyphFormat"] = "%" + str(level)
+        elif preset in _NUMBERED_GLYPHS:
+            entry["glyphType"] = _NUMBERED_GLYPHS[preset][level % 3]
+            entry["glyphFormat"] = ("(%" + str(level) + ")"
+                                    if preset.endswith("_PARENS") else "%" + str(level) + ".")
+        elif preset == "BULLET_CHECKBOX":
+            entry["glyphType"] = "GLYPH_TYPE_UNSPECIFIED"
+        else:
+            raise EmulatorError(400, f"Invalid bulletPreset: {preset}")
+        levels.append(entry)
+    return {"listProperties": {"nestingLevels": levels}}
+
+
+# ---------------------------------------------------------------------------
+# Styles
+# ---------------------------------------------------------------------------
+
+
+def _field_names(fields: str) -> list[str] | None:
+    """Top-level names in an update mask, or None for "*"."""
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    if "*" in names:
+        return None
+    return sorted({n.split(".")[0] for n in names})
+
+
+def _apply_mask(old: dict, new: dict, fields: str) -> dict:
+    names = _field_names(fields)
+    if names is None:
+        return copy.deepcopy(new)
+    out = dict(old)
+    for name in names:
+        if name in new:
+            out[name] = copy.deepcopy(new[name])
+        else:
+            out.pop(name, None)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Emulator
+# ---------------------------------------------------------------------------
+
+
+class DocsEmulator:
+    """Thread-safe in-memory Docs API.
+
+    handle() takes the method name as md2gdoc spells it, the path/query
+    params and the raw JSON body, and returns (status, headers, body bytes)
+    exactly as an HTTP server would.
+    """
+
+    def __init__(self, config: EmulatorConfig | None = None) -> None:
+        self.config = config or EmulatorConfig()
+        self.docs: dict[str, Document] = {}
+        self.stats = EmulatorStats()
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+        self._fault_rng = random.Random(self.config.seed + 1)
+        self._call_count = 0
+        self._window_start = 0.0
+        self._window_calls = {"read": 0, "write": 0}
+        self._doc_ids = itertools.count(1)
+
+    # -- ids -------------------------------------------------------------
+
+    def _random_id(self, prefix: str, length: int) -> str:
+        alphabet = string.ascii_lowercase + string.digits
+        return prefix + "".join(self._rng.choice(alphabet) for _ in range(length))
+
+    # -- public entry point ------------------------------------------------
+
+    def handle(self, method: str, params: dict[str, Any] | None,
+               body: str | bytes | None) -> tuple[int, dict[str, str], bytes]:
+        params = dict(params or {})
+        raw = body.encode("utf-8") if isinstance(body, str) else (body or b"")
+        try:
+            payload = json.loads(raw) if raw else None
+        except ValueError:
+            data = json.dumps({"error": {"code": 400, "message": "Invalid JSON payload received.",
+                                         "status": "INVALID_ARGUMENT"}}).encode("utf-8")
+            return 400, {}, data
+        cfg = self.config
+        delay = cfg.latency
+        if method == "documents.batchUpdate" and cfg.latency_per_request:
+            delay += cfg.latency_per_request * len((payload or {}).get("requests", []))
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            self.stats.calls[method] = self.stats.calls.get(method, 0) + 1
+            self.stats.bytes_in += len(raw)
+            try:
+                self._check_faults(method)
+                if method == "documents.create":
+                    result = self._create(payload or {})
+                elif method == "documents.get":
+                    result = self._get(params)
+                elif method == "documents.batchUpdate":
+                    result = self._batch_update(params, payload or {})
+                else:
+                    raise EmulatorError(404, f"Method not found: {method}")
+                if "fields" in params and method == "documents.get":
+                    result = apply_fields_mask(result, parse_fields_mask(params["fields"]))
+                status, headers = 200, {}
+            except EmulatorError as e:
+                status = e.status
+                result = {"error": {"code": e.status, "message": e.message,
+                                    "status": _STATUS_NAMES.get(e.status, "UNKNOWN")}}
+                headers = {}
+                if e.status == 429:
+                    self.stats.throttled += 1
+                    if e.retry_after is not None:
+                        headers["Retry-After"] = f"{e.retry_after:g}"
+            data = json.dumps(result).encode("utf-8")
+            self.stats.bytes_out += len(data)
+        return status, headers, data
+
+    def call(self, method: str, params: dict[str, Any] | None = None,
+             body: str | None = None) -> dict:
+        """Convenience wrapper: decoded result, EmulatorError on failure."""
+        status, headers, data = self.handle(method, params, body)
+        result = json.loads(data)
+        if status >= 400:
+            retry = headers.get("Retry-After")
+            raise EmulatorError(status, result["error"]["message"],
+                                float(retry) if retry else None)
+        return result
+
+    # -- faults ----------------------------------------------------------
+
+    def _check_faults(self, method: str) -> None:
+        cfg = self.config
+        self._call_count += 1
+        if cfg.throttle_every and self._call_count % cfg.throttle_every == 0:
+            raise EmulatorError(429, "Quota exceeded (injected)", cfg.retry_after)
+        if cfg.throttle_rate and self._fault_rng.random() < cfg.throttle_rate:
+            raise EmulatorError(429, "Quota exceeded (injected)", cfg.retry_after)
+        kind = "read" if method == "documents.get" else "write"
+        limit = cfg.reads_per_minute if kind == "read" else cfg.writes_per_minute
+        if not limit:
+            return
+        now = time.monotonic()
+        if now - self._window_start >= 60.0:
+            self._window_start = now
+            self._window_calls = {"read": 0, "write": 0}
+        if self._window_calls[kind] >= limit:
+            raise EmulatorError(
+                429, f"Quota exceeded for quota metric '{kind.title()} requests' "
+                     f"and limit '{kind.title()} requests per minute per user'",
+                max(0.0, 60.0 - (now - self._window_start)))
+        self._window_calls[kind] += 1
+
+    # -- documents.create / get ---------------------------------------------
+
+    def _create(self, payload: dict) -> dict:
+        title = payload.get("title", "") or "Untitled document"
+        doc_id = self._random_id("1", 43)
+        doc = Document(doc_id, title)
+        doc.tabs.append(Tab("t.0", ""))
+        self.docs[doc_id] = doc
+        return render_document(doc, include_tabs=True)
+
+    def _document(self, params: dict[str, Any]) -> Document:
+        doc = self.docs.get(str(params.get("documentId", "")))
+        if doc is None:
+            raise EmulatorError(404, "Requested entity was not found.")
+        return doc
+
+    def _get(self, params: dict[str, Any]) -> dict:
+        doc = self._document(params)
+        include = str(params.get("includeTabsContent", "")).lower() in ("true", "1")
+        return render_document(doc, include)
+
+    # -- documents.batchUpdate ----------------------------------------------
+
+    def _batch_update(self, params: dict[str, Any], payload: dict) -> dict:
+        doc = self._document(params)
+        control = payload.get("writeControl") or {}
+        required = control.get("requiredRevisionId")
+        if required is not None and required != doc.revision_id:
+            raise EmulatorError(
+                400, f"The required revision ID '{required}' does not match the "
+                     f"latest revision '{doc.revision_id}'.")
+        requests = payload.get("requests") or []
+        if not requests:
+            raise EmulatorError(400, "Must specify at least one request.")
+        batch = _Batch(self, doc)
+        replies = []
+        try:
+            for i, req in enumerate(requests):
+                if not isinstance(req, dict) or len(req) != 1:
+                    raise EmulatorError(400, f"Invalid requests[{i}]: exactly one request kind expected")
+                (kind, args), = req.items()
+                handler = getattr(batch, "do_" + kind, None)
+                if handler is None:
+                    raise EmulatorError(
+                        400, f"Invalid requests[{i}]: gdocs_emulator does not implement {kind}")
+                try:
+                    replies.append(handler(args or {}))
+                except EmulatorError as e:
+                    raise EmulatorError(e.status, f"Invalid requests[{i}].{kind}: {e.message}")
+                self.stats.requests[kind] = self.stats.requests.get(kind, 0) + 1
+        except EmulatorError:
+            batch.rollback()
+            raise
+        doc.revision += 1
+        return {"replies": replies,
+                "writeControl": {"requiredRevisionId": doc.revision_id},
+                "documentId": doc.doc_id}
+
+    # -- inspection helpers -------------------------------------------------
+
+    def document(self, doc_id: str, include_tabs: bool = True) -> dict:
+        with self._lock:
+            return render_document(self.docs[doc_id], include_tabs)
+
+    def tab_text(self, doc_id: str, tab_id: str | None = None) -> str:
+        """Plain text of a tab body (table markers omitted)."""
+        with self._lock:
+            tab = self.docs[doc_id].find_tab(tab_id)
+            if tab is None:
+                raise KeyError(tab_id)
+            return "".join(u.text for u in tab.units if u.kind in ("c", "n"))
+
+
+_STATUS_NAMES = {400: "INVALID_ARGUMENT", 404: "NOT_FOUND", 429: "RESOURCE_EXHAUSTED",
+                 500: "INTERNAL"}
+
+
+class _Batch:
+    """Applies one batchUpdate's requests, with rollback on failure."""
+
+    def __init__(self, emulator: DocsEmulator, doc: Document) -> None:
+        self.em = emulator
+        self.doc = doc
+        self._saved_tabs = (list(doc.tabs), {id(t): list(t.children) for t in doc.all_tabs()})
+        self._saved: dict[int, tuple[Tab, list[Unit], dict, dict]] = {}
+
+    def rollback(self) -> None:
+        for tab, units, lists, props in self._saved.values():
+            tab.units, tab.lists, tab.props = units, lists, props
+        tabs, children = self._saved_tabs
+        self.doc.tabs = tabs
+        for tab in self.doc.all_tabs():
+            if id(tab) in children:
+                tab.children = children[id(tab)]
+
+    def _touch(self, tab: Tab) -> Tab:
+        if id(tab) not in self._saved:
+            self._saved[id(tab)] = (tab, list(tab.units), dict(tab.lists), dict(tab.props))
+        return tab
+
+    # -- locating ------------------------------------------------------------
+
+    def _tab(self, where: dict) -> Tab:
+        if where.get("segmentId"):
+            raise EmulatorError(400, f"Segment {where['segmentId']!r} not found "
+                                     "(gdocs_emulator models tab bodies only)")
+        tab = self.doc.find_tab(where.get("tabId"))
+        if tab is None:
+            raise EmulatorError(400, f"The tab with ID {where.get('tabId')} was not found.")
+        return self._touch(tab)
+
+    def _location(self, args: dict) -> tuple[Tab, int]:
+        if "location" in args:
+            loc = args["location"]
+            tab = self._tab(loc)
+            return tab, int(loc.get("index", 0))
+        if "endOfSegmentLocation" in args:
+            tab = self._tab(args["endOfSegmentLocation"])
+            return tab, len(tab.units) - 1
+        raise EmulatorError(400, "location or endOfSegmentLocation is required")
+
+    def _range(self, rng: dict) -> tuple[Tab, int, int]:
+        tab = self._tab(rng)
+        start, end = int(rng.get("startIndex", 0)), int(rng.get("endIndex", 0))
+        if start < 1:
+            raise EmulatorError(400, f"The start index must be at least 1, got {start}.")
+        if end <= start:
+            raise EmulatorError(400, "The range must not be empty; "
+                                     f"startIndex {start} must be less than endIndex {end}.")
+        if end > len(tab.units):
+            raise EmulatorError(400, f"Index {end - 1} must be less than the end index "
+                                     f"of the referenced segment, {len(tab.units)}.")
+        return tab, start, end
+
+    @staticmethod
+    def _check_insert_index(tab: Tab, index: int) -> None:
+        end = len(tab.units)
+        if index < 1:
+            raise EmulatorError(400, f"Index {index} must be at least 1.")
+        if index >= end:
+            raise EmulatorError(400, f"Index {index} must be less than the end index "
+                                     f"of the referenced segment, {end}.")
+        kind = tab.units[index].kind
+        if kind == "x":
+            raise EmulatorError(400, f"Index {index} falls inside a surrogate pair.")
+        if kind not in ("c", "n"):
+            raise EmulatorError(400, "The insertion index must be inside the bounds "
+                                     "of an existing paragraph.")
+
+    # -- text ----------------------------------------------------------------
+
+    def do_insertText(self, args: dict) -> dict:
+        tab, index = self._location(args)
+        self._check_insert_index(tab, index)
+        text = args.get("text", "")
+        if not text:
+            return {}
+        units = tab.units
+        prev = units[index - 1]
+        style = prev.style if prev.kind in ("c", "x") else units[index].style
+        _, para_end = _para_bounds(units, index)
+        nl = units[para_end - 1]
+        pstyle = {k: v for k, v in nl.pstyle.items() if k != "headingId"}
+        new = _text_units(text, style, pstyle, nl.bullet)
+        if "headingId" in nl.pstyle:
+            new = [u._replace(pstyle=dict(pstyle, headingId=self._heading_id()))
+                   if u.kind == "n" else u for u in new]
+        units[index:index] = new
+        return {}
+
+    def _heading_id(self) -> str:
+        return self.em._random_id("h.", 12)
+
+    def do_deleteContentRange(self, args: dict) -> dict:
+        tab, start, end = self._range(args.get("range", {}))
+        units = tab.units
+        if end > len(units) - 1:
+            raise EmulatorError(400, "The range cannot include the newline character "
+                                     "at the end of the segment.")
+        if units[start].kind == "x" or (end < len(units) and units[end].kind == "x"):
+            raise EmulatorError(400, "The range cannot split a surrogate pair.")
+        # A range free of table markers and cell-closing newlines stays within
+        # one paragraph run, so the full structure walk is only needed otherwise.
+        plain = units[end].kind not in ("R", "C") and all(
+            u.kind not in ("T", "R", "C") and not u.close for u in units[start:end])
+        _, tables = ([], []) if plain else _structure(units)
+        for table in tables:
+            if end <= table.start or start >= table.end:
+                continue
+            if start <= table.start and end >= table.end:
+                continue
+            inside = False
+            for _, _, cells in table.rows:
+                for cs, ce, _ in cells:
+                    if cs < start and end <= ce - 1:
+                        inside = True
+            if not inside:
+                raise EmulatorError(400, "Invalid deletion range. Cannot delete "
+                                         "part of a table structure.")
+        merged = units[:start] + units[end:]
+        if merged[start].kind == "T" and merged[start - 1].kind not in ("n",):
+            raise EmulatorError(400, "Invalid deletion range. Cannot delete the "
+                                     "newline character before a table.")
+        tab.units = merged
+        return {}
+
+    def do_insertTable(self, args: dict) -> dict:
+        tab, index = self._location(args)
+        self._check_insert_index(tab, index)
+        rows, cols = int(args.get("rows", 0)), int(args.get("columns", 0))
+        if rows < 1 or cols < 1:
+            raise EmulatorError(400, "A table must have at least one row and one column.")
+        units = tab.units
+        _, para_end = _para_bounds(units, index)
+        nl = units[para_end - 1]
+        prev = units[index - 1]
+        style = prev.style if prev.kind in ("c", "x") else units[index].style
+        pstyle = {k: v for k, v in nl.pstyle.items() if k != "headingId"}
+        new: list[Unit] = [Unit("n", "\n", style, pstyle, nl.bullet, 0),
+                           Unit("T", "", _EMPTY, None, None, 0)]
+        for r in range(rows):
+            new.append(Unit("R", "", _EMPTY, None, None, 0))
+            for c in range(cols):
+                new.append(Unit("C", "", _EMPTY, None, None, 0))
+                last = r == rows - 1 and c == cols - 1
+                new.append(Unit("n", "\n", _EMPTY, _NORMAL, None, 1 if last else 0))
+        units[index:index] = new
+        return {}
+
+    # -- styles ----------------------------------------------------------------
+
+    def do_updateTextStyle(self, args: dict) -> dict:
+        tab, start, end = self._range(args.get("range", {}))
+        fields = args.get("fields", "")
+        if not fields:
+            raise EmulatorError(400, "fields is required")
+        new_style = args.get("textStyle", {})
+        memo: dict[int, dict] = {}
+        units = tab.units
+        for i in range(start, end):
+            u = units[i]
+            if u.kind not in ("c", "x", "n"):
+                continue
+            styled = memo.get(id(u.style))
+            if styled is None:
+                styled = memo[id(u.style)] = _apply_mask(u.style, new_style, fields)
+            units[i] = u._replace(style=styled)
+        return {}
+
+    def _paragraph_ends(self, tab: Tab, start: int, end: int) -> list[int]:
+        """Indices of the newline of every paragraph overlapping [start, end)."""
+        units = tab.units
+        out = []
+        for i in range(start, len(units)):
+            kind = units[i].kind
+            if kind == "n":
+                out.append(i)
+                if i + 1 >= end:
+                    break
+            elif kind in ("T", "R", "C") and i >= end:
+                break
+        return out
+
+    def do_updateParagraphStyle(self, args: dict) -> dict:
+        tab, start, end = self._range(args.get("range", {}))
+        fields = args.get("fields", "")
+        if not fields:
+            raise EmulatorError(400, "fields is required")
+        new_style = args.get("paragraphStyle", {})
+        units = tab.units
+        for i in self._paragraph_ends(tab, start, end):
+            u = units[i]
+            pstyle = _apply_mask(u.pstyle, new_style, fields)
+            pstyle.setdefault("direction", "LEFT_TO_RIGHT")
+            pstyle.setdefault("namedStyleType", "NORMAL_TEXT")
+            if pstyle["namedStyleType"] in _HEADINGS:
+                if "headingId" not in pstyle:
+                    pstyle["headingId"] = self._heading_id()
+            else:
+                pstyle.pop("headingId", None)
+            units[i] = u._replace(pstyle=pstyle)
+        return {}
+
+    def do_createParagraphBullets(self, args: dict) -> dict:
+        tab, start, end = self._range(args.get("range", {}))
+        preset = args.get("bulletPreset", "")
+        props = _list_properties(preset)
+        list_id = self.em._random_id("kix.", 12)
+        tab.lists[list_id] = props
+        # Leading tabs set the nesting level and are removed, as in the API.
+        # Process paragraphs back to front so earlier indices stay valid.
+        for nl_index in reversed(self._paragraph_ends(tab, start, end)):
+            units = tab.units
+            p_start, _ = _para_bounds(units, nl_index)
+            depth = 0
+            while units[p_start + depth].kind == "c" and units[p_start + depth].text == "\t":
+                depth += 1
+            nl = units[nl_index]
+            bullet = {"listId": list_id, "nestingLevel": min(depth, 8)}
+            units[nl_index] = nl._replace(bullet=bullet)
+            if depth:
+                del units[p_start:p_start + depth]
+        return {}
+
+    def do_deleteParagraphBullets(self, args: dict) -> dict:
+        tab, start, end = self._range(args.get("range", {}))
+        for i in self._paragraph_ends(tab, start, end):
+            tab.units[i] = tab.units[i]._replace(bullet=None)
+        return {}
+
+    def do_updateTableCellStyle(self, args: dict) -> dict:
+        fields = args.get("fields", "")
+        if not fields:
+            raise EmulatorError(400, "fields is required")
+        if "tableRange" in args:
+            rng = args["tableRange"]
+            cell_loc = rng.get("tableCellLocation", {})
+            start_loc = cell_loc.get("tableStartLocation", {})
+            r0, c0 = int(cell_loc.get("rowIndex", 0)), int(cell_loc.get("columnIndex", 0))
+            rspan, cspan = int(rng.get("rowSpan", 1)), int(rng.get("columnSpan", 1))
+        else:
+            start_loc = args.get("tableStartLocation", {})
+            r0 = c0 = 0
+            rspan = cspan = 1 << 30
+        tab = self._tab(start_loc)
+        index = int(start_loc.get("index", 0))
+        _, tables = _structure(tab.units)
+        table = next((t for t in tables if t.start == index), None)
+        if table is None:
+            raise EmulatorError(400, f"Invalid table start location. There is no table at index {index}.")
+        if r0 >= len(table.rows) or c0 >= len(table.rows[r0][2]):
+            raise EmulatorError(400, "The table cell location is out of bounds.")
+        style = args.get("tableCellStyle", {})
+        for r in range(r0, min(len(table.rows), r0 + rspan)):
+            cells = table.rows[r][2]
+            for c in range(c0, min(len(cells), c0 + cspan)):
+                cs = cells[c][0]
+                u = tab.units[cs]
+                tab.units[cs] = u._replace(style=_apply_mask(u.style, style, fields))
+        return {}
+
+    # -- tabs ------------------------------------------------------------------
+
+    def do_addDocumentTab(self, args: dict) -> dict:
+        props = args.get("tabProperties", {})
+        tab = Tab(self.em._random_id("t.", 12), props.get("title", ""))
+        parent_id = props.get("parentTabId")
+        if parent_id:
+            parent = self.doc.find_tab(parent_id)
+            if parent is None:
+                raise EmulatorError(400, f"The tab with ID {parent_id} was not found.")
+            siblings = parent.children
+            tab.parent = parent
+        else:
+            siblings = self.doc.tabs
+        index = props.get("index")
+        if index is None or index > len(siblings):
+            siblings.append(tab)
+            index = len(siblings) - 1
+        else:
+            siblings.insert(int(index), tab)
+        out = dict(tab.props, index=index)
+        if parent_id:
+            out["parentTabId"] = parent_id
+        return {"addDocumentTab": {"tabProperties": out}}
+
+    def do_updateDocumentTabProperties(self, args: dict) -> dict:
+        props = args.get("tabProperties", {})
+        fields = args.get("fields", "")
+        tab = self.doc.find_tab(props.get("tabId", ""))
+        if tab is None or not props.get("tabId"):
+            raise EmulatorError(400, f"The tab with ID {props.get('tabId')} was not found.")
+        self._touch(tab)
+        names = _field_names(fields)
+        if names is None:
+            names = [k for k in props if k != "tabId"]
+        for name in names:
+            if name == "title":
+                tab.props = dict(tab.props, title=props.get("title", ""))
+            elif name == "index":
+                siblings = tab.parent.children if tab.parent else self.doc.tabs
+                siblings.remove(tab)
+                siblings.insert(min(int(props.get("index", 0)), len(siblings)), tab)
+            else:
+                raise EmulatorError(400, f"Unsupported tab property field: {name}")
+        return {}
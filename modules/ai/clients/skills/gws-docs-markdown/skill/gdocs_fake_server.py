@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""gdocs_fake_server — local stand-in for the Docs REST API.
+
+Serves the three routes md2gdoc uses (documents.create, documents.get and
+documents.batchUpdate) from an in-memory gdocs_emulator.DocsEmulator so the
+HTTP backend can be exercised and benchmarked without network access or
+credentials. Documents persist for the life of the server, so several
+md2gdoc invocations (create, then update-tab, ...) can share them.
+
+Usage:
+    python3 gdocs_fake_server.py [--port 8765] [--latency 0.05] [--throttle-every 10]
+    MD2GDOC_API_BASE=http://127.0.0.1:8765 md2gdoc create file.md
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from gdocs_emulator import DocsEmulator, EmulatorConfig
+
+_ROUTE_RE = re.compile(r"^/v1/documents(?:/([^/:]+))?(:batchUpdate)?$")
+
+
+def make_handler(emulator: DocsEmulator) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *_args: Any) -> None:
+            pass
+
+        def _dispatch(self, verb: str) -> None:
+            parts = urllib.parse.urlsplit(self.path)
+            m = _ROUTE_RE.match(parts.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if m is None:
+                status, headers = 404, {}
+                data = b'{"error": {"code": 404, "message": "no route"}}'
+            else:
+                doc_id, batch = m.group(1), m.group(2)
+                params: dict[str, Any] = dict(urllib.parse.parse_qsl(parts.query))
+                if doc_id:
+                    params["documentId"] = urllib.parse.unquote(doc_id)
+                if verb == "POST" and batch:
+                    method = "documents.batchUpdate"
+                elif verb == "POST":
+                    method = "documents.create"
+                else:
+                    method = "documents.get"
+                status, headers, data = emulator.handle(method, params, raw)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            self._dispatch("GET")
+
+        def do_POST(self) -> None:
+            self._dispatch("POST")
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 0,
+          emulator: DocsEmulator | None = None) -> ThreadingHTTPServer:
+    """Start the fake server on a background thread and return it.
+
+    Port 0 picks a free port; read it back from `server.server_address`.
+    The emulator is available as `server.emulator`.
+    """
+    emulator = emulator or DocsEmulator()
+    server = ThreadingHTTPServer((host, port), make_handler(emulator))
+    server.daemon_threads = True
+    server.emulator = emulator  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local fake Google Docs API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds of artificial latency added to every call.")
+    parser.add_argument("--latency-per-request", type=float, default=0.0,
+                        help="Extra seconds per request inside a batchUpdate.")
+    parser.add_argument("--throttle-every", type=int, default=0, metavar="N",
+                        help="Answer every Nth call with 429.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, metavar="P",
+                        help="Answer calls with 429 at probability P (seeded).")
+    parser.add_argument("--retry-after", type=float, default=1.0,
+                        help="Retry-After seconds sent with injected 429s.")
+    parser.add_argument("--reads-per-minute", type=int, default=0,
+                        help="Enforce a per-minute read quota (0 = unlimited).")
+    parser.add_argument("--writes-per-minute", type=int, default=0,
+                        help="Enforce a per-minute write quota (0 = unlimited).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    config = EmulatorConfig(
+        latency=args.latency,
+        latency_per_request=args.latency_per_request,
+        throttle_every=args.throttle_every,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        reads_per_minute=args.reads_per_minute,
+        writes_per_minute=args.writes_per_minute,
+        seed=args.seed,
+    )
+    server = serve(args.host, args.port, DocsEmulator(config))
+    host, port = server.server_address[:2]
+    print(f"MD2GDOC_API_BASE=http://{host}:{port}", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 """md2gdoc — Convert Markdown files to Google Docs with tab support.
 
-Uses the gws CLI to call the Google Docs REST API. Each file becomes one tab.
+Calls the Google Docs REST API through a pluggable transport: in-process HTTP
+with pooled keep-alive connections, or the gws CLI as a fallback. Each file
+becomes one tab.
 
 Usage:
     md2gdoc create --title "My Doc" file1.md [file2.md ...]
     md2gdoc add-tab --document DOC_ID [--title "Tab Title"] file.md
     md2gdoc extract-tab --document DOC_ID --tab TITLE_OR_ID
+    md2gdoc extract-all --document DOC_ID --out DIR
+    md2gdoc watch DIR
+    md2gdoc publish manifest.yaml
+    md2gdoc --trace trace.json create file.md
+    md2gdoc update-tab --plan --document DOC_ID --tab TITLE_OR_ID file.md
 
 Outputs the document ID (create) or tab ID (add-tab) to stdout.
 """
@@ -14,14 +21,33 @@ Outputs the document ID (create) or tab ID (add-tab) to stdout.
 from __future__ import annotations
 
 import argparse
+import asyncio
+import bisect
+import email.utils
+import hashlib
+import io
+import gzip
+import http.client
 import json
+import multiprocessing
+import os
+import queue
+import random
 import re
+import select
+import struct
 import subprocess
 import sys
+import tempfile
+import threading
 import time
+import urllib.parse
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext, redirect_stdout
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator, NoReturn, TextIO
 
 import yaml
 from markdown_it import MarkdownIt
@@ -53,6 +79,18 @@ class BuildState:
     # Links that could not be resolved at write time (fragment/relative hrefs).
     # Each entry: (start_index, end_index, original_href).
     deferred_links: list[tuple[int, int, str]] = field(default_factory=list)
+    # Debug: flush and GET around each table to cross-check the index model.
+    verify_indices: bool = False
+    # True while the tab held no content before this build and nothing has
+    # been flushed yet: every character the pending requests insert starts
+    # out unstyled, so optimize_requests() may drop redundant resets.
+    fresh_tab: bool = False
+    # When set, full request windows are sealed at top-level block
+    # boundaries and sent in the background while the walk continues.
+    sender: RequestSender | None = None
+    # When set, every window _flush_requests() sends is also appended here
+    # so the tab's requests can be stored as a reusable plan.
+    plan: list[Request] | None = None
 
 
 @dataclass
@@ -75,6 +113,7 @@ class Region:
     is_table_header: bool = False
     raw_markdown: str = ""
 
+
 @dataclass
 class DiffHunk:
     """A single hunk from unified diff output."""
@@ -117,6 +156,104 @@ class SourceSpan:
     synthetic: bool = False  # True for table pipes, fences, separator rows
     raw_text: str | None = None  # API text for cells (without wikilink formatting)
 
+
+# Span kinds; a SourceMap stores each as its index here.
+_SPAN_KINDS = ("paragraph", "heading", "list-item", "cell",
+               "table-syntax", "table-separator", "blank")
+_SPAN_KIND_CODES = {kind: code for code, kind in enumerate(_SPAN_KINDS)}
+# Kinds with no counterpart in the document (pipes, separator rows, spacing).
+_SYNTHETIC_KINDS = frozenset({"table-syntax", "table-separator", "blank"})
+
+
+class SourceMap:
+    """The source spans of one extracted tab, stored column-wise.
+
+    Spans are appended in markdown order and never overlap, so lookups by
+    offset are a bisect. Each span costs a few array slots rather than a
+    SourceSpan object; indexing or iterating builds SourceSpans on demand,
+    so the map still reads as a sequence of them.
+    """
+
+    def __init__(self) -> None:
+        self.md_start = array("q")
+        self.md_end = array("q")
+        # -1 where the span has no API range.
+        self.api_start = array("q")
+        self.api_end = array("q")
+        self.kind = array("B")
+        # Paragraph index for paragraph kinds, table index for table kinds.
+        self.block = array("l")
+        # Row and column of cell spans; -1 for everything else.
+        self.row = array("l")
+        self.col = array("l")
+        # Span index -> API text, for cells only.
+        self.raw_text: dict[int, str] = {}
+        self._cells: dict[tuple[int, int, int], int] | None = None
+
+    def append(self, md_start: int, md_end: int, api_start: int | None,
+               api_end: int | None, kind: str, block: int, row: int = -1,
+               col: int = -1, raw_text: str | None = None) -> None:
+        if raw_text is not None:
+            self.raw_text[len(self.md_start)] = raw_text
+        self.md_start.append(md_start)
+        self.md_end.append(md_end)
+        self.api_start.append(-1 if api_start is None else api_start)
+        self.api_end.append(-1 if api_end is None else api_end)
+        self.kind.append(_SPAN_KIND_CODES[kind])
+        self.block.append(block)
+        self.row.append(row)
+        self.col.append(col)
+
+    def __len__(self) -> int:
+        return len(self.md_start)
+
+    def __getitem__(self, i: int) -> SourceSpan:
+        if i < 0:
+            i += len(self.md_start)
+        kind = _SPAN_KINDS[self.kind[i]]
+        block = str(self.block[i])
+        if kind == "cell":
+            path: tuple[str, ...] = ("table", block, "row", str(self.row[i]),
+                                     "cell", str(self.col[i]))
+        elif kind in _SYNTHETIC_KINDS:
+            path = ("table", block)
+        else:
+            path = (kind, block)
+        api_start, api_end = self.api_start[i], self.api_end[i]
+        return SourceSpan(
+            md_start=self.md_start[i],
+            md_end=self.md_end[i],
+            api_start=None if api_start < 0 else api_start,
+            api_end=None if api_end < 0 else api_end,
+            kind=kind,
+            path=path,
+            synthetic=kind in _SYNTHETIC_KINDS,
+            raw_text=self.raw_text.get(i),
+        )
+
+    def __iter__(self) -> Iterator[SourceSpan]:
+        return (self[i] for i in range(len(self.md_start)))
+
+    def find_at(self, offset: int) -> SourceSpan | None:
+        """Return the non-synthetic span covering markdown byte *offset*."""
+        i = bisect.bisect_right(self.md_start, offset) - 1
+        if (i < 0 or offset >= self.md_end[i]
+                or _SPAN_KINDS[self.kind[i]] in _SYNTHETIC_KINDS):
+            return None
+        return self[i]
+
+    def find_cell(self, table: int, row: int, col: int) -> SourceSpan | None:
+        """Return the span of cell (*row*, *col*) of table number *table*."""
+        if self._cells is None:
+            cell = _SPAN_KIND_CODES["cell"]
+            self._cells = {}
+            for i, kind in enumerate(self.kind):
+                if kind == cell:
+                    self._cells.setdefault((self.block[i], self.row[i], self.col[i]), i)
+        i = self._cells.get((table, row, col))
+        return None if i is None else self[i]
+
+
 @dataclass
 class Segment:
     """A structural unit of markdown content."""
@@ -129,26 +266,178 @@ class Segment:
     span: SourceSpan | None = None  # source mapping (None for local-only)
     children: list["Segment"] = field(default_factory=list)  # nested segments
     raw_text: str | None = None  # API text for cells (without wikilink formatting)
+    # API elements behind the segment (see bind_segments): a block and the
+    # empty paragraphs after it, or every paragraph of a cell.
+    elements: list[dict] = field(default_factory=list)
+    # Styled (text, textStyle) runs an in-place edit rewrites; None when
+    # the segment cannot be edited in place.
+    runs: list[tuple[str, dict]] | None = None
+
 
 @dataclass
 class TextEdit:
-    """A minimal text edit within a segment."""
+    """A minimal text edit within a segment.
+
+    Edits between two bound segments are made on their API runs: offsets
+    are then UTF-16 units from the segment's api_start and *runs* holds the
+    styled pieces of new_text. Otherwise offsets are characters of the
+    segment's markdown text and runs is None.
+    """
 
-    start: int  # byte offset relative to segment text
-    end: int  # byte offset relative to segment text (exclusive)
+    start: int  # offset of the first replaced character
+    end: int  # offset past the last replaced character
     new_text: str  # replacement text
+    runs: list[tuple[str, dict]] | None = None
 
 
 @dataclass
 class SegmentMatch:
     """Result of aligning old and new segments."""
 
-    kind: str  # "matched", "deleted", "inserted", "replaced"
+    kind: str  # "matched", "deleted", "inserted"
     old_segment: Segment | None = None
     new_segment: Segment | None = None
     edits: list[TextEdit] = field(default_factory=list)  # for "matched" kind
     insert_after_api: int | None = None  # API index to insert after (for "inserted" kind)
 
+
+# ---------------------------------------------------------------------------
+# Tracing
+# ---------------------------------------------------------------------------
+
+
+class TraceSpan:
+    """One open span; set() attaches args until it closes."""
+
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer: Tracer, name: str, cat: str, args: dict[str, Any]) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0.0
+
+    def set(self, **args: Any) -> None:
+        self.args.update(args)
+
+    def __enter__(self) -> TraceSpan:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, *_exc: Any) -> None:
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.add(self.name, self.cat, self.start, time.perf_counter(), self.args)
+
+
+class _NoSpan(TraceSpan):
+    """The span handed out while tracing is off: records nothing."""
+
+    def __init__(self) -> None:
+        pass
+
+    def set(self, **args: Any) -> None:
+        pass
+
+    def __enter__(self) -> TraceSpan:
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """Collect timed spans as Chrome trace events for --trace.
+
+    The file write() produces loads in chrome://tracing or ui.perfetto.dev.
+    Each thread is a track and each process (publish workers included) a
+    group. Timestamps are time.perf_counter(), CLOCK_MONOTONIC on Linux, so
+    worker events line up with the parent's. While disabled, span() returns
+    a shared inert span and nothing is recorded.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.events: list[dict] = []
+        self._threads: set[int] = set()
+        self._lock = threading.Lock()
+
+    def span(self, name: str, cat: str, **args: Any) -> TraceSpan:
+        if not self.enabled:
+            return _NO_SPAN
+        return TraceSpan(self, name, cat, args)
+
+    def add(self, name: str, cat: str, start: float, end: float,
+            args: dict[str, Any] | None = None) -> None:
+        """Record a finished span that ran from *start* to *end* on this thread."""
+        pid, tid = os.getpid(), threading.get_native_id()
+        event: dict[str, Any] = {"name": name, "cat": cat, "ph": "X", "pid": pid, "tid": tid,
+                                 "ts": round(start * 1e6, 1),
+                                 "dur": round((end - start) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        with self._lock:
+            if tid not in self._threads:
+                self._threads.add(tid)
+                self.events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                                    "args": {"name": threading.current_thread().name}})
+            self.events.append(event)
+
+    def drain(self) -> list[dict]:
+        """Return and forget the events so far (a publish worker's share)."""
+        with self._lock:
+            events, self.events = self.events, []
+            self._threads.clear()
+        return events
+
+    def extend(self, events: list[dict]) -> None:
+        with self._lock:
+            self.events.extend(events)
+
+    def write(self, path: Path) -> None:
+        names = [{"name": "process_name", "ph": "M", "pid": pid, "args": {
+                     "name": "md2gdoc" if pid == os.getpid() else f"md2gdoc worker {pid}"}}
+                 for pid in sorted({e["pid"] for e in self.events})]
+        path.write_text(json.dumps({"traceEvents": names + self.events,
+                                    "displayTimeUnit": "ms"}), encoding="utf-8")
+
+    def summary(self) -> str:
+        """Table of span count and inclusive time by name, slowest first."""
+        rows: dict[str, list[float]] = {}
+        api: dict[str, list[int]] = {}
+        for e in self.events:
+            if e["ph"] != "X":
+                continue
+            row = rows.setdefault(e["name"], [0, 0.0, 0.0])
+            row[0] += 1
+            row[1] += e["dur"] / 1000
+            row[2] = max(row[2], e["dur"] / 1000)
+            if e["cat"] == "api":
+                args = e.get("args", {})
+                sums = api.setdefault(e["name"], [0, 0, 0])
+                sums[0] += args.get("bytes_sent", 0)
+                sums[1] += args.get("bytes_received", 0)
+                sums[2] += args.get("retries", 0)
+        width = max([len(name) for name in rows] + [4])
+        lines = [f"{'span':<{width}}  {'count':>6}  {'total ms':>10}  {'mean ms':>9}  "
+                 f"{'max ms':>9}"]
+        for name, (count, total, peak) in sorted(rows.items(), key=lambda r: -r[1][1]):
+            line = (f"{name:<{width}}  {count:>6}  {total:>10.1f}  {total / count:>9.2f}  "
+                    f"{peak:>9.1f}")
+            if name in api:
+                sent, received, retries = api[name]
+                line += (f"  {_format_bytes(sent)} sent, {_format_bytes(received)} received"
+                         + (f", {retries} retries" if retries else ""))
+            lines.append(line)
+        return "\n".join(lines)
+
+
+_TRACER = Tracer()
+
 # ---------------------------------------------------------------------------
 # Markdown parser
 # ---------------------------------------------------------------------------
@@ -168,9 +457,10 @@ def build_parser() -> MarkdownIt:
 
 def parse(text: str) -> tuple[dict, SyntaxTreeNode]:
     """Parse *text* and return (frontmatter_dict, syntax_tree_root)."""
-    md = build_parser()
-    tokens = md.parse(text)
-    root = SyntaxTreeNode(tokens)
+    with _TRACER.span("parse markdown", "parse", chars=len(text)):
+        md = build_parser()
+        tokens = md.parse(text)
+        root = SyntaxTreeNode(tokens)
 
     meta: dict = {}
     # Front-matter node is always the first child if present.
@@ -201,7 +491,27 @@ def patch_frontmatter(path: Path, updates: dict) -> None:
     else:
         new_fm = "---\n" + yaml.dump(updates, default_flow_style=False, allow_unicode=True) + "---\n"
         new_text = new_fm + text
-    path.write_text(new_text, encoding="utf-8")
+    _write_atomic(path, new_text)
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    """Replace *path* with *text* via a temp file in the same directory.
+
+    Readers see either the old or the new content, never a partial write,
+    and the file keeps its permission bits.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        try:
+            os.chmod(tmp, path.stat().st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
 
 
 def _strip_frontmatter(text: str) -> str:
@@ -224,6 +534,25 @@ def _split_frontmatter(text: str) -> tuple[str, str]:
         return match.group(1), text[match.end():]
     return "", text
 
+
+def _hash_body(body: str) -> str:
+    """sha256 of a markdown body, as recorded in gdoc_pushed_hash."""
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def _load_frontmatter(text: str) -> tuple[dict, str]:
+    """Split text into (frontmatter fields, body) without parsing the markdown.
+
+    Unreadable frontmatter reads as no fields.
+    """
+    frontmatter, body = _split_frontmatter(text)
+    try:
+        fm = yaml.safe_load(frontmatter[4:-5]) if frontmatter else None
+    except yaml.YAMLError:
+        fm = None
+    return (fm if isinstance(fm, dict) else {}), body
+
+
 def _normalize_for_comparison(text: str) -> str:
     """Normalize markdown for comparison, ignoring insignificant differences.
 
@@ -275,6 +604,7 @@ def _normalize_for_matching(text: str) -> str:
     text = re.sub(r"\[([^\]]+)\]\([^)]+\)", r"\1", text)
     return text.strip()
 
+
 def load_tab_slug_map_from_files(files: list[Path]) -> dict[str, str]:
     """Build a tabId → filename-stem-slug map from local markdown frontmatter.
 
@@ -364,20 +694,35 @@ def plain_text(node: SyntaxTreeNode) -> str:
 
 
 
-def _to_utf16_units(text: str) -> list[str]:
-    """Return a list of UTF-16 code units for *text*.
+# ---------------------------------------------------------------------------
+# UTF-16 offsets
+# ---------------------------------------------------------------------------
+# Docs indices count UTF-16 code units: a character outside the BMP (emoji,
+# math alphanumerics) is one Python code point but two index units.
+
+_ASTRAL_RE = re.compile("[\U00010000-\U0010FFFF]")
+
+
+def utf16_len(text: str) -> int:
+    """Length of *text* in UTF-16 code units, i.e. Docs index units."""
+    if text.isascii():
+        return len(text)
+    return len(text) + len(_ASTRAL_RE.findall(text))
+
+
+class Utf16Offsets:
+    """Map code point offsets in one string to UTF-16 offsets.
 
-    Characters outside the BMP (codepoint > 0xFFFF) become two entries.
+    Only astral characters are recorded, so BMP text costs one regex scan
+    and each lookup is a bisect.
     """
-    units = []
-    for ch in text:
-        cp = ord(ch)
-        if cp > 0xFFFF:
-            units.append(ch)
-            units.append(ch)
-        else:
-            units.append(ch)
-    return units
+
+    def __init__(self, text: str) -> None:
+        self._astral = [] if text.isascii() else [m.start() for m in _ASTRAL_RE.finditer(text)]
+
+    def __call__(self, offset: int) -> int:
+        """UTF-16 offset of code point *offset*."""
+        return offset + bisect.bisect_left(self._astral, offset)
 
 
 @dataclass
@@ -574,7 +919,7 @@ def _insert_text(state: BuildState, text: str) -> None:
             },
         }
     })
-    state.index += len(text)
+    state.index += utf16_len(text)
 
 
 def _insert_text_at(state: BuildState, text: str, index: int) -> None:
@@ -860,6 +1205,10 @@ def handle_fence(state: BuildState, node: SyntaxTreeNode) -> None:
     The Docs REST API has no CODE_BLOCK named style. A single-cell table
     with a grey cell background + Courier New text is the closest visual
     equivalent to the Docs UI 'Building blocks > Code block'.
+
+    The cell paragraph index and the index after the table come from
+    _table_layout(), so the block is queued with the surrounding content and
+    adds no round trips of its own.
     """
     if not state.doc_id:
         # No doc_id: fall back to monospace paragraphs.
@@ -874,7 +1223,7 @@ def handle_fence(state: BuildState, node: SyntaxTreeNode) -> None:
     if not lines:
         return
 
-    # 1. Capture pre-insert index, append insertTable, flush.
+    # 1. Queue the 1x1 table and predict where its single cell paragraph is.
     pre_insert_index = state.index
     state.requests.append({
         "insertTable": {
@@ -886,57 +1235,32 @@ def handle_fence(state: BuildState, node: SyntaxTreeNode) -> None:
             },
         }
     })
-    _flush_requests(state)
-
-    # 2. GET the doc to find the table startIndex and cell para startIndex.
-    doc = _gws("docs", "documents", "get",
-               "--params", json.dumps({
-                   "documentId": state.doc_id,
-                   "includeTabsContent": "true",
-               }))
-    table_si, para_si = _find_last_table_indices(doc, state.tab_id,
-                                                 min_index=pre_insert_index)
-    if para_si is None:
-        _fence_fallback(state, node)
-        return
-
-    # 3. Build content requests: insert lines in reverse order (last first)
-    #    so that index-based inserts don't shift earlier positions.
-    cell_requests: list[Request] = []
-    # Each line is inserted separately so paragraph styles apply per-line.
-    # We insert all at the same para_si in reverse so they stack correctly.
-    for line in reversed(lines):
-        text = line + "\n"
-        cell_requests.append({
-            "insertText": {
-                "text": text,
-                "location": {
-                    "index": para_si,
-                    "segmentId": "",
-                    "tabId": state.tab_id,
-                },
-            }
-        })
-
-    # 4. Style all the inserted text as monospace (range covers all lines).
-    total_len = sum(len(l) + 1 for l in lines)
-    cell_requests.append({
-        "updateTextStyle": {
-            "range": {
-                "startIndex": para_si,
-                "endIndex": para_si + total_len,
-                "segmentId": "",
-                "tabId": state.tab_id,
-            },
-            "textStyle": {
-                "weightedFontFamily": {"fontFamily": "Courier New", "weight": 400},
-            },
-            "fields": "weightedFontFamily",
-        }
-    })
+    table_si = pre_insert_index + 1
+    (para_si,), end_index = _table_layout(table_si, 1, 1)
 
-    # 5. Grey cell background via updateTableCellStyle.
-    cell_requests.append({
+    if state.verify_indices:
+        _flush_requests(state)
+        doc = get_document(state.doc_id, FIELDS_TABLE_INDICES)
+        live_table_si, live_para_si = _find_last_table_indices(
+            doc, state.tab_id, min_index=pre_insert_index)
+        _report_index_check("code block cell", [table_si, para_si],
+                            [i for i in (live_table_si, live_para_si) if i is not None])
+        if live_table_si is not None and live_para_si is not None:
+            table_si, para_si = live_table_si, live_para_si
+
+    # 2. Insert all lines into the cell in one go; each "\n" starts a new
+    #    paragraph inside the cell.
+    code_text = "".join(line + "\n" for line in lines)
+    _insert_text_at(state, code_text, para_si)
+
+    # 3. Style all the inserted text as monospace (range covers all lines).
+    total_len = utf16_len(code_text)
+    _text_style(state, para_si, para_si + total_len,
+                {"weightedFontFamily": {"fontFamily": "Courier New", "weight": 400}},
+                "weightedFontFamily")
+
+    # 4. Grey cell background via updateTableCellStyle.
+    state.requests.append({
         "updateTableCellStyle": {
             "tableRange": {
                 "tableCellLocation": {
@@ -962,19 +1286,18 @@ def handle_fence(state: BuildState, node: SyntaxTreeNode) -> None:
         }
     })
 
-    _gws("docs", "documents", "batchUpdate",
-         "--params", json.dumps({"documentId": state.doc_id}),
-         "--json", json.dumps({"requests": cell_requests}))
-
-    # 6. Advance state.index past the table.
-    doc2 = _gws("docs", "documents", "get",
-                "--params", json.dumps({
-                    "documentId": state.doc_id,
-                    "includeTabsContent": "true",
-                }))
-    state.index = _find_end_index_after_table(
-        doc2, state.tab_id, min_index=pre_insert_index) or state.index
-    _flush_requests(state)
+    # 5. Advance state.index past the table.
+    end_index += total_len
+    if state.verify_indices:
+        _flush_requests(state)
+        doc2 = get_document(state.doc_id, FIELDS_TABLE_INDICES)
+        live_end = _find_end_index_after_table(doc2, state.tab_id,
+                                               min_index=pre_insert_index)
+        _report_index_check("code block end", [end_index],
+                            [live_end] if live_end is not None else [])
+        if live_end is not None:
+            end_index = live_end
+    state.index = end_index
 
 
 def _fence_fallback(state: BuildState, node: SyntaxTreeNode) -> None:
@@ -1024,6 +1347,7 @@ def _find_last_table_indices(doc: dict, tab_id: str,
                         return table_si, para_si
     return None, None
 
+
 def handle_hr(state: BuildState, _node: SyntaxTreeNode) -> None:
     """Render a thematic break as a paragraph with a bottom border."""
     para_start = state.index
@@ -1138,10 +1462,15 @@ def handle_table(state: BuildState, node: SyntaxTreeNode) -> None:
     Strategy:
     1. Collect all rows and cell text/spans from the AST.
     2. Emit an insertTable request (appended to state.requests).
-    3. Flush the current batch to the API so the table exists in the doc.
-    4. GET the document to discover the actual paragraph startIndex of each cell.
-    5. Build insertText + style requests in reverse cell order (so earlier
-       inserts don't shift later indices) and flush them.
+    3. Predict each cell's paragraph startIndex with _table_layout() — the
+       layout of a freshly inserted empty table is deterministic.
+    4. Emit insertText + style requests for every cell into the same queue,
+       in document order, each index shifted by the text already placed in
+       earlier cells.
+
+    The whole table therefore rides in the current batch with no reads.
+    With state.verify_indices the old flush-and-GET path runs instead and
+    reports any disagreement with the model.
     """
     thead = next((c for c in node.children if c.type == "thead"), None)
     tbody_nodes = [c for c in node.children if c.type == "tbody"]
@@ -1170,9 +1499,11 @@ def handle_table(state: BuildState, node: SyntaxTreeNode) -> None:
             spans = inline_spans(inline) if inline else []
             cells.append((spans, is_header))
 
-    # Emit the insertTable request and flush everything so far.
-    # Capture state.index now so we can find THIS table after the flush
-    # (not an earlier one with the same dimensions).
+    if not state.doc_id:
+        # No doc_id — fall back to plain-text representation.
+        _table_fallback(state, all_rows)
+        return
+
     pre_insert_index = state.index
     state.requests.append({
         "insertTable": {
@@ -1184,120 +1515,114 @@ def handle_table(state: BuildState, node: SyntaxTreeNode) -> None:
             },
         }
     })
+    # insertTable places a newline before the table, so it starts one past
+    # the insertion point.
+    cell_indices, end_index = _table_layout(pre_insert_index + 1,
+                                            num_rows, num_cols)
 
-    if not state.doc_id:
-        # No doc_id — fall back to plain-text representation.
-        _table_fallback(state, all_rows)
-        return
+    if state.verify_indices:
+        _flush_requests(state)
+        doc = get_document(state.doc_id, FIELDS_TABLE_INDICES)
+        live = _extract_cell_indices(doc, state.tab_id, num_rows, num_cols,
+                                     min_index=pre_insert_index)
+        _report_index_check(f"table {num_rows}x{num_cols} cells",
+                            cell_indices, live)
+        if live:
+            cell_indices = live
+
+    shift = 0
+    for (spans, is_header), para_start in zip(cells, cell_indices):
+        shift += _fill_table_cell(state, spans, is_header, para_start + shift)
+
+    end_index += shift
+    if state.verify_indices:
+        _flush_requests(state)
+        doc2 = get_document(state.doc_id, FIELDS_TABLE_INDICES)
+        live_end = _find_end_index_after_table(doc2, state.tab_id,
+                                               min_index=pre_insert_index)
+        _report_index_check("table end", [end_index],
+                            [live_end] if live_end is not None else [])
+        if live_end is not None:
+            end_index = live_end
+
+    state.index = end_index
+    # Insert a blank line after the table. It lands at end_index (before the
+    # segment trailing newline), shifting the trailing newline to end_index+1.
+    # _insert_text increments state.index to end_index+1, which is exactly
+    # where the next endOfSegmentLocation insert will land. Correct.
+    _insert_text(state, "\n")   # state.index → end_index+1
 
-    # Flush current requests to the API.
-    _flush_requests(state)
 
-    # GET the document to find cell paragraph indices.
-    doc = _gws("docs", "documents", "get",
-               "--params", json.dumps({
-                   "documentId": state.doc_id,
-                   "includeTabsContent": "true",
-               }))
+def _table_layout(table_start: int, num_rows: int,
+                  num_cols: int) -> tuple[list[int], int]:
+    """Return (cell paragraph startIndex per cell in row-major order,
+    table endIndex) for an empty table whose startIndex is *table_start*.
 
-    cell_indices = _extract_cell_indices(doc, state.tab_id, num_rows, num_cols)
-    if not cell_indices:
-        # Couldn't find cells — skip content (table structure is still there).
-        return
+    An empty table is laid out as one index for the table start, one per row
+    start, one per cell start and one for each cell's empty paragraph:
 
-    # Build cell content requests in reverse order (last cell first) so that
-    # index-based inserts don't shift earlier cell positions.
-    cell_requests: list[Request] = []
-    for flat_idx in reversed(range(len(cells))):
-        if flat_idx >= len(cell_indices):
-            continue
-        para_start = cell_indices[flat_idx]
-        spans, is_header = cells[flat_idx]
-        if not spans:
-            continue
+        table  row  cell "\n"  cell "\n"  row  cell "\n" ...
+          T    T+1  T+2  T+3   T+4  T+5   ...
+
+    so a row spans 1 + 2*cols indices and the table 1 + rows*(1 + 2*cols).
+    """
+    row_len = 1 + 2 * num_cols
+    indices = [table_start + 1 + r * row_len + 1 + 2 * c + 1
+               for r in range(num_rows) for c in range(num_cols)]
+    return indices, table_start + 1 + num_rows * row_len
 
-        # Accumulate text and style requests for this cell.
-        cell_text = ""
-        pending_styles: list[tuple[int, int, dict, str]] = []
-        offset = para_start
 
-        prev_had_style = False
-        for span in spans:
-            if not span.text:
-                continue
-            span_start = offset
-            cell_text_piece = span.text
-            span_end = offset + len(cell_text_piece)
-
-            # Always emit bold/italic/strikethrough explicitly (even False)
-            # so styled spans cannot bleed into adjacent plain spans.
-            style: dict = {
-                "bold": bool(span.bold or is_header),
-                "italic": bool(span.italic),
-                "strikethrough": bool(span.strikethrough),
-            }
-            field_parts = ["bold", "italic", "strikethrough"]
-            if span.code:
-                style["weightedFontFamily"] = {
-                    "fontFamily": "Courier New", "weight": 400}
-                field_parts.append("weightedFontFamily")
-            pending_styles.append((span_start, span_end, style,
-                                   ",".join(field_parts)))
-
-            cell_text += cell_text_piece
-            offset = span_end
-
-        if not cell_text:
+def _fill_table_cell(state: BuildState, spans: list[Span], is_header: bool,
+                     para_start: int) -> int:
+    """Queue insertText + style requests for one cell at *para_start*.
+
+    Returns the length of the inserted text so callers can shift the
+    indices of later cells.
+    """
+    cell_text = ""
+    pending_styles: list[tuple[int, int, dict, str]] = []
+    offset = para_start
+    for span in spans:
+        if not span.text:
             continue
+        span_start = offset
+        span_end = offset + utf16_len(span.text)
 
-        # Insert the text, then apply styles (all at the same absolute indices
-        # since we haven't submitted yet — these will be in the next batch).
-        cell_requests.append({
-            "insertText": {
-                "text": cell_text,
-                "location": {
-                    "index": para_start,
-                    "segmentId": "",
-                    "tabId": state.tab_id,
-                },
-            }
-        })
-        for s_start, s_end, sty, flds in pending_styles:
-            cell_requests.append({
-                "updateTextStyle": {
-                    "range": {
-                        "startIndex": s_start,
-                        "endIndex": s_end,
-                        "segmentId": "",
-                        "tabId": state.tab_id,
-                    },
-                    "textStyle": sty,
-                    "fields": flds,
-                }
-            })
+        # Always emit bold/italic/strikethrough explicitly (even False)
+        # so styled spans cannot bleed into adjacent plain spans.
+        style: dict = {
+            "bold": bool(span.bold or is_header),
+            "italic": bool(span.italic),
+            "strikethrough": bool(span.strikethrough),
+        }
+        field_parts = ["bold", "italic", "strikethrough"]
+        if span.code:
+            style["weightedFontFamily"] = {
+                "fontFamily": "Courier New", "weight": 400}
+            field_parts.append("weightedFontFamily")
+        pending_styles.append((span_start, span_end, style,
+                               ",".join(field_parts)))
 
-    if cell_requests:
-        body = {"requests": cell_requests}
-        _gws("docs", "documents", "batchUpdate",
-             "--params", json.dumps({"documentId": state.doc_id}),
-             "--json", json.dumps(body))
-
-    # Advance state.index past the table. GET the updated doc to find
-    # the paragraph that follows the table.
-    doc2 = _gws("docs", "documents", "get",
-                "--params", json.dumps({
-                    "documentId": state.doc_id,
-                    "includeTabsContent": "true",
-                }))
-    after_index = _find_end_index_after_table(doc2, state.tab_id,
-                                             min_index=pre_insert_index) or state.index
-    state.index = after_index
-    # Insert a blank line after the table. It lands at after_index (before the
-    # segment trailing newline), shifting the trailing newline to after_index+1.
-    # _insert_text increments state.index to after_index+1, which is exactly
-    # where the next endOfSegmentLocation insert will land. Correct.
-    _insert_text(state, "\n")   # state.index → after_index+1
-    _flush_requests(state)
+        cell_text += span.text
+        offset = span_end
+
+    if not cell_text:
+        return 0
+
+    _insert_text_at(state, cell_text, para_start)
+    for s_start, s_end, sty, flds in pending_styles:
+        _text_style(state, s_start, s_end, sty, flds)
+    return offset - para_start
+
+
+def _report_index_check(what: str, predicted: list[int],
+                        live: list[int]) -> None:
+    """Print the outcome of a --verify-indices cross-check to stderr."""
+    if predicted == live:
+        print(f"  verify-indices: {what} ok", file=sys.stderr)
+        return
+    print(f"  verify-indices: {what} MISMATCH predicted={predicted} "
+          f"live={live}", file=sys.stderr)
 
 
 def _extract_cell_indices(doc: dict, tab_id: str,
@@ -1367,7 +1692,240 @@ def _table_fallback(state: BuildState, all_rows: list[SyntaxTreeNode]) -> None:
         _paragraph_style(state, para_start, state.index, "NORMAL_TEXT")
 
 
-def _flush_requests(state: BuildState) -> None:
+# ---------------------------------------------------------------------------
+# Request optimizer
+# ---------------------------------------------------------------------------
+
+
+# Set to False (--no-optimize) to send requests exactly as built.
+OPTIMIZE_REQUESTS = True
+
+# Text-style fields _emit_spans() and _fill_table_cell() reset on every span.
+_RESET_FIELDS = ("bold", "italic", "strikethrough")
+
+# Reset-field values a named style cascades onto its text in a new document;
+# anything not listed cascades False. (The default HEADING_6 is italic.)
+_NAMED_STYLE_TEXT_DEFAULTS: dict[str, dict[str, bool]] = {
+    "HEADING_6": {"italic": True},
+}
+
+
+@dataclass
+class OptimizeReport:
+    """Request and payload sizes before and after optimize_requests()."""
+
+    requests_before: int = 0
+    requests_after: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    @property
+    def requests_saved(self) -> int:
+        return self.requests_before - self.requests_after
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+
+def _encoded_size(requests: list[Request]) -> int:
+    return sum(len(json.dumps(r)) for r in requests)
+
+
+def _range_key(rng: dict) -> tuple[str, str]:
+    return rng.get("tabId", ""), rng.get("segmentId", "")
+
+
+class _IntervalSet:
+    """Intervals added in any order, each carrying a value, queried by overlap."""
+
+    def __init__(self) -> None:
+        self._starts: list[int] = []
+        self._items: list[tuple[int, Any]] = []
+        self._longest = 0
+
+    def add(self, start: int, end: int, value: Any = None) -> None:
+        i = bisect.bisect_right(self._starts, start)
+        self._starts.insert(i, start)
+        self._items.insert(i, (end, value))
+        self._longest = max(self._longest, end - start)
+
+    def overlapping(self, start: int, end: int) -> list[Any]:
+        """Return the values of stored intervals that overlap [start, end)."""
+        hits = []
+        i = bisect.bisect_left(self._starts, end) - 1
+        while i >= 0 and self._starts[i] + self._longest > start:
+            item_end, value = self._items[i]
+            if item_end > start:
+                hits.append(value)
+            i -= 1
+        return hits
+
+
+def _drop_cascaded_resets(requests: list[Request]) -> list[Request]:
+    """Remove styling that restates what a fresh tab already has.
+
+    Only valid when every character the batch inserts starts out unstyled
+    (BuildState.fresh_tab): NORMAL_TEXT is then every paragraph's named
+    style already, and a bold/italic/strikethrough False that matches the
+    paragraph's named-style cascade is a no-op unless an earlier request in
+    the batch set that field True over the same text.
+    """
+    named: dict[tuple[str, str], _IntervalSet] = {}
+    for req in requests:
+        body = req.get("updateParagraphStyle")
+        if body is None or "namedStyleType" not in body["paragraphStyle"]:
+            continue
+        name = body["paragraphStyle"]["namedStyleType"]
+        if name in _NAMED_STYLE_TEXT_DEFAULTS:
+            rng = body["range"]
+            named.setdefault(_range_key(rng), _IntervalSet()).add(
+                rng["startIndex"], rng["endIndex"], name)
+
+    set_true: dict[tuple[str, str, str], _IntervalSet] = {}
+    out: list[Request] = []
+    for req in requests:
+        body = req.get("updateParagraphStyle")
+        if (body is not None and body["fields"] == "namedStyleType"
+                and body["paragraphStyle"].get("namedStyleType") == "NORMAL_TEXT"):
+            continue
+        body = req.get("updateTextStyle")
+        if body is None:
+            out.append(req)
+            continue
+        rng = body["range"]
+        start, end = rng["startIndex"], rng["endIndex"]
+        key = _range_key(rng)
+        fields = body["fields"].split(",")
+        style = body["textStyle"]
+        cascaded: dict[str, bool] = {}
+        if key in named:
+            for style_name in named[key].overlapping(start, end):
+                for name, value in _NAMED_STYLE_TEXT_DEFAULTS[style_name].items():
+                    cascaded[name] = cascaded.get(name, False) or value
+        keep = []
+        for name in fields:
+            if name in _RESET_FIELDS:
+                value = bool(style.get(name, False))
+                stored = set_true.get((*key, name))
+                if value:
+                    set_true.setdefault((*key, name), _IntervalSet()).add(start, end)
+                elif not cascaded.get(name) and not (stored and stored.overlapping(start, end)):
+                    continue
+            keep.append(name)
+        if len(keep) == len(fields):
+            out.append(req)
+        elif keep:
+            out.append({"updateTextStyle": {
+                **body,
+                "textStyle": {k: v for k, v in style.items() if k in keep},
+                "fields": ",".join(keep),
+            }})
+    return out
+
+
+def _merged_range(prev: dict, body: dict) -> dict | None:
+    """Union of two request ranges if they touch or overlap in one segment."""
+    a, b = prev["range"], body["range"]
+    if _range_key(a) != _range_key(b):
+        return None
+    if b["startIndex"] > a["endIndex"] or a["startIndex"] > b["endIndex"]:
+        return None
+    return {**a, "startIndex": min(a["startIndex"], b["startIndex"]),
+            "endIndex": max(a["endIndex"], b["endIndex"])}
+
+
+# Range requests that can absorb a neighbour with the same payload. A
+# bullet request covering paragraphs that already have bullets replaces
+# them, so one createParagraphBullets over the union is equivalent.
+_MERGEABLE = {
+    "updateTextStyle": ("textStyle", "fields"),
+    "updateParagraphStyle": ("paragraphStyle", "fields"),
+    "createParagraphBullets": ("bulletPreset",),
+}
+
+
+def _coalesce(requests: list[Request]) -> list[Request]:
+    """Merge each request into its predecessor where the result is identical.
+
+    Consecutive end-of-segment inserts into the same tab become one insert,
+    and consecutive range requests of the same kind and payload whose ranges
+    touch or overlap become one request over the union.
+    """
+    out: list[Request] = []
+    texts: dict[int, list[str]] = {}
+    for req in requests:
+        (kind, body), = req.items()
+        prev_kind, prev_body = next(iter(out[-1].items())) if out else (None, None)
+        if kind != prev_kind:
+            out.append(req)
+            continue
+        if kind == "insertText":
+            location = body.get("endOfSegmentLocation")
+            if location is not None and location == prev_body.get("endOfSegmentLocation"):
+                texts.setdefault(len(out) - 1, [prev_body["text"]]).append(body["text"])
+                continue
+        elif kind in _MERGEABLE and all(body.get(k) == prev_body.get(k)
+                                        for k in _MERGEABLE[kind]):
+            union = _merged_range(prev_body, body)
+            if union is not None:
+                out[-1] = {kind: {**prev_body, "range": union}}
+                continue
+        out.append(req)
+    for i, parts in texts.items():
+        body = out[i]["insertText"]
+        out[i] = {"insertText": {**body, "text": "".join(parts)}}
+    return out
+
+
+def optimize_requests(requests: list[Request],
+                      fresh_tab: bool = False) -> tuple[list[Request], OptimizeReport]:
+    """Return an equivalent, shorter request list and what it saved.
+
+    *requests* must already be in send order (see _send_order). Adjacent
+    inserts, text styles, paragraph styles and bullet ranges are merged;
+    with *fresh_tab*, NORMAL_TEXT paragraph styles and span resets that
+    match the cascaded named style are dropped first.
+    """
+    report = OptimizeReport(requests_before=len(requests),
+                            bytes_before=_encoded_size(requests))
+    if fresh_tab:
+        requests = _drop_cascaded_resets(requests)
+    out = _coalesce(requests)
+    report.requests_after = len(out)
+    report.bytes_after = _encoded_size(out)
+    return out, report
+
+
+def _send_order(requests: list[Request]) -> list[Request]:
+    """Return *requests* regrouped into the order _flush_requests sends them."""
+    inserts  = [r for r in requests if "insertText"  in r or "insertTable" in r]
+    para_sty = [r for r in requests if "updateParagraphStyle" in r]
+    text_sty = [r for r in requests if "updateTextStyle" in r]
+    rest     = [r for r in requests
+                if not any(k in r for k in (
+                    "insertText", "insertTable",
+                    "updateParagraphStyle", "updateTextStyle"))]
+    return inserts + para_sty + text_sty + rest
+
+
+def _styles_tail(requests: list[Request], tab_id: str, index: int) -> bool:
+    """True if a text style in *requests* covers the character before *index*.
+
+    Text appended at the end of the segment inherits that character's style.
+    """
+    for req in requests:
+        body = req.get("updateTextStyle")
+        if body is None:
+            continue
+        rng = body["range"]
+        if (rng.get("tabId") == tab_id
+                and rng["startIndex"] < index <= rng["endIndex"]):
+            return True
+    return False
+
+
+def _flush_requests(state: BuildState, wait: bool = True) -> None:
     """Submit all pending requests to the API and clear the list.
 
     Ordering guarantee: text must exist before styles can be applied to it.
@@ -1382,26 +1940,43 @@ def _flush_requests(state: BuildState) -> None:
       2. All updateParagraphStyle      — named style defaults cascade
       3. All updateTextStyle           — explicit styles win over cascade
       4. Everything else (bullets, table cell styles, etc.)
+
+    The ordered list then goes through optimize_requests().
+
+    With a state.sender the window is queued on it; unless *wait* is False
+    this still returns only once everything queued has been sent, so the
+    caller may read the document straight after.
     """
     if not state.requests or not state.doc_id:
+        if wait and state.sender is not None:
+            state.sender.drain()
         return
 
-    inserts  = [r for r in state.requests if "insertText"  in r or "insertTable" in r]
-    para_sty = [r for r in state.requests if "updateParagraphStyle" in r]
-    text_sty = [r for r in state.requests if "updateTextStyle" in r]
-    rest     = [r for r in state.requests
-                if not any(k in r for k in (
-                    "insertText", "insertTable",
-                    "updateParagraphStyle", "updateTextStyle"))]
-
-    ordered = inserts + para_sty + text_sty + rest
-
-    batch_size = 500
-    for i in range(0, len(ordered), batch_size):
-        _gws("docs", "documents", "batchUpdate",
-             "--params", json.dumps({"documentId": state.doc_id}),
-             "--json", json.dumps({"requests": ordered[i:i + batch_size]}))
+    with _TRACER.span("flush", "build", built=len(state.requests), wait=wait) as span:
+        ordered = _send_order(state.requests)
+        if OPTIMIZE_REQUESTS:
+            with _TRACER.span("optimize_requests", "build"):
+                ordered, report = optimize_requests(ordered, fresh_tab=state.fresh_tab)
+            _SCHEDULER.record_savings(report)
+            if report.requests_saved:
+                print(f"Optimized {report.requests_before} → {report.requests_after} "
+                      f"requests (saved {report.requests_saved} requests, "
+                      f"{_format_bytes(report.bytes_saved)})", file=sys.stderr)
+        span.set(sent=len(ordered))
+
+        if state.plan is not None:
+            state.plan.extend(ordered)
+        if state.sender is not None:
+            state.sender.submit(ordered)
+            if wait:
+                state.sender.drain()
+        else:
+            send_requests(state.doc_id, ordered)
     state.requests.clear()
+    # Text appended from now on inherits the style of the last character
+    # written, so it only starts out unstyled if this window left that plain.
+    state.fresh_tab = state.fresh_tab and not _styles_tail(ordered, state.tab_id,
+                                                           state.index)
 
 
 # ---------------------------------------------------------------------------
@@ -1409,7 +1984,29 @@ def _flush_requests(state: BuildState) -> None:
 # ---------------------------------------------------------------------------
 
 
+# Node type → the handler a trace span is named after.
+_TRACED_HANDLERS = {
+    "heading": "handle_heading",
+    "paragraph": "handle_paragraph",
+    "fence": "handle_fence",
+    "code_block": "handle_fence",
+    "hr": "handle_hr",
+    "bullet_list": "handle_list",
+    "ordered_list": "handle_list",
+    "blockquote": "handle_blockquote",
+    "table": "handle_table",
+}
+
+
 def _process_node(state: BuildState, node: SyntaxTreeNode) -> None:
+    if _TRACER.enabled and node.type in _TRACED_HANDLERS:
+        with _TRACER.span(_TRACED_HANDLERS[node.type], "build", index=state.index):
+            _dispatch_node(state, node)
+    else:
+        _dispatch_node(state, node)
+
+
+def _dispatch_node(state: BuildState, node: SyntaxTreeNode) -> None:
     t = node.type
 
     if t in ("front_matter", "html_block"):
@@ -1434,6 +2031,10 @@ def _process_node(state: BuildState, node: SyntaxTreeNode) -> None:
     elif t == "root":
         for child in node.children:
             _process_node(state, child)
+            # Between top-level blocks every queued index is final, so a
+            # full window can go out while later blocks are still built.
+            if state.sender is not None and len(state.requests) >= STREAM_WINDOW_REQUESTS:
+                _flush_requests(state, wait=False)
     else:
         for child in node.children:
             _process_node(state, child)
@@ -1465,11 +2066,146 @@ def build_requests(path: Path, state: BuildState) -> list[Request]:
     return build_requests_from_text(text, state)
 
 
+# ---------------------------------------------------------------------------
+# Request plan cache
+# ---------------------------------------------------------------------------
+
+# Request keys that hold body indices; rebasing a plan shifts exactly these.
+_PLAN_INDEX_KEYS = frozenset(("index", "startIndex", "endIndex"))
+
+_CODE_VERSION = ""
+
+
+def _code_version() -> str:
+    """Digest of this module's source, so any change to md2gdoc drops cached plans."""
+    global _CODE_VERSION
+    if not _CODE_VERSION:
+        _CODE_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+    return _CODE_VERSION
+
+
+def _plan_cache_dir() -> Path:
+    root = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(root) / "md2gdoc" / "plans"
+
+
+def plan_key(body: str, state: BuildState) -> str:
+    """Cache key for building markdown *body* into *state*'s tab.
+
+    Tab ids are swapped for placeholders in a stored plan, so the key holds
+    the tab_map's stems (and which of them is the tab itself) rather than
+    its ids: a plan built for one document is reused for a new one.
+    """
+    context = json.dumps({
+        "version": _code_version(),
+        "optimize": OPTIMIZE_REQUESTS,
+        "fresh_tab": state.fresh_tab,
+        "tabs": sorted([stem, tab_id == state.tab_id] for stem, tab_id in state.tab_map.items()),
+        "body": _hash_body(body),
+    }, sort_keys=True)
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+
+def _relocate(obj: Any, shift: int, tab_ids: dict[str, str]) -> Any:
+    """Copy request JSON *obj* with indices moved by *shift* and tab ids mapped."""
+    if isinstance(obj, dict):
+        return {k: (v + shift if k in _PLAN_INDEX_KEYS and isinstance(v, int)
+                    else tab_ids.get(v, v) if k == "tabId"
+                    else _relocate(v, shift, tab_ids))
+                for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_relocate(v, shift, tab_ids) for v in obj]
+    return obj
+
+
+def store_plan(key: str, state: BuildState, base: int) -> None:
+    """Save the requests recorded in state.plan, relative to index *base*.
+
+    The tab's own id becomes "" and linked tabs become "@<stem>". A cache
+    that cannot be written only costs the next run a rebuild.
+    """
+    placeholders = {tab_id: f"@{stem}" for stem, tab_id in state.tab_map.items()}
+    placeholders[state.tab_id] = ""
+    plan = {
+        "requests": _relocate(state.plan or [], -base, placeholders),
+        "deferred_links": [[start - base, end - base, href]
+                           for start, end, href in state.deferred_links],
+        "length": state.index - base,
+    }
+    path = _plan_cache_dir() / f"{key}.json"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _write_atomic(path, json.dumps(plan, ensure_ascii=False, separators=(",", ":")))
+    except OSError as e:
+        print(f"Warning: could not cache request plan: {e}", file=sys.stderr)
+
+
+def load_plan(key: str, state: BuildState) -> bool:
+    """Send the cached plan for *key* into *state*'s tab at state.index.
+
+    The plan's requests are already in send order and optimized, so they
+    bypass _flush_requests(). Returns False, having sent nothing, on a miss.
+    """
+    try:
+        plan = json.loads((_plan_cache_dir() / f"{key}.json").read_text(encoding="utf-8"))
+        tab_ids = {f"@{stem}": tab_id for stem, tab_id in state.tab_map.items()}
+        tab_ids[""] = state.tab_id
+        base = state.index
+        requests = _relocate(plan["requests"], base, tab_ids)
+        deferred = [(start + base, end + base, href)
+                    for start, end, href in plan["deferred_links"]]
+        length = int(plan["length"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+    if requests:
+        if state.sender is not None:
+            state.sender.submit(requests)
+        else:
+            send_requests(state.doc_id, requests)
+    state.deferred_links.extend(deferred)
+    state.index = base + length
+    return True
+
+
+def build_tab(path: Path, state: BuildState) -> str:
+    """Write *path* into *state*'s tab and send everything; return the body hash.
+
+    An unchanged body is rebased from its cached plan without parsing;
+    anything else is built as usual and its plan stored for next time.
+    --verify-indices reads the document mid-build, so it skips the cache.
+    """
+    text = path.read_text(encoding="utf-8")
+    body = _strip_frontmatter(text)
+    if state.verify_indices or not state.doc_id:
+        build_requests_from_text(text, state)
+        _flush_requests(state)
+        return _hash_body(body)
+
+    key = plan_key(body, state)
+    with _TRACER.span("load plan", "cache") as span:
+        hit = load_plan(key, state)
+        span.set(hit=hit)
+    if hit:
+        print(f"Reusing cached request plan for {path.name}", file=sys.stderr)
+        _flush_requests(state)
+        return _hash_body(body)
+
+    base = state.index
+    state.plan = []
+    build_requests_from_text(text, state)
+    _flush_requests(state)
+    store_plan(key, state, base)
+    state.plan = None
+    return _hash_body(body)
+
+
 def extract_tab_regions(doc: dict, tab_id: str) -> list[Region]:
     """Extract editable leaf regions from *tab_id* in *doc*.
 
-    Each Region carries *raw_para* — the full API paragraph dict — so that
-    render_tab_as_markdown() can reconstruct inline styles and structure.
+    Each Region carries *raw_para* — the full API paragraph dict. Rendering
+    walks the body directly (see iter_tab_markdown); regions serve the
+    line-based diff mapping in map_lines_to_indices().
     """
     regions: list[Region] = []
     tab = _find_tab(doc.get("tabs", []), tab_id)
@@ -1530,170 +2266,145 @@ def extract_tab_regions(doc: dict, tab_id: str) -> list[Region]:
     return regions
 
 
-def extract_tab_with_source_map(
+def _iter_tab_blocks(
     doc: dict,
     tab_id: str,
     tab_slug_map: dict[str, str] | None = None,
     heading_slug_map: dict[str, str] | None = None,
     url_slug_map: dict[str, str] | None = None,
-) -> tuple[str, list[SourceSpan]]:
-    """Extract tab content as markdown with source map for surgical updates.
-
-    Returns (markdown_string, source_spans) where each SourceSpan maps a
-    markdown byte range to its corresponding API byte range.
-
-    For tables, each cell content maps to the cell's API range, while
-    synthetic markdown (pipes, separators) has api_start=None.
+) -> Iterator[tuple]:
+    """Walk *tab_id*'s body once, yielding each rendered block in order.
+
+    A paragraph with visible content comes out as ("paragraph", md, kind,
+    start, end), where kind is "heading", "list-item" or "paragraph". A
+    table comes out as ("table", grid): grid[row][col] is (md, start, end,
+    paragraph) for the cell's last paragraph, or None where the cell has
+    none. Only the block being yielded is held in memory.
     """
-    regions = extract_tab_regions(doc, tab_id)
-    spans: list[SourceSpan] = []
-    md_parts: list[str] = []
-    md_offset = 0  # Current byte offset in the markdown output
-
-    def emit(text: str, api_start: int | None, api_end: int | None,
-             kind: str, path: tuple[str, ...], region_idx: int | None = None,
-             synthetic: bool = False, raw_text: str | None = None) -> None:
-        """Append text to output and record its source span."""
+    tab = _find_tab(doc.get("tabs", []), tab_id)
+    if tab is None:
+        return
+    maps = {"tab_slug_map": tab_slug_map, "heading_slug_map": heading_slug_map,
+            "url_slug_map": url_slug_map}
+    bullet_counters: dict = {}
+    for el in tab.get("documentTab", {}).get("body", {}).get("content", []):
+        para = el.get("paragraph")
+        if para is not None:
+            bullet = para.get("bullet")
+            if not bullet:
+                bullet_counters = {}
+            md = _render_paragraph_as_markdown(para, bullet_counters, **maps)
+            if md.strip():
+                named_style = para.get("paragraphStyle", {}).get("namedStyleType", "")
+                if _NAMED_STYLE_TO_HEADING.get(named_style, 0):
+                    kind = "heading"
+                elif bullet:
+                    kind = "list-item"
+                else:
+                    kind = "paragraph"
+                yield "paragraph", md, kind, el.get("startIndex", 0), el.get("endIndex", 0)
+            continue
+
+        table = el.get("table")
+        if table is None:
+            continue
+        # The first row is the header row; a cell shows its last paragraph.
+        last: dict[tuple[int, int], dict] = {}
+        for row_idx, row in enumerate(table.get("tableRows", [])):
+            for col_idx, cell in enumerate(row.get("tableCells", [])):
+                for cell_el in cell.get("content", []):
+                    if cell_el.get("paragraph") is not None:
+                        last[(row_idx, col_idx)] = cell_el
+        if not last:
+            continue
+        grid: list[list[tuple[str, int, int, dict] | None]] = [
+            [None] * (max(c for _, c in last) + 1)
+            for _ in range(max(r for r, _ in last) + 1)
+        ]
+        for (row_idx, col_idx), cell_el in last.items():
+            cell_para = cell_el["paragraph"]
+            cell_md = _render_paragraph_as_markdown(
+                cell_para, {}, strip_bold=row_idx == 0, **maps,
+            ) if cell_para else ""
+            grid[row_idx][col_idx] = (cell_md, cell_el.get("startIndex", 0),
+                                      cell_el.get("endIndex", 0), cell_para)
+        yield "table", grid
+
+
+def extract_tab_with_source_map(
+    doc: dict,
+    tab_id: str,
+    tab_slug_map: dict[str, str] | None = None,
+    heading_slug_map: dict[str, str] | None = None,
+    url_slug_map: dict[str, str] | None = None,
+) -> tuple[str, SourceMap]:
+    """Extract tab content as markdown with source map for surgical updates.
+
+    Returns (markdown_string, source_map) where each span of the map ties a
+    markdown byte range to its corresponding API byte range.
+
+    For tables, each cell content maps to the cell's API range, while
+    synthetic markdown (pipes, separators) has api_start=None.
+    """
+    spans = SourceMap()
+    md_parts: list[str] = []
+    md_offset = 0  # Current byte offset in the markdown output
+
+    def emit(text: str, api_start: int | None, api_end: int | None, kind: str,
+             block: int, row: int = -1, col: int = -1,
+             raw_text: str | None = None) -> None:
+        """Append text to output and record its source span."""
         nonlocal md_offset
         # For cells, always emit a span even if text is empty (need API indices)
         # For other kinds, skip empty text
         if not text and kind != "cell":
             return
-        md_start = md_offset
-        md_end = md_offset + len(text.encode("utf-8")) if text else md_offset
-        spans.append(SourceSpan(
-            md_start=md_start,
-            md_end=md_end,
-            api_start=api_start,
-            api_end=api_end,
-            kind=kind,
-            path=path,
-            region_idx=region_idx,
-            synthetic=synthetic,
-            raw_text=raw_text,
-        ))
+        md_end = md_offset + (len(text) if text.isascii() else len(text.encode("utf-8")))
+        spans.append(md_offset, md_end, api_start, api_end, kind, block, row, col, raw_text)
         if text:
             md_parts.append(text)
             md_offset = md_end
 
-    bullet_counters: dict = {}
-    i = 0
     para_idx = 0  # Track paragraph index for path
     table_idx = 0  # Track table index for path
 
-    while i < len(regions):
-        region = regions[i]
-
-        if region.kind == "paragraph":
-            if not region.raw_para.get("bullet"):
-                bullet_counters = {}
-            md = _render_paragraph_as_markdown(
-                region.raw_para, bullet_counters,
-                tab_slug_map=tab_slug_map, heading_slug_map=heading_slug_map,
-                url_slug_map=url_slug_map,
-            )
-            if md.strip():
-                # Determine kind based on heading level
-                if region.heading_level > 0:
-                    kind = "heading"
-                elif region.raw_para.get("bullet"):
-                    kind = "list-item"
-                else:
-                    kind = "paragraph"
-
-                # Add blank line after non-list paragraphs for standard markdown spacing
-                suffix = "\n" if kind != "list-item" else ""
-                emit(
-                    md + "\n" + suffix,
-                    region.start_api,
-                    region.end_api,
-                    kind,
-                    (kind, str(para_idx)),
-                    region_idx=i,
-                )
-                para_idx += 1
-            i += 1
-            continue
-
-        if region.kind == "table_cell":
-            table_start_api = region.table_start_api
-            cells: list[Region] = []
-            cell_indices: list[int] = []
-            j = i
-            while (j < len(regions) and
-                   regions[j].kind == "table_cell" and
-                   regions[j].table_start_api == table_start_api):
-                cells.append(regions[j])
-                cell_indices.append(j)
-                j += 1
-
-            if cells:
-                max_row = max(c.row for c in cells)
-                max_col = max(c.col for c in cells)
-
-                # Build grid of (cell_md, cell_region, cell_idx)
-                grid: list[list[tuple[str, Region | None, int | None]]] = [
-                    [("|", None, None) for _ in range(max_col + 1)]
-                    for _ in range(max_row + 1)
-                ]
-                for cell, cell_idx in zip(cells, cell_indices):
-                    cell_md = _render_paragraph_as_markdown(
-                        cell.raw_para, {},
-                        tab_slug_map=tab_slug_map, heading_slug_map=heading_slug_map,
-                        url_slug_map=url_slug_map, strip_bold=cell.is_table_header,
-                    ) if cell.raw_para else cell.text
-                    grid[cell.row][cell.col] = (cell_md, cell, cell_idx)
-
-                table_path_base = ("table", str(table_idx))
-
-                # Emit header row
-                if grid:
-                    # Leading pipe (synthetic)
-                    emit("| ", None, None, "table-syntax", table_path_base, synthetic=True)
-
-                    for col_idx, (cell_md, cell, cell_idx) in enumerate(grid[0]):
-                        cell_path = table_path_base + ("row", "0", "cell", str(col_idx))
-                        if cell:
-                            emit(cell_md, cell.start_api, cell.end_api, "cell", cell_path, region_idx=cell_idx, raw_text=cell.text)
-                        else:
-                            emit(cell_md, None, None, "cell", cell_path)
-                        if col_idx < len(grid[0]) - 1:
-                            emit(" | ", None, None, "table-syntax", table_path_base, synthetic=True)
-
-                    emit(" |\n", None, None, "table-syntax", table_path_base, synthetic=True)
-
-                    # Separator row (all synthetic)
-                    sep = "| " + " | ".join(":---" for _ in grid[0]) + " |\n"
-                    emit(sep, None, None, "table-separator", table_path_base, synthetic=True)
-
-                    # Data rows
-                    for row_idx, row in enumerate(grid[1:], start=1):
-                        emit("| ", None, None, "table-syntax", table_path_base, synthetic=True)
-                        for col_idx, (cell_md, cell, cell_idx) in enumerate(row):
-                            cell_path = table_path_base + ("row", str(row_idx), "cell", str(col_idx))
-                            if cell:
-                                emit(cell_md, cell.start_api, cell.end_api, "cell", cell_path, region_idx=cell_idx, raw_text=cell.text)
-                            else:
-                                emit(cell_md, None, None, "cell", cell_path)
-                            if col_idx < len(row) - 1:
-                                emit(" | ", None, None, "table-syntax", table_path_base, synthetic=True)
-                        emit(" |\n", None, None, "table-syntax", table_path_base, synthetic=True)
-
-                    # Blank line after table
-                    emit("\n", None, None, "blank", table_path_base, synthetic=True)
-
-                table_idx += 1
-
-            i = j
+    for block in _iter_tab_blocks(doc, tab_id, tab_slug_map, heading_slug_map, url_slug_map):
+        if block[0] == "paragraph":
+            _, md, kind, start, end = block
+            # Add blank line after non-list paragraphs for standard markdown spacing
+            suffix = "\n" if kind != "list-item" else ""
+            emit(md + "\n" + suffix, start, end, kind, para_idx)
+            para_idx += 1
             continue
 
-        i += 1
+        grid = block[1]
+        for row_idx, row in enumerate(grid):
+            emit("| ", None, None, "table-syntax", table_idx)
+            for col_idx, cell in enumerate(row):
+                if cell is not None:
+                    cell_md, start, end, cell_para = cell
+                    emit(cell_md, start, end, "cell", table_idx, row_idx, col_idx,
+                         raw_text=_paragraph_text_from_api(cell_para))
+                else:
+                    emit("|", None, None, "cell", table_idx, row_idx, col_idx)
+                if col_idx < len(row) - 1:
+                    emit(" | ", None, None, "table-syntax", table_idx)
+            emit(" |\n", None, None, "table-syntax", table_idx)
+            if row_idx == 0:
+                # Separator row (all synthetic)
+                sep = "| " + " | ".join(":---" for _ in row) + " |\n"
+                emit(sep, None, None, "table-separator", table_idx)
+
+        # Blank line after table
+        emit("\n", None, None, "blank", table_idx)
+        table_idx += 1
 
     return "".join(md_parts), spans
 
+
 def parse_to_segments(
     markdown: str,
-    spans: list[SourceSpan] | None = None,
+    spans: SourceMap | None = None,
 ) -> list[Segment]:
     """Parse markdown into a segment tree for alignment.
 
@@ -1702,6 +2413,8 @@ def parse_to_segments(
     """
     segments: list[Segment] = []
     lines = markdown.splitlines(keepends=True)
+    # UTF-8 size of each line, measured once; ASCII lines need no encoding
+    sizes = [len(line) if line.isascii() else len(line.encode("utf-8")) for line in lines]
     byte_offset = 0
     para_idx = 0
     table_idx = 0
@@ -1709,29 +2422,12 @@ def parse_to_segments(
 
     def find_span_at(offset: int) -> SourceSpan | None:
         """Find the span containing the given byte offset."""
-        if not spans:
-            return None
-        for span in spans:
-            if span.md_start <= offset < span.md_end and not span.synthetic:
-                return span
-        return None
-
-    def find_span_by_path(path: tuple[str, ...]) -> SourceSpan | None:
-        """Find the span with the matching path."""
-        if not spans:
-            return None
-        for span in spans:
-            if span.path == path:
-                return span
-        return None
-
-    def line_bytes(line: str) -> int:
-        return len(line.encode("utf-8"))
+        return spans.find_at(offset) if spans is not None else None
 
     while i < len(lines):
         line = lines[i]
         line_start = byte_offset
-        line_len = line_bytes(line)
+        line_len = sizes[i]
 
         # Skip blank lines
         if not line.strip():
@@ -1769,7 +2465,7 @@ def parse_to_segments(
             while i < len(lines):
                 code_line = lines[i]
                 code_lines.append(code_line)
-                byte_offset += line_bytes(code_line)
+                byte_offset += sizes[i]
                 i += 1
                 if code_line.strip().startswith(fence_char):
                     break
@@ -1790,11 +2486,11 @@ def parse_to_segments(
 
         # Table (starts with |)
         if line.strip().startswith("|"):
-            table_lines: list[str] = []
+            table_lines: list[tuple[str, int]] = []
             table_start = byte_offset
             while i < len(lines) and lines[i].strip().startswith("|"):
-                table_lines.append(lines[i])
-                byte_offset += line_bytes(lines[i])
+                table_lines.append((lines[i], sizes[i]))
+                byte_offset += sizes[i]
                 i += 1
             table_end = byte_offset
 
@@ -1804,10 +2500,9 @@ def parse_to_segments(
             row_idx = 0
             cell_offset = table_start
 
-            for tl in table_lines:
-                tl_bytes = line_bytes(tl)
-                # Skip separator row
-                if re.match(r"^\|[\s:|-]+\|\s*$", tl):
+            for tl, tl_bytes in table_lines:
+                # Skip separator row (a row of empty cells has no dashes)
+                if re.match(r"^\|[\s:|-]+\|\s*$", tl) and "-" in tl:
                     cell_offset += tl_bytes
                     continue
 
@@ -1840,7 +2535,8 @@ def parse_to_segments(
                 for col_idx, cell_text in enumerate(cell_contents):
                     cell_text = cell_text.strip()
                     cell_path = table_path + ("row", str(row_idx), "cell", str(col_idx))
-                    span = find_span_by_path(cell_path)
+                    span = (spans.find_cell(table_idx, row_idx, col_idx)
+                            if spans is not None else None)
                     children.append(Segment(
                         kind="cell",
                         path=cell_path,
@@ -1866,7 +2562,7 @@ def parse_to_segments(
             table_idx += 1
             # Skip trailing blank line
             if i < len(lines) and not lines[i].strip():
-                byte_offset += line_bytes(lines[i])
+                byte_offset += sizes[i]
                 i += 1
             continue
 
@@ -1895,7 +2591,7 @@ def parse_to_segments(
             quote_lines: list[str] = []
             while i < len(lines) and lines[i].strip().startswith(">"):
                 quote_lines.append(lines[i])
-                byte_offset += line_bytes(lines[i])
+                byte_offset += sizes[i]
                 i += 1
             quote_end = byte_offset
             text = "\n".join(line.lstrip("> ").rstrip() for line in quote_lines)
@@ -1927,120 +2623,337 @@ def parse_to_segments(
 
     return segments
 
+
+# Text style fields update-tab writes on every run it inserts, so text never
+# inherits a style from its neighbours (see _emit_spans).
+_RUN_STYLE_FIELDS = ("bold", "italic", "strikethrough", "weightedFontFamily",
+                     "backgroundColor", "link", "foregroundColor")
+
+
+def _paragraph_runs(para: dict, heading_ids: dict[str, str] | None = None,
+                    ) -> list[tuple[str, dict]]:
+    """Return the (text, textStyle) runs of *para*, styles cut to _RUN_STYLE_FIELDS.
+
+    With *heading_ids*, heading links are moved onto the ids it maps them
+    to; a heading it does not know loses its link.
+    """
+    runs: list[tuple[str, dict]] = []
+    for pe in para.get("elements", []):
+        run = pe.get("textRun")
+        if not run or not run.get("content"):
+            continue
+        style = {k: v for k, v in run.get("textStyle", {}).items() if k in _RUN_STYLE_FIELDS}
+        link = style.get("link")
+        if heading_ids is not None and link and "headingId" in link:
+            target = heading_ids.get(link["headingId"])
+            if target:
+                style["link"] = {"headingId": target}
+            else:
+                del style["link"]
+        runs.append((run["content"], style))
+    return runs
+
+
+def _strip_final_newline(runs: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+    if runs and runs[-1][0].endswith("\n"):
+        text, style = runs[-1]
+        runs = runs[:-1] + ([(text[:-1], style)] if len(text) > 1 else [])
+    return runs
+
+
+def bind_segments(segments: list[Segment], doc: dict, tab_id: str,
+                  heading_ids: dict[str, str] | None = None) -> None:
+    """Tie the top-level *segments* of tab *tab_id* to the elements of *doc*.
+
+    Each segment's span is widened to its block: from its first element up
+    to the next segment's, so the empty paragraphs after a block go with
+    it, and the last block stops short of the body's final newline. Tables
+    get the table's range and cells all their paragraphs. Segments also
+    get the runs an in-place edit rewrites (see _paragraph_runs for
+    *heading_ids*). A segment whose first element also starts the one
+    before it, such as the second line of a paragraph with a line break,
+    is left unbound.
+    """
+    tab = _find_tab(doc.get("tabs", []), tab_id)
+    content = tab.get("documentTab", {}).get("body", {}).get("content", []) if tab else []
+    starts = [el.get("startIndex", 0) for el in content]
+    body_end = content[-1].get("endIndex", 1) if content else 1
+
+    bound: list[tuple[Segment, int]] = []
+    for seg in segments:
+        if seg.kind == "table":
+            cell_spans = [c.span for c in seg.children if c.span and c.span.api_start is not None]
+            at = cell_spans[0].api_start if cell_spans else None
+        else:
+            at = seg.span.api_start if seg.span else None
+        i = bisect.bisect_right(starts, at) - 1 if at is not None else -1
+        if i < 0 or (bound and bound[-1][1] >= i):
+            seg.span = None
+            continue
+        if seg.kind != "table" and starts[i] != at:
+            seg.span = None
+            continue
+        bound.append((seg, i))
+
+    for n, (seg, i) in enumerate(bound):
+        nxt = bound[n + 1][1] if n + 1 < len(bound) else len(content)
+        end = starts[nxt] if nxt < len(content) else body_end - 1
+        seg.elements = content[i:nxt]
+        first = content[i]
+        seg.span = SourceSpan(
+            md_start=seg.md_start, md_end=seg.md_end, api_start=starts[i],
+            api_end=max(end, starts[i]), kind=seg.kind, path=seg.path,
+        )
+        if "table" in first:
+            rows = first["table"].get("tableRows", [])
+            for cell in seg.children:
+                r, c = int(cell.path[3]), int(cell.path[5])
+                cells = rows[r].get("tableCells", []) if r < len(rows) else []
+                paras = cells[c].get("content", []) if c < len(cells) else []
+                if not paras:
+                    cell.span = None
+                    continue
+                cell.elements = paras
+                cell.span = SourceSpan(
+                    md_start=cell.md_start, md_end=cell.md_end,
+                    api_start=paras[0].get("startIndex", 0),
+                    api_end=paras[-1].get("endIndex", 0), kind="cell", path=cell.path,
+                )
+                cell.runs = _strip_final_newline([
+                    run for el in paras if "paragraph" in el
+                    for run in _paragraph_runs(el["paragraph"], heading_ids)])
+        elif "paragraph" in first and seg.kind not in ("blockquote", "code-block"):
+            seg.runs = _strip_final_newline(_paragraph_runs(first["paragraph"], heading_ids))
+
+
+def _similarity(old_norm: str, new_norm: str) -> float:
+    """Prefix / containment similarity of two normalized segment texts."""
+    shorter = min(len(old_norm), len(new_norm))
+    longer = max(len(old_norm), len(new_norm))
+    if longer == 0:
+        return 1.0
+    # Both scores are bounded by shorter/longer, so skip hopeless pairs early
+    if shorter <= 0.3 * longer:
+        return 0.0
+    common = 0
+    for c1, c2 in zip(old_norm, new_norm):
+        if c1 != c2:
+            break
+        common += 1
+    ratio = common / longer
+    # Also check if new is a superset/subset
+    if old_norm in new_norm or new_norm in old_norm:
+        ratio = max(ratio, shorter / longer)
+    return ratio
+
+
+def _anchor_pairs(
+    old_keys: list[tuple[str, str]],
+    new_keys: list[tuple[str, str]],
+) -> list[tuple[int, int]]:
+    """Order-preserving (old, new) index pairs of segments with equal keys.
+
+    Patience alignment: common prefix and suffix runs are paired, then keys
+    occurring exactly once on both sides are anchored along their longest
+    increasing subsequence, and each gap between anchors is aligned the same
+    way. Gaps without unique keys fall back to pairing equal keys in order.
+    """
+    pairs: list[tuple[int, int]] = []
+    stack = [(0, len(old_keys), 0, len(new_keys))]
+    while stack:
+        olo, ohi, nlo, nhi = stack.pop()
+        while olo < ohi and nlo < nhi and old_keys[olo] == new_keys[nlo]:
+            pairs.append((olo, nlo))
+            olo += 1
+            nlo += 1
+        while olo < ohi and nlo < nhi and old_keys[ohi - 1] == new_keys[nhi - 1]:
+            ohi -= 1
+            nhi -= 1
+            pairs.append((ohi, nhi))
+        if olo == ohi or nlo == nhi:
+            continue
+
+        old_count: dict[tuple[str, str], int] = {}
+        old_at: dict[tuple[str, str], int] = {}
+        for i in range(olo, ohi):
+            key = old_keys[i]
+            old_count[key] = old_count.get(key, 0) + 1
+            old_at[key] = i
+        new_count: dict[tuple[str, str], int] = {}
+        for j in range(nlo, nhi):
+            key = new_keys[j]
+            if key in old_count:
+                new_count[key] = new_count.get(key, 0) + 1
+        unique = [(old_at[new_keys[j]], j) for j in range(nlo, nhi)
+                  if new_count.get(new_keys[j]) == 1 and old_count[new_keys[j]] == 1]
+
+        if not unique:
+            # Only repeated keys: pair each with the next free occurrence
+            positions: dict[tuple[str, str], list[int]] = {}
+            for i in range(olo, ohi):
+                positions.setdefault(old_keys[i], []).append(i)
+            last = olo - 1
+            for j in range(nlo, nhi):
+                candidates = positions.get(new_keys[j])
+                if not candidates:
+                    continue
+                k = bisect.bisect_right(candidates, last)
+                if k < len(candidates):
+                    last = candidates[k]
+                    pairs.append((last, j))
+            continue
+
+        # Longest increasing run of old indices (patience sorting)
+        tails: list[int] = []
+        tail_at: list[int] = []
+        prev: list[int] = [-1] * len(unique)
+        for u, (i, _j) in enumerate(unique):
+            k = bisect.bisect_left(tails, i)
+            if k == len(tails):
+                tails.append(i)
+                tail_at.append(u)
+            else:
+                tails[k] = i
+                tail_at[k] = u
+            prev[u] = tail_at[k - 1] if k else -1
+        anchors: list[tuple[int, int]] = []
+        u = tail_at[-1]
+        while u >= 0:
+            anchors.append(unique[u])
+            u = prev[u]
+        anchors.reverse()
+
+        pairs.extend(anchors)
+        for i, j in anchors:
+            stack.append((olo, i, nlo, j))
+            olo, nlo = i + 1, j + 1
+        stack.append((olo, ohi, nlo, nhi))
+    pairs.sort()
+    return pairs
+
+
+def _segment_key(seg: Segment) -> tuple[str, str]:
+    """The (kind, text) a segment is aligned by.
+
+    A table is keyed by its shape and cell texts, so tables pair by content
+    and only with tables whose cells line up.
+    """
+    if seg.kind == "table":
+        shape: dict[str, int] = {}
+        for child in seg.children:
+            shape[child.path[-3]] = shape.get(child.path[-3], 0) + 1
+        return (f"table:{','.join(map(str, shape.values()))}",
+                "\n".join(child.text for child in seg.children))
+    return seg.kind, seg.text
+
+
+def _pair(old_seg: Segment, new_seg: Segment, always: bool = False) -> list[SegmentMatch]:
+    """Matches that turn *old_seg* into *new_seg*.
+
+    A segment that cannot be edited in place is deleted; the next
+    alignment pass then finds *new_seg* unmatched and inserts it. With
+    *always*, an unchanged pair is still reported (tables, whose children
+    are aligned later, and similarity pairs).
+    """
+    edits = _segment_edits(old_seg, new_seg)
+    if edits is None:
+        return [SegmentMatch(kind="deleted", old_segment=old_seg)]
+    if edits or always:
+        return [SegmentMatch(kind="matched", old_segment=old_seg,
+                             new_segment=new_seg, edits=edits)]
+    return []
+
+
+def _align_cells(old_cells: list[Segment], new_cells: list[Segment]) -> list[SegmentMatch]:
+    """Pair the cells of one matched table by row and column.
+
+    Cells without a counterpart on the other side are left alone: a cell
+    can neither be deleted nor inserted as a paragraph.
+    """
+    old_at = {seg.path[-4:]: seg for seg in old_cells}
+    matches: list[SegmentMatch] = []
+    for new_seg in new_cells:
+        old_seg = old_at.get(new_seg.path[-4:])
+        if old_seg is None:
+            continue
+        edits = _segment_edits(old_seg, new_seg)
+        if edits:
+            matches.append(SegmentMatch(kind="matched", old_segment=old_seg,
+                                        new_segment=new_seg, edits=edits))
+    return matches
+
+
 def align_segments(
     old_segments: list[Segment],
     new_segments: list[Segment],
 ) -> list[SegmentMatch]:
     """Align old (extracted) and new (local) segment lists.
 
-    Uses content-based matching: segments are matched by kind and text similarity,
-    not by positional index. This handles insertions/deletions gracefully.
+    Uses content-based matching: segments are matched by kind and normalized
+    text along an order-preserving anchor alignment, then edited segments are
+    paired by similarity only within the gaps between anchors. This handles
+    insertions/deletions gracefully and stays near-linear for small edits.
     """
     matches: list[SegmentMatch] = []
-    used_old: set[int] = set()
-    used_new: set[int] = set()
-
-    # First pass: find exact matches by (kind, normalized_text)
-    old_by_content: dict[tuple[str, str], list[int]] = {}
-    for i, seg in enumerate(old_segments):
-        key = (seg.kind, _normalize_for_matching(seg.text))
-        old_by_content.setdefault(key, []).append(i)
-
-    for j, new_seg in enumerate(new_segments):
-        key = (new_seg.kind, _normalize_for_matching(new_seg.text))
-        if key in old_by_content and old_by_content[key]:
-            i = old_by_content[key].pop(0)  # Take first available match
-            used_old.add(i)
-            used_new.add(j)
-            # Exact match (after normalization) — may still need text edits for link format
-            old_seg = old_segments[i]
-            if old_seg.text != new_seg.text:
-                edits = diff_segment_text(old_seg.text, new_seg.text)
-                if edits:
-                    matches.append(SegmentMatch(
-                        kind="matched",
-                        old_segment=old_seg,
-                        new_segment=new_seg,
-                        edits=edits,
-                    ))
-            elif new_seg.kind == "table":
-                matches.append(SegmentMatch(
-                    kind="matched",
-                    old_segment=old_seg,
-                    new_segment=new_seg,
-                ))
-
-    # Special pass for cells: match by path since table structure is fixed
-    old_cells_by_path: dict[tuple[str, ...], int] = {}
-    for i, seg in enumerate(old_segments):
-        if seg.kind == "cell" and i not in used_old:
-            old_cells_by_path[seg.path] = i
-    
-    for j, new_seg in enumerate(new_segments):
-        if new_seg.kind == "cell" and j not in used_new:
-            if new_seg.path in old_cells_by_path:
-                i = old_cells_by_path[new_seg.path]
-                used_old.add(i)
-                used_new.add(j)
-                old_seg = old_segments[i]
-                # Even if content is very different, treat as matched for cells
-                if old_seg.text != new_seg.text:
-                    edits = diff_segment_text(old_seg.text, new_seg.text)
-                    matches.append(SegmentMatch(
-                        kind="matched",
-                        old_segment=old_seg,
-                        new_segment=new_seg,
-                        edits=edits if edits else [],
-                    ))
-
-    # Second pass: find similar matches by kind (for modified content)
-    for j, new_seg in enumerate(new_segments):
-        if j in used_new:
+    # new index -> old index for every matched segment
+    new_to_old: dict[int, int] = {}
+
+    # Table cells are fixed by the table structure: they are paired by
+    # row and column only, never anchored, inserted or deleted
+    old_cells = [seg for seg in old_segments if seg.kind == "cell"]
+    new_cells = [seg for seg in new_segments if seg.kind == "cell"]
+    if old_cells or new_cells:
+        old_segments = [seg for seg in old_segments if seg.kind != "cell"]
+        new_segments = [seg for seg in new_segments if seg.kind != "cell"]
+        matches.extend(_align_cells(old_cells, new_cells))
+
+    # Normalize once; the keys drive every pass below
+    old_keys = [_segment_key(seg) for seg in old_segments]
+    new_keys = [_segment_key(seg) for seg in new_segments]
+    old_norms = [_normalize_for_matching(text) for _, text in old_keys]
+    new_norms = [_normalize_for_matching(text) for _, text in new_keys]
+    old_keys = [(kind, norm) for (kind, _), norm in zip(old_keys, old_norms)]
+    new_keys = [(kind, norm) for (kind, _), norm in zip(new_keys, new_norms)]
+
+    # First pass: anchor exact matches by (kind, normalized_text). They may
+    # still need edits for link format or styling.
+    anchors = _anchor_pairs(old_keys, new_keys)
+    for i, j in anchors:
+        new_to_old[j] = i
+        new_seg = new_segments[j]
+        matches.extend(_pair(old_segments[i], new_seg, always=new_seg.kind == "table"))
+    used_old = set(i for i, _ in anchors)
+
+    # Second pass: find similar matches by kind (for modified content), only
+    # between old and new segments that fall in the same gap between anchors
+    bounds = [(-1, -1), *anchors, (len(old_segments), len(new_segments))]
+    for (olo, nlo), (ohi, nhi) in zip(bounds, bounds[1:]):
+        gap_old: dict[str, list[int]] = {}
+        for i in range(olo + 1, ohi):
+            if i not in used_old:
+                gap_old.setdefault(old_keys[i][0], []).append(i)
+        if not gap_old:
             continue
-        best_match: int | None = None
-        best_ratio: float = 0.0
-        for i, old_seg in enumerate(old_segments):
-            if i in used_old:
+        for j in range(nlo + 1, nhi):
+            kind = new_keys[j][0]
+            if j in new_to_old or not gap_old.get(kind):
                 continue
-            if old_seg.kind != new_seg.kind:
-                continue
-            # Compute similarity ratio using normalized text
-            old_norm = _normalize_for_matching(old_seg.text)
-            new_norm = _normalize_for_matching(new_seg.text)
-            shorter = min(len(old_norm), len(new_norm))
-            longer = max(len(old_norm), len(new_norm))
-            if longer == 0:
-                ratio = 1.0
-            else:
-                # Simple prefix/suffix similarity
-                common = 0
-                for c1, c2 in zip(old_norm, new_norm):
-                    if c1 == c2:
-                        common += 1
-                    else:
-                        break
-                ratio = common / longer if longer > 0 else 0
-                # Also check if new is a superset/subset
-                if old_norm in new_norm or new_norm in old_norm:
-                    ratio = max(ratio, shorter / longer)
-
-            if ratio > best_ratio and ratio > 0.3:  # Minimum 30% similarity
-                best_ratio = ratio
-                best_match = i
-
-        if best_match is not None:
-            used_old.add(best_match)
-            used_new.add(j)
-            old_seg = old_segments[best_match]
-            edits = diff_segment_text(old_seg.text, new_seg.text)
-            # Always add the match (even if no edits needed)
-            # This ensures insertion points can be calculated from matched segments
-            matches.append(SegmentMatch(
-                kind="matched",
-                old_segment=old_seg,
-                new_segment=new_seg,
-                edits=edits if edits else [],
-            ))
+            candidates = gap_old[kind]
+            best_match: int | None = None
+            best_ratio: float = 0.0
+            for k, i in enumerate(candidates):
+                ratio = _similarity(old_norms[i], new_norms[j])
+                if ratio > best_ratio and ratio > 0.3:  # Minimum 30% similarity
+                    best_ratio = ratio
+                    best_match = k
+
+            if best_match is not None:
+                i = candidates.pop(best_match)
+                used_old.add(i)
+                new_to_old[j] = i
+                # Always add the match (even if no edits needed)
+                # This ensures insertion points can be calculated from matched segments
+                matches.extend(_pair(old_segments[i], new_segments[j], always=True))
 
     # Remaining old segments are deletions
     for i, old_seg in enumerate(old_segments):
@@ -2050,42 +2963,35 @@ def align_segments(
                 old_segment=old_seg,
             ))
 
-    # Remaining new segments are insertions
-    # For each, find the insertion point based on preceding matched segment
-    # Build a map of new_segment index -> old_segment (for matched segments)
-    new_to_old_matched: dict[int, Segment] = {}
-    for m in matches:
-        if m.kind == "matched" and m.new_segment and m.old_segment:
-            # Find the new_segment's index
-            for idx, seg in enumerate(new_segments):
-                if seg is m.new_segment:
-                    new_to_old_matched[idx] = m.old_segment
-                    break
+    # Remaining new segments are insertions, placed after the nearest
+    # preceding matched segment, else before the nearest following one.
+    # Unbound segments have no span and are skipped over.
+    after: list[int | None] = [None] * len(new_segments)
+    anchor_api: int | None = None
+    for j in range(len(new_segments)):
+        after[j] = anchor_api
+        if j in new_to_old:
+            span = old_segments[new_to_old[j]].span
+            if span is not None:
+                anchor_api = span.api_end
+    before: list[int | None] = [None] * len(new_segments)
+    anchor_api = None
+    for j in range(len(new_segments) - 1, -1, -1):
+        before[j] = anchor_api
+        if j in new_to_old:
+            span = old_segments[new_to_old[j]].span
+            if span is not None:
+                anchor_api = span.api_start
 
     for j, new_seg in enumerate(new_segments):
-        if j not in used_new:
-            # Find the nearest preceding matched segment
-            insert_after_api = None
-            for k in range(j - 1, -1, -1):
-                if k in new_to_old_matched:
-                    old_seg = new_to_old_matched[k]
-                    if old_seg.span and old_seg.span.api_end is not None:
-                        insert_after_api = old_seg.span.api_end
-                    break
-            
-            # If no preceding match, try to find the next matched segment and insert before it
+        if j not in new_to_old:
+            insert_after_api = after[j]
             if insert_after_api is None:
-                for k in range(j + 1, len(new_segments)):
-                    if k in new_to_old_matched:
-                        old_seg = new_to_old_matched[k]
-                        if old_seg.span and old_seg.span.api_start is not None:
-                            insert_after_api = old_seg.span.api_start
-                        break
-            
+                insert_after_api = before[j]
             # If still no match, use document start (index 1, after the initial newline)
             if insert_after_api is None:
                 insert_after_api = 1
-            
+
             matches.append(SegmentMatch(
                 kind="inserted",
                 new_segment=new_seg,
@@ -2106,444 +3012,490 @@ def align_segments(
     return matches
 
 
+# Word-level diff tokens: words, whitespace runs, single other characters
+_DIFF_TOKEN_RE = re.compile(r"\w+|\s+|.", re.DOTALL)
+# Past this many token insertions + deletions, one edit over the changed middle
+_DIFF_MAX_COST = 256
+# Unchanged gaps shorter than this are folded into the surrounding edits;
+# re-sending a few characters is cheaper than another delete + insert pair
+_DIFF_MERGE_GAP = 3
+
+
+def _myers_matches(a: list[str], b: list[str], max_cost: int) -> list[tuple[int, int]] | None:
+    """Return matching (i, j) token pairs of a shortest edit script, ascending.
+
+    Myers' O(ND) greedy diff; None when the script needs more than
+    *max_cost* insertions and deletions.
+    """
+    n, m = len(a), len(b)
+    offset = max_cost + 1
+    v = [0] * (2 * offset + 1)
+    trace: list[list[int]] = []
+    for d in range(max_cost + 1):
+        trace.append(v[:])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                break
+        else:
+            continue
+        break
+    else:
+        return None
+
+    # Walk the trace back from (n, m), collecting the diagonal moves
+    pairs: list[tuple[int, int]] = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[offset + prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            pairs.append((x, y))
+        x, y = prev_x, prev_y
+    pairs.reverse()
+    return pairs
+
+
 def diff_segment_text(old_text: str, new_text: str) -> list[TextEdit]:
     """Compute minimal text edits between old and new segment text.
 
-    Uses prefix/suffix stripping to minimize the edit range,
-    preserving as much of the original byte positions as possible.
+    Diffs the texts word by word (Myers) and returns one TextEdit per
+    changed run, ascending and non-overlapping, with offsets relative to
+    old_text. Edits separated by only a few unchanged characters are merged.
+    Apply them from last to first so earlier offsets stay valid.
     """
-    # Find common prefix
-    prefix_len = 0
-    min_len = min(len(old_text), len(new_text))
-    while prefix_len < min_len and old_text[prefix_len] == new_text[prefix_len]:
-        prefix_len += 1
+    if old_text == new_text:
+        return []
+    a = _DIFF_TOKEN_RE.findall(old_text)
+    b = _DIFF_TOKEN_RE.findall(new_text)
+
+    # Character offset of each token boundary
+    a_at = [0]
+    for tok in a:
+        a_at.append(a_at[-1] + len(tok))
+    b_at = [0]
+    for tok in b:
+        b_at.append(b_at[-1] + len(tok))
+
+    # Common token prefix/suffix need no diffing
+    lo = 0
+    while lo < len(a) and lo < len(b) and a[lo] == b[lo]:
+        lo += 1
+    hi = 0
+    while hi < len(a) - lo and hi < len(b) - lo and a[-(hi + 1)] == b[-(hi + 1)]:
+        hi += 1
+
+    middle = _myers_matches(a[lo:len(a) - hi], b[lo:len(b) - hi], _DIFF_MAX_COST)
+    if middle is None:
+        # Too different to be worth it: replace the whole changed region
+        middle = []
+    pairs = [(i + lo, j + lo) for i, j in middle] + [(len(a) - hi + t, len(b) - hi + t)
+                                                      for t in range(hi)]
+
+    edits: list[TextEdit] = []
+    i = j = lo
+    for mi, mj in pairs + [(len(a), len(b))]:
+        if mi > i or mj > j:
+            start, end = a_at[i], a_at[mi]
+            text = new_text[b_at[j]:b_at[mj]]
+            if edits and start - edits[-1].end < _DIFF_MERGE_GAP:
+                prev = edits[-1]
+                gap = old_text[prev.end:start]
+                edits[-1] = TextEdit(start=prev.start, end=end,
+                                     new_text=prev.new_text + gap + text)
+            else:
+                edits.append(TextEdit(start=start, end=end, new_text=text))
+        i, j = mi + 1, mj + 1
+    return edits
+
+
+def _style_key(style: dict) -> tuple:
+    """The part of a run's style a FIELDS_TAB_CONTENT read can show."""
+    link = style.get("link")
+    return (bool(style.get("bold")), bool(style.get("italic")),
+            bool(style.get("strikethrough")),
+            style.get("weightedFontFamily", {}).get("fontFamily", ""),
+            tuple(sorted(link.items())) if link else ())
 
-    # Find common suffix (avoiding overlap with prefix)
-    suffix_len = 0
-    while (suffix_len < min_len - prefix_len and
-           old_text[-(suffix_len + 1)] == new_text[-(suffix_len + 1)]):
-        suffix_len += 1
 
-    # Calculate the changed region
-    old_changed_start = prefix_len
-    old_changed_end = len(old_text) - suffix_len
-    new_changed = new_text[prefix_len:len(new_text) - suffix_len if suffix_len else len(new_text)]
+def diff_segment_runs(old_runs: list[tuple[str, dict]],
+                      new_runs: list[tuple[str, dict]]) -> list[TextEdit]:
+    """Compute minimal edits turning *old_runs* into *new_runs*.
 
-    if old_changed_start == old_changed_end and not new_changed:
-        # No actual change
+    Like diff_segment_text, but over rendered text: tokens are compared
+    with their style, offsets are UTF-16 units of the old text, and each
+    edit carries the styled runs it inserts.
+    """
+    def tokenize(runs: list[tuple[str, dict]]) -> list[tuple[str, dict, tuple]]:
+        return [(tok, style, _style_key(style))
+                for text, style in runs for tok in _DIFF_TOKEN_RE.findall(text)]
+
+    a = tokenize(old_runs)
+    b = tokenize(new_runs)
+    a_keys = [(tok, key) for tok, _, key in a]
+    b_keys = [(tok, key) for tok, _, key in b]
+    if a_keys == b_keys:
         return []
+    a_at = [0]
+    for tok, _, _ in a:
+        a_at.append(a_at[-1] + utf16_len(tok))
+
+    lo = 0
+    while lo < len(a) and lo < len(b) and a_keys[lo] == b_keys[lo]:
+        lo += 1
+    hi = 0
+    while hi < len(a) - lo and hi < len(b) - lo and a_keys[-(hi + 1)] == b_keys[-(hi + 1)]:
+        hi += 1
+    middle = _myers_matches(a_keys[lo:len(a) - hi], b_keys[lo:len(b) - hi], _DIFF_MAX_COST)
+    if middle is None:
+        middle = []
+    pairs = [(i + lo, j + lo) for i, j in middle] + [(len(a) - hi + t, len(b) - hi + t)
+                                                      for t in range(hi)]
+
+    # Changed token ranges (old i0:i1, new j0:j1), close ones merged
+    ranges: list[list[int]] = []
+    i = j = lo
+    for mi, mj in pairs + [(len(a), len(b))]:
+        if mi > i or mj > j:
+            if ranges and a_at[i] - a_at[ranges[-1][1]] < _DIFF_MERGE_GAP:
+                ranges[-1][1], ranges[-1][3] = mi, mj
+            else:
+                ranges.append([i, mi, j, mj])
+        i, j = mi + 1, mj + 1
+
+    edits: list[TextEdit] = []
+    for i0, i1, j0, j1 in ranges:
+        runs: list[tuple[str, dict]] = []
+        for tok, style, _ in b[j0:j1]:
+            if runs and runs[-1][1] == style:
+                runs[-1] = (runs[-1][0] + tok, style)
+            else:
+                runs.append((tok, style))
+        edits.append(TextEdit(start=a_at[i0], end=a_at[i1],
+                              new_text="".join(text for text, _ in runs), runs=runs))
+    return edits
 
-    return [TextEdit(
-        start=old_changed_start,
-        end=old_changed_end,
-        new_text=new_changed,
-    )]
 
-def edits_to_requests(
-    match: SegmentMatch,
-    tab_id: str,
-    tab_map: dict[str, str],
-    doc_id: str,
-) -> list[Request]:
-    """Convert a SegmentMatch to batchUpdate requests.
+def _segment_edits(old_seg: Segment, new_seg: Segment) -> list[TextEdit] | None:
+    """Edits turning *old_seg* into *new_seg* in place, or None if impossible.
 
-    For matched segments: compute minimal deleteContentRange + insertText.
-    For deleted segments: deleteContentRange for the whole segment.
-    For inserted segments: insertText at appropriate position.
-    For replaced segments: delete old, insert new with styling.
+    Bound segments are diffed on their runs. Segments without any API
+    binding (local-only parses) fall back to their markdown text; a bound
+    segment that differs but has no runs cannot be edited in place.
     """
-    requests: list[Request] = []
+    if old_seg.runs is not None and new_seg.runs is not None:
+        return diff_segment_runs(old_seg.runs, new_seg.runs)
+    if old_seg.span is None and new_seg.span is None:
+        return diff_segment_text(old_seg.text, new_seg.text)
+    return [] if old_seg.text == new_seg.text else None
 
-    if match.kind == "matched" and match.old_segment and match.edits:
-        # Minimal text edits within a matched segment
-        seg = match.old_segment
-        if not seg.span or seg.span.api_start is None:
-            # No API mapping — can't update
-            return []
-
-        # For cells, we need to handle the markdown-to-API text mismatch.
-        # The markdown has wikilinks [[slug|text]] but API has just the display text.
-        # Strategy: delete old content, insert new display text, apply link styling.
-        # Return as a grouped list so they execute in order.
-        if seg.kind == "cell":
-            api_start = seg.span.api_start
-            api_end = seg.span.api_end
-
-            if api_end is None or api_start is None:
-                return []
 
-            new_text = match.new_segment.text if match.new_segment else ""
-            cell_requests: list[Request] = []
-
-            # Delete old content (but not the trailing newline which is structural)
-            # Cell content ends with \n, we should keep one character for structure
-            delete_end = api_end - 1 if api_end > api_start else api_end
-            if delete_end > api_start:
-                cell_requests.append({
-                    "deleteContentRange": {
-                        "range": {
-                            "startIndex": api_start,
-                            "endIndex": delete_end,
-                            "segmentId": "",
-                            "tabId": tab_id,
-                        }
-                    }
-                })
+def _range(start: int, end: int, tab_id: str) -> dict:
+    return {"startIndex": start, "endIndex": end, "segmentId": "", "tabId": tab_id}
 
-            # Parse wikilinks from new text and build insert + link requests
-            if new_text:
-                # Convert wikilinks to display text and track link positions
-                wikilink_pattern = re.compile(r"\[\[([^|\]]+)\|?([^\]]*)\]\]")
-                display_text = ""
-                link_ranges: list[tuple[int, int, str]] = []  # (start, end, url)
-                last_end = 0
-
-                for m in wikilink_pattern.finditer(new_text):
-                    # Add text before wikilink
-                    display_text += new_text[last_end:m.start()]
-                    link_start = len(display_text)
-
-                    # Extract slug and display
-                    slug = m.group(1)
-                    display = m.group(2) if m.group(2) else slug
-                    display_text += display
-                    link_end = len(display_text)
-
-                    # Build URL from slug using reversed tab_map (slug -> tab_id)
-                    slug_to_tab = {v: k for k, v in tab_map.items()}
-                    if slug in slug_to_tab:
-                        tab_target = slug_to_tab[slug]
-                        url = f"https://docs.google.com/document/d/{doc_id}/edit?tab={tab_target}"
-                        link_ranges.append((link_start, link_end, url))
-
-                    last_end = m.end()
-
-                # Add remaining text after last wikilink
-                display_text += new_text[last_end:]
-
-                # Insert the display text
-                cell_requests.append({
-                    "insertText": {
-                        "location": {
-                            "index": api_start,
-                            "segmentId": "",
-                            "tabId": tab_id,
-                        },
-                        "text": display_text,
-                    }
-                })
 
-                # Apply link styling for each wikilink
-                for link_start, link_end, url in link_ranges:
-                    cell_requests.append({
-                        "updateTextStyle": {
-                            "range": {
-                                "startIndex": api_start + link_start,
-                                "endIndex": api_start + link_end,
-                                "segmentId": "",
-                                "tabId": tab_id,
-                            },
-                            "textStyle": {
-                                "link": {"url": url}
-                            },
-                            "fields": "link",
-                        }
-                    })
+def _styled_insert(runs: list[tuple[str, dict]], index: int, tab_id: str) -> list[Request]:
+    """Insert *runs* at *index*, each with its full style written out."""
+    text = "".join(t for t, _ in runs)
+    if not text:
+        return []
+    requests: list[Request] = [{"insertText": {
+        "location": {"index": index, "segmentId": "", "tabId": tab_id},
+        "text": text,
+    }}]
+    at = index
+    for run_text, style in runs:
+        size = utf16_len(run_text)
+        requests.append({"updateTextStyle": {
+            "range": _range(at, at + size, tab_id),
+            "textStyle": style,
+            "fields": ",".join(_RUN_STYLE_FIELDS),
+        }})
+        at += size
+    return requests
 
-            # Return as a "grouped" request that will be flattened but kept in order
-            # We use a special marker dict to indicate this is a group
-            return [{"__cell_group__": cell_requests, "__sort_index__": api_start}]
-        else:
-            # For non-cell segments, apply edits with wikilink handling
-            # We need to group delete/insert/style together for each edit
-            edit_requests: list[Request] = []
-            
-            for edit in match.edits:
-                # Translate segment-relative offsets to API-absolute
-                api_start = seg.span.api_start + edit.start
-                api_end = seg.span.api_start + edit.end
-
-                # Delete the old text
-                if api_end > api_start:
-                    edit_requests.append({
-                        "deleteContentRange": {
-                            "range": {
-                                "startIndex": api_start,
-                                "endIndex": api_end,
-                                "segmentId": "",
-                                "tabId": tab_id,
-                            }
-                        }
-                    })
-
-                # Parse wikilinks from new text
-                new_text = edit.new_text
-                if new_text:
-                    wikilink_pattern = re.compile(r"\[\[([^|\]]+)\|?([^\]]*)\]\]")
-                    display_text = ""
-                    link_ranges: list[tuple[int, int, str]] = []
-                    last_end = 0
-
-                    for m in wikilink_pattern.finditer(new_text):
-                        display_text += new_text[last_end:m.start()]
-                        link_start = len(display_text)
-                        slug = m.group(1)
-                        display = m.group(2) if m.group(2) else slug
-                        display_text += display
-                        link_end = len(display_text)
-
-                        slug_to_tab = {v: k for k, v in tab_map.items()}
-                        if slug in slug_to_tab:
-                            tab_target = slug_to_tab[slug]
-                            url = f"https://docs.google.com/document/d/{doc_id}/edit?tab={tab_target}"
-                            link_ranges.append((link_start, link_end, url))
-
-                        last_end = m.end()
-
-                    display_text += new_text[last_end:]
-
-                    # Insert the display text
-                    edit_requests.append({
-                        "insertText": {
-                            "location": {
-                                "index": api_start,
-                                "segmentId": "",
-                                "tabId": tab_id,
-                            },
-                            "text": display_text,
-                        }
-                    })
-
-                    # Apply link styling for each wikilink
-                    for link_start, link_end, url in link_ranges:
-                        edit_requests.append({
-                            "updateTextStyle": {
-                                "range": {
-                                    "startIndex": api_start + link_start,
-                                    "endIndex": api_start + link_end,
-                                    "segmentId": "",
-                                    "tabId": tab_id,
-                                },
-                                "textStyle": {
-                                    "link": {"url": url}
-                                },
-                                "fields": "link",
-                            }
-                        })
-
-            # Return as grouped request to maintain order
-            if edit_requests:
-                return [{"__edit_group__": edit_requests, "__sort_index__": seg.span.api_start}]
-    elif match.kind == "deleted" and match.old_segment:
-        # Delete the entire segment
-        # SKIP table cells - you can't delete a cell, only modify its content
-        seg = match.old_segment
-        if seg.kind == "cell":
-            # Table cells can't be deleted - skip
-            pass
-        elif seg.span and seg.span.api_start is not None and seg.span.api_end is not None:
-            api_start = seg.span.api_start
-            api_end = seg.span.api_end
-            if api_end > api_start:
-                requests.append({
-                    "deleteContentRange": {
-                        "range": {
-                            "startIndex": api_start,
-                            "endIndex": api_end,
-                            "segmentId": "",
-                            "tabId": tab_id,
-                        }
-                    }
-                })
 
-    elif match.kind == "inserted" and match.new_segment:
-        # Insert new segment at the calculated insertion point
-        new_seg = match.new_segment
-        insert_at = match.insert_after_api
-
-        if insert_at is None:
-            # No insertion point found - skip
-            return []
-
-        # Use grouped requests to ensure proper ordering
-        insert_requests: list[Request] = []
-
-        # Parse wikilinks from new text
-        new_text = new_seg.text
-        wikilink_pattern = re.compile(r"\[\[([^|\]]+)\|?([^\]]*)\]\]")
-        display_text = ""
-        link_ranges: list[tuple[int, int, str]] = []
-        last_end = 0
-
-        for m in wikilink_pattern.finditer(new_text):
-            display_text += new_text[last_end:m.start()]
-            link_start = len(display_text)
-            slug = m.group(1)
-            display = m.group(2) if m.group(2) else slug
-            display_text += display
-            link_end = len(display_text)
-
-            slug_to_tab = {v: k for k, v in tab_map.items()}
-            if slug in slug_to_tab:
-                tab_target = slug_to_tab[slug]
-                url = f"https://docs.google.com/document/d/{doc_id}/edit?tab={tab_target}"
-                link_ranges.append((link_start, link_end, url))
-
-            last_end = m.end()
-
-        display_text += new_text[last_end:]
-
-        # Add newline if not present (paragraphs need trailing newline)
-        if display_text and not display_text.endswith("\n"):
-            display_text += "\n"
-
-        # Insert the text
-        insert_requests.append({
-            "insertText": {
-                "location": {
-                    "index": insert_at,
-                    "segmentId": "",
-                    "tabId": tab_id,
-                },
-                "text": display_text,
-            }
-        })
+# Paragraph style fields the builder sets; inserted paragraphs get all of
+# them written out so none is inherited from the paragraph they split.
+_PARAGRAPH_STYLE_FIELDS = ("namedStyleType", "borderLeft", "indentStart", "borderBottom")
 
-        # Apply link styling
-        for link_start, link_end, url in link_ranges:
-            insert_requests.append({
-                "updateTextStyle": {
-                    "range": {
-                        "startIndex": insert_at + link_start,
-                        "endIndex": insert_at + link_end,
-                        "segmentId": "",
-                        "tabId": tab_id,
-                    },
-                    "textStyle": {
-                        "link": {"url": url}
-                    },
-                    "fields": "link",
-                }
-            })
 
-        # Return as grouped request with insertion_order for proper sequencing
-        return [{"__insert_group__": insert_requests, "__sort_index__": insert_at}]
-
-    elif match.kind == "replaced" and match.old_segment and match.new_segment:
-        # Delete old, insert new with styling
-        old_seg = match.old_segment
-        new_seg = match.new_segment
-
-        if old_seg.span and old_seg.span.api_start is not None and old_seg.span.api_end is not None:
-            api_start = old_seg.span.api_start
-            api_end = old_seg.span.api_end
-
-            # Delete old content
-            if api_end > api_start:
-                requests.append({
-                    "deleteContentRange": {
-                        "range": {
-                            "startIndex": api_start,
-                            "endIndex": api_end,
-                            "segmentId": "",
-                            "tabId": tab_id,
-                        }
-                    }
-                })
+def _reset_paragraph(start: int, tab_id: str, bulleted: bool) -> list[Request]:
+    """Make the paragraph at *start* a plain one, as an empty line must be."""
+    requests: list[Request] = [{"updateParagraphStyle": {
+        "range": _range(start, start + 1, tab_id),
+        "paragraphStyle": {"namedStyleType": "NORMAL_TEXT"},
+        "fields": ",".join(_PARAGRAPH_STYLE_FIELDS),
+    }}]
+    if bulleted:
+        requests.append({"deleteParagraphBullets": {"range": _range(start, start + 1, tab_id)}})
+    return requests
 
-            # Insert new content with styling
-            if new_seg.text:
-                state = BuildState(
-                    tab_id=tab_id,
-                    doc_id=doc_id,
-                    tab_map=tab_map,
-                    index=api_start,
-                )
-                # Need to add newline for paragraph/heading
-                text_to_insert = new_seg.text
-                if new_seg.kind in ("paragraph", "heading", "list-item"):
-                    text_to_insert += "\n"
-                build_requests_from_text(text_to_insert, state)
-                requests.extend(state.requests)
 
-    return requests
+def _bullet_preset_for(list_props: dict | None) -> str:
+    """The preset the builder would have used for a list with *list_props*."""
+    levels = (list_props or {}).get("listProperties", {}).get("nestingLevels", [])
+    glyph = levels[0].get("glyphType", "") if levels else ""
+    if glyph and glyph != "GLYPH_TYPE_UNSPECIFIED":
+        return "NUMBERED_DECIMAL_ALPHA_ROMAN"
+    return "BULLET_DISC_CIRCLE_SQUARE"
 
 
-def collect_update_requests(
-    matches: list[SegmentMatch],
-    tab_id: str,
-    tab_map: dict[str, str],
-    doc_id: str,
-) -> list[Request]:
-    """Collect all requests from segment matches, sorted for safe application.
+class TabBody:
+    """Where the top-level paragraphs and tables of one tab body start.
 
-    Cell edit groups are kept together in order (delete, insert, style).
-    Other requests are sorted by descending start index to prevent index drift.
+    Inserts need to know what sits at their index: text can only go into a
+    paragraph, and a new paragraph inherits the style of the one it splits.
     """
-    # Separate grouped requests (cells, inserts) from regular requests
-    # Grouped requests are tuples: (sort_index, insertion_order, requests)
-    # insertion_order is used to reverse insertions at the same index
-    grouped_requests: list[tuple[int, int, list[Request]]] = []
-    regular_requests: list[Request] = []
-    insertion_order = 0
 
-    for match in matches:
-        requests = edits_to_requests(match, tab_id, tab_map, doc_id)
-        for req in requests:
-            if "__cell_group__" in req:
-                # Cell groups don't need reordering within same index
-                grouped_requests.append((req["__sort_index__"], 0, req["__cell_group__"]))
-            elif "__insert_group__" in req:
-                # Insert groups need reverse ordering within same index
-                grouped_requests.append((req["__sort_index__"], insertion_order, req["__insert_group__"]))
-                insertion_order += 1
-            elif "__edit_group__" in req:
-                # Edit groups (paragraph/heading edits with wikilinks)
-                grouped_requests.append((req["__sort_index__"], 0, req["__edit_group__"]))
+    def __init__(self, doc: dict, tab_id: str) -> None:
+        tab = _find_tab(doc.get("tabs", []), tab_id)
+        document_tab = tab.get("documentTab", {}) if tab else {}
+        content = document_tab.get("body", {}).get("content", [])
+        self.lists: dict[str, dict] = document_tab.get("lists", {})
+        self.paragraphs = {el.get("startIndex", 0): el["paragraph"]
+                           for el in content if "paragraph" in el}
+        self.tables = {el.get("startIndex", 0) for el in content if "table" in el}
+        self._starts = sorted(self.paragraphs)
+
+    def paragraph_at(self, index: int) -> dict:
+        """The top-level paragraph containing *index*."""
+        i = bisect.bisect_right(self._starts, index) - 1
+        return self.paragraphs[self._starts[max(i, 0)]] if self._starts else {}
+
+
+def _paragraphs_insert(paras: list[dict], at: int, tab_id: str, lists: dict[str, dict],
+                       heading_ids: dict[str, str] | None,
+                       inherits_bullet: bool) -> list[Request]:
+    """Insert copies of the paragraph elements *paras* at paragraph start *at*."""
+    runs: list[tuple[str, dict]] = []
+    styles: list[Request] = []
+    bullets: list[tuple[int, int, str]] = []
+    offset = at
+    for el in paras:
+        para = el["paragraph"]
+        bullet = para.get("bullet")
+        para_runs = _paragraph_runs(para, heading_ids)
+        if bullet is not None:
+            # Leading tabs carry the nesting level into createParagraphBullets
+            para_runs.insert(0, ("\t" * bullet.get("nestingLevel", 0), {}))
+        size = sum(utf16_len(t) for t, _ in para_runs)
+        pstyle = {k: v for k, v in para.get("paragraphStyle", {}).items()
+                  if k in _PARAGRAPH_STYLE_FIELDS}
+        last = styles[-1]["updateParagraphStyle"] if styles else None
+        if last is not None and last["paragraphStyle"] == pstyle:
+            last["range"]["endIndex"] = offset + size
+        else:
+            styles.append({"updateParagraphStyle": {
+                "range": _range(offset, offset + size, tab_id),
+                "paragraphStyle": pstyle,
+                "fields": ",".join(_PARAGRAPH_STYLE_FIELDS),
+            }})
+        if bullet is not None:
+            list_id = bullet.get("listId", "")
+            if bullets and bullets[-1][1] == offset and bullets[-1][2] == list_id:
+                bullets[-1] = (bullets[-1][0], offset + size, list_id)
             else:
-                regular_requests.append(req)
-
-    # Sort regular requests by descending start index
-    def get_sort_key(req: Request) -> int:
-        if "deleteContentRange" in req:
-            return -req["deleteContentRange"]["range"]["startIndex"]
-        elif "insertText" in req:
-            loc = req["insertText"].get("location", {})
-            return -loc.get("index", 0)
-        elif "updateTextStyle" in req:
-            return -req["updateTextStyle"]["range"]["startIndex"]
-        elif "updateParagraphStyle" in req:
-            return -req["updateParagraphStyle"]["range"]["startIndex"]
-        elif "createParagraphBullets" in req:
-            return -req["createParagraphBullets"]["range"]["startIndex"]
-        return 0
+                bullets.append((offset, offset + size, list_id))
+        for text, style in para_runs:
+            if runs and runs[-1][1] == style:
+                runs[-1] = (runs[-1][0] + text, style)
+            elif text:
+                runs.append((text, style))
+        offset += size
+
+    requests = _styled_insert(runs, at, tab_id)
+    requests.extend(styles)
+    if inherits_bullet:
+        requests.append({"deleteParagraphBullets": {"range": _range(at, offset, tab_id)}})
+    # Last list first: removing its nesting tabs shifts what follows it
+    for start, end, list_id in reversed(bullets):
+        requests.append({"createParagraphBullets": {
+            "range": _range(start, end, tab_id),
+            "bulletPreset": _bullet_preset_for(lists.get(list_id)),
+        }})
+    return requests
 
-    regular_requests.sort(key=get_sort_key)
 
-    # Sort grouped requests by descending sort_index, then by DESCENDING insertion_order
-    # For insertions at the same position: we insert in reverse document order,
-    # so earlier segments end up first in the final document after all inserts
-    grouped_requests.sort(key=lambda x: (-x[0], -x[1]))
+def _table_insert(table: dict, at: int, tab_id: str, heading_ids: dict[str, str] | None,
+                  inherits_bullet: bool) -> list[Request]:
+    """Insert a copy of *table* at paragraph start *at*, cells filled in."""
+    rows = table.get("tableRows", [])
+    num_cols = max((len(row.get("tableCells", [])) for row in rows), default=0)
+    requests: list[Request] = [{"insertTable": {
+        "rows": len(rows), "columns": num_cols,
+        "location": {"index": at, "segmentId": "", "tabId": tab_id},
+    }}]
+    # insertTable opens a paragraph in front of the table, styled like the
+    # one at *at*; the table itself starts one past it.
+    requests.extend(_reset_paragraph(at, tab_id, inherits_bullet))
+    cell_starts, _ = _table_layout(at + 1, len(rows), num_cols)
+    cells = [cell for row in rows for cell in row.get("tableCells", [])]
+    # Last cell first, so the layout of the cells before it still holds
+    for index, (cell, start) in reversed(list(enumerate(zip(cells, cell_starts)))):
+        runs = _strip_final_newline([run for el in cell.get("content", []) if "paragraph" in el
+                                     for run in _paragraph_runs(el["paragraph"], heading_ids)])
+        requests.extend(_styled_insert(runs, start, tab_id))
+        background = cell.get("tableCellStyle", {}).get("backgroundColor")
+        if background:
+            requests.append({"updateTableCellStyle": {
+                "tableRange": {
+                    "tableCellLocation": {
+                        "tableStartLocation": {"index": at + 1, "segmentId": "", "tabId": tab_id},
+                        "rowIndex": index // num_cols,
+                        "columnIndex": index % num_cols,
+                    },
+                    "rowSpan": 1,
+                    "columnSpan": 1,
+                },
+                "tableCellStyle": {"backgroundColor": background},
+                "fields": "backgroundColor",
+            }})
+    return requests
 
-    # Interleave: process from highest index to lowest
-    # For each position, grouped requests should come before regular ones at same index
-    result: list[Request] = []
-    reg_idx = 0
-    grp_idx = 0
 
-    while reg_idx < len(regular_requests) or grp_idx < len(grouped_requests):
-        reg_key = get_sort_key(regular_requests[reg_idx]) if reg_idx < len(regular_requests) else float('inf')
-        grp_key = -grouped_requests[grp_idx][0] if grp_idx < len(grouped_requests) else float('inf')
+def _insert_requests(segments: list[Segment], at: int, tab_id: str, body: TabBody,
+                     lists: dict[str, dict], heading_ids: dict[str, str] | None,
+                     ) -> list[Request]:
+    """Insert the blocks of *segments*, in order, at index *at* of *body*.
 
-        if grp_key <= reg_key:
-            # Add grouped requests (they're already in correct order internally)
-            result.extend(grouped_requests[grp_idx][2])  # index 2 now holds the requests
-            grp_idx += 1
+    Blocks are copied from the elements the segments are bound to, styles,
+    bullets and table cells included. *lists* holds the list properties of
+    the document those elements come from; *heading_ids* moves their
+    heading links onto *body*'s headings (see _paragraph_runs).
+    """
+    requests: list[Request] = []
+    if at in body.paragraphs:
+        inherits_bullet = bool(body.paragraphs[at].get("bullet"))
+    else:
+        # In front of a table, or at the end of the body's last paragraph:
+        # split off an empty paragraph there and insert in front of it
+        k = at - 1 if at in body.tables else at
+        inherits_bullet = bool(body.paragraph_at(k).get("bullet"))
+        requests.append({"insertText": {
+            "location": {"index": k, "segmentId": "", "tabId": tab_id}, "text": "\n"}})
+        requests.extend(_reset_paragraph(k + 1, tab_id, inherits_bullet))
+        inherits_bullet = False
+        at = k + 1
+
+    # Runs of paragraphs and single tables. The last is inserted first, so
+    # each earlier one lands in front of it.
+    parts: list[list[dict]] = []
+    for seg in segments:
+        for el in seg.elements:
+            if "table" in el or not parts or "table" in parts[-1][0]:
+                parts.append([el])
+            else:
+                parts[-1].append(el)
+    for part in reversed(parts):
+        if "table" in part[0]:
+            requests.extend(_table_insert(part[0]["table"], at, tab_id, heading_ids,
+                                          inherits_bullet))
+            inherits_bullet = False
         else:
-            result.append(regular_requests[reg_idx])
-            reg_idx += 1
+            requests.extend(_paragraphs_insert(part, at, tab_id, lists, heading_ids,
+                                               inherits_bullet))
+            inherits_bullet = "bullet" in part[0]["paragraph"]
+    return requests
 
-    return result
+
+def edits_to_requests(match: SegmentMatch, tab_id: str) -> list[Request]:
+    """Convert a matched or deleted SegmentMatch to batchUpdate requests.
+
+    A matched segment gets one delete and one styled insert per run edit,
+    last edit first so earlier offsets stay valid. A deleted segment loses
+    its whole block; cells are never deleted. Insertions are placed by
+    collect_update_requests, which needs the tab's layout.
+    """
+    requests: list[Request] = []
+    seg = match.old_segment
+    if seg is None or seg.span is None or seg.span.api_start is None:
+        return requests
+
+    if match.kind == "matched":
+        base = seg.span.api_start
+        for edit in sorted(match.edits, key=lambda e: e.start, reverse=True):
+            if edit.runs is None:
+                # Markdown offsets do not map onto the document
+                return []
+            if edit.end > edit.start:
+                requests.append({"deleteContentRange": {
+                    "range": _range(base + edit.start, base + edit.end, tab_id)}})
+            requests.extend(_styled_insert(edit.runs, base + edit.start, tab_id))
+
+    elif match.kind == "deleted" and seg.kind != "cell":
+        # Table cells can't be deleted, only their content changed
+        start, end = seg.span.api_start, seg.span.api_end or seg.span.api_start
+        if end > start:
+            requests.append({"deleteContentRange": {"range": _range(start, end, tab_id)}})
+            last = seg.elements[-1] if seg.elements else {}
+            if "paragraph" in last and last.get("endIndex", 0) > end:
+                # The block ran into the body's final newline, which stays
+                # behind with the block's paragraph style
+                requests.extend(_reset_paragraph(start, tab_id,
+                                                 bool(last["paragraph"].get("bullet"))))
+    return requests
+
+
+def collect_update_requests(
+    matches: list[SegmentMatch],
+    tab_id: str,
+    body: TabBody | None = None,
+    lists: dict[str, dict] | None = None,
+    heading_ids: dict[str, str] | None = None,
+) -> list[Request]:
+    """Collect all requests from segment matches, ordered for safe application.
+
+    Each match's requests stay together and matches run from the end of
+    the tab to its start, so no request shifts the indices of a later one.
+    Insertions need *body*, the layout of the tab being written, plus the
+    *lists* and *heading_ids* of _insert_requests; consecutive insertions
+    at one index go in as one block. Edits at an index run before
+    insertions there.
+    """
+    groups: list[tuple[int, int, list[Request]]] = []
+    pending: list[Segment] = []
+    pending_at: int | None = None
+
+    def flush_inserts() -> None:
+        if pending and pending_at is not None and body is not None:
+            groups.append((pending_at, 1, _insert_requests(
+                pending, pending_at, tab_id, body, lists or {}, heading_ids)))
+        pending.clear()
+
+    for match in matches:
+        if match.kind == "inserted" and match.new_segment is not None:
+            if match.new_segment.kind == "cell" or not match.new_segment.elements:
+                # Cells only exist inside their table
+                continue
+            if match.insert_after_api != pending_at:
+                flush_inserts()
+                pending_at = match.insert_after_api
+            pending.append(match.new_segment)
+            continue
+        requests = edits_to_requests(match, tab_id)
+        if requests:
+            groups.append((match.old_segment.span.api_start, 0, requests))
+    flush_inserts()
+
+    groups.sort(key=lambda g: (-g[0], g[1]))
+    return [req for _, _, requests in groups for req in requests]
 
 
 # ---------------------------------------------------------------------------
@@ -2723,6 +3675,7 @@ def collect_all_requests(
         all_requests.extend(build_hunk_requests(hunk, tab_map, doc_id))
     return all_requests
 
+
 def find_tab_by_title_or_id(doc: dict, title_or_id: str) -> tuple[str, str]:
     """Return (tab_id, tab_title) for *title_or_id* from *doc*."""
     wanted_title = title_or_id.casefold()
@@ -2763,6 +3716,15 @@ def _find_tab_by_title(tabs: list[dict], wanted_title: str) -> dict | None:
     return None
 
 
+def _iter_tabs(tabs: list[dict]) -> list[dict]:
+    """Return every tab in document order, each parent before its children."""
+    out: list[dict] = []
+    for tab in tabs:
+        out.append(tab)
+        out.extend(_iter_tabs(tab.get("childTabs", [])))
+    return out
+
+
 def _tab_labels(tabs: list[dict]) -> list[str]:
     labels: list[str] = []
     for tab in tabs:
@@ -2790,35 +3752,1175 @@ def _paragraph_text_from_api(paragraph: dict) -> str:
 
 
 # ---------------------------------------------------------------------------
-# gws CLI helpers
+# Docs API transport
 # ---------------------------------------------------------------------------
 
 
-def _gws(*args: str, _retries: int = 5, _backoff: float = 10.0) -> dict:
-    """Call the gws CLI and return parsed JSON output.
+class DocsApiError(Exception):
+    """Raised by a DocsClient when the API rejects a call."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
 
-    Retries on HTTP 429 (quota exceeded) with exponential backoff.
+
+class RevisionMismatchError(DocsApiError):
+    """Raised by batch_update when a write pinned to a given revision finds
+    the document has moved past it."""
+
+
+class RateLimitError(DocsApiError):
+    """Raised by a DocsClient when a call was rejected for quota reasons."""
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(429, message)
+        self.retry_after = retry_after
+
+
+class DocsClient:
+    """Transport for Docs REST calls.
+
+    *method* is the dotted method name as gws spells it ("documents.get",
+    "documents.create", "documents.batchUpdate"). *params* carries path and
+    query parameters; *body* is the already-serialized JSON request body so
+    backends that forward it verbatim never re-encode it.
     """
-    cmd = ["gws"] + list(args) + ["--format", "json"]
-    for attempt in range(_retries):
+
+    name = "base"
+    # Response bytes read off the wire, for per-run accounting.
+    bytes_received = 0
+    # .size holds the bytes of the last response read on each thread, so a
+    # traced call can report its own response under concurrency.
+    last_response = threading.local()
+
+    def call(self, method: str, params: dict[str, Any] | None = None,
+             body: str | None = None) -> dict:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+# What a quota rejection looks like in `gws` stderr: the HTTP status, the
+# RPC status or the error reason (rateLimitExceeded, userRateLimitExceeded)
+_GWS_RATE_LIMIT_RE = re.compile(r"\b429\b|RESOURCE_EXHAUSTED|[Rr]ateLimitExceeded")
+
+
+class GwsCliClient(DocsClient):
+    """Fallback backend: one `gws` subprocess per call."""
+
+    name = "gws"
+
+    def call(self, method: str, params: dict[str, Any] | None = None,
+             body: str | None = None) -> dict:
+        cmd = ["gws", "docs"] + method.split(".")
+        if params:
+            cmd += ["--params", json.dumps(params)]
+        if body is not None:
+            cmd += ["--json", body]
+        cmd += ["--format", "json"]
         result = subprocess.run(cmd, capture_output=True, text=True)
+        self.bytes_received += len(result.stdout)
+        self.last_response.size = len(result.stdout)
         if result.returncode == 0:
             return json.loads(result.stdout) if result.stdout.strip() else {}
-        if "429" in result.stderr or "quota" in result.stderr.lower() or "rate" in result.stderr.lower():
-            wait = _backoff * (2 ** attempt)
-            print(f"Rate limit hit, retrying in {wait:.0f}s…", file=sys.stderr)
-            time.sleep(wait)
-            continue
-        print(f"gws error:\n{result.stderr}", file=sys.stderr)
-        sys.exit(1)
-    print(f"gws: exceeded retry limit", file=sys.stderr)
-    sys.exit(1)
+        stderr = result.stderr
+        if _GWS_RATE_LIMIT_RE.search(stderr):
+            raise RateLimitError(stderr.strip())
+        status_match = re.search(r"\b([45]\d\d)\b", stderr)
+        raise DocsApiError(int(status_match.group(1)) if status_match else 0,
+                           stderr.strip())
+
+
+_DOCS_API_BASE = "https://docs.googleapis.com"
+
+# method → (HTTP verb, path template). Path placeholders are filled from
+# (and removed from) the params dict; whatever remains becomes the query.
+_DOCS_ROUTES: dict[str, tuple[str, str]] = {
+    "documents.get": ("GET", "/v1/documents/{documentId}"),
+    "documents.create": ("POST", "/v1/documents"),
+    "documents.batchUpdate": ("POST", "/v1/documents/{documentId}:batchUpdate"),
+}
 
-def create_document(title: str) -> tuple[str, str]:
-    """Create a new Google Doc and return (doc_id, first_tab_id)."""
-    resp = _gws("docs", "documents", "create",
+
+class TokenProvider:
+    """Supplies and caches an OAuth access token for the HTTP backend.
+
+    Sources, in order: $MD2GDOC_ACCESS_TOKEN, $GOOGLE_WORKSPACE_CLI_TOKEN,
+    then the stdout of $MD2GDOC_TOKEN_COMMAND (e.g.
+    `gcloud auth print-access-token`). The token is reused across calls and
+    only re-read after the API answers 401.
+    """
+
+    def __init__(self) -> None:
+        self._token: str | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        return any(os.environ.get(k) for k in (
+            "MD2GDOC_ACCESS_TOKEN", "GOOGLE_WORKSPACE_CLI_TOKEN",
+            "MD2GDOC_TOKEN_COMMAND"))
+
+    def token(self, refresh: bool = False) -> str:
+        with self._lock:
+            if self._token is not None and not refresh:
+                return self._token
+            token = (os.environ.get("MD2GDOC_ACCESS_TOKEN")
+                     or os.environ.get("GOOGLE_WORKSPACE_CLI_TOKEN") or "")
+            command = os.environ.get("MD2GDOC_TOKEN_COMMAND")
+            if command and (refresh or not token):
+                result = subprocess.run(command, shell=True, capture_output=True,
+                                        text=True)
+                if result.returncode != 0:
+                    raise DocsApiError(401, f"token command failed: {result.stderr.strip()}")
+                token = result.stdout.strip()
+            self._token = token
+            return token
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header, or None to back off instead.
+
+    The header is either delay-seconds or an HTTP-date; anything else is
+    ignored rather than failing the call.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _decode_response(status: int, headers: dict[str, str], data: bytes) -> dict:
+    """Decode a Docs API response, raising DocsApiError/RateLimitError on errors.
+
+    *headers* must have lower-cased names.
+    """
+    if status < 400:
+        return json.loads(data) if data.strip() else {}
+    try:
+        message = json.loads(data).get("error", {}).get("message", "")
+    except ValueError:
+        message = data.decode("utf-8", "replace")
+    if status == 429:
+        raise RateLimitError(f"{status}: {message}",
+                             _parse_retry_after(headers.get("retry-after")))
+    raise DocsApiError(status, f"{status}: {message}")
+
+
+def _is_replayable(method: str, body: str | None) -> bool:
+    """Whether *method* may be sent again after a lost connection.
+
+    Reads are. A batchUpdate is only when it is pinned with
+    writeControl.requiredRevisionId, so a replay of an applied batch is
+    rejected instead of inserting twice; documents.create never is.
+    """
+    if method not in _WRITE_METHODS:
+        return True
+    if method != "documents.batchUpdate" or not body:
+        return False
+    try:
+        control = json.loads(body).get("writeControl") or {}
+    except (ValueError, AttributeError):
+        return False
+    return bool(control.get("requiredRevisionId"))
+
+
+class HttpDocsClient(DocsClient):
+    """In-process backend with a pool of keep-alive HTTP connections.
+
+    Connections are checked out per call, so the client is safe to share
+    between threads; at most *pool_size* idle connections are kept.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url: str = _DOCS_API_BASE,
+                 tokens: TokenProvider | None = None,
+                 pool_size: int = 8, timeout: float = 60.0) -> None:
+        parts = urllib.parse.urlsplit(base_url)
+        self._https = parts.scheme == "https"
+        self._host = parts.hostname or "localhost"
+        self._port = parts.port
+        self._prefix = parts.path.rstrip("/")
+        self._tokens = tokens or TokenProvider()
+        self._timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=pool_size)
+        self._count_lock = threading.Lock()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._https:
+            return http.client.HTTPSConnection(self._host, self._port,
+                                               timeout=self._timeout)
+        return http.client.HTTPConnection(self._host, self._port,
+                                          timeout=self._timeout)
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        """Check out a connection; the flag is True for a reused pooled one.
+
+        An idle socket that polls readable has been closed by the server
+        (or holds stray bytes), so it is dropped instead of reused.
+        """
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(), False
+            try:
+                stale = conn.sock is None or bool(select.select([conn.sock], [], [], 0)[0])
+            except (OSError, ValueError):
+                stale = True
+            if not stale:
+                return conn, True
+            conn.close()
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _send(self, verb: str, path: str, body: bytes | None, token: str,
+              replayable: bool = True) -> tuple[int, dict[str, str], bytes]:
+        headers = {
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip",
+            "User-Agent": "md2gdoc (gzip)",
+        }
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        # A pooled connection may have been closed by the server while idle.
+        # That shows up as a failed write or as a disconnect before the first
+        # response byte, and only then is the request sent again on a fresh
+        # connection. Timeouts and failures on fresh connections are not
+        # retried: the server may already have applied the request.
+        while True:
+            conn, reused = self._acquire()
+            try:
+                try:
+                    conn.request(verb, path, body=body, headers=headers)
+                except (BrokenPipeError, ConnectionResetError):
+                    if reused and replayable:
+                        conn.close()
+                        continue
+                    raise
+                try:
+                    resp = conn.getresponse()
+                except http.client.RemoteDisconnected:
+                    if reused and replayable:
+                        conn.close()
+                        continue
+                    raise
+                data = resp.read()
+            except BaseException:
+                conn.close()
+                raise
+            break
+        resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+        with self._count_lock:
+            self.bytes_received += len(data)
+        self.last_response.size = len(data)
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        if resp_headers.get("content-encoding") == "gzip":
+            data = gzip.decompress(data)
+        return resp.status, resp_headers, data
+
+    def call(self, method: str, params: dict[str, Any] | None = None,
+             body: str | None = None) -> dict:
+        if method not in _DOCS_ROUTES:
+            raise DocsApiError(0, f"unsupported method for http backend: {method}")
+        verb, template = _DOCS_ROUTES[method]
+        query = dict(params or {})
+        path = re.sub(r"\{(\w+)\}",
+                      lambda m: urllib.parse.quote(str(query.pop(m.group(1))), safe=""),
+                      template)
+        path = self._prefix + path
+        if query:
+            path += "?" + urllib.parse.urlencode(query)
+        payload = body.encode("utf-8") if body is not None else None
+        replayable = _is_replayable(method, body)
+
+        status, headers, data = self._send(verb, path, payload, self._tokens.token(),
+                                           replayable)
+        if status == 401:
+            status, headers, data = self._send(verb, path, payload,
+                                               self._tokens.token(refresh=True),
+                                               replayable)
+        return _decode_response(status, headers, data)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class EmulatorDocsClient(DocsClient):
+    """Offline backend: an in-process gdocs_emulator.DocsEmulator.
+
+    Documents live only as long as the process. Latency and 429 injection
+    come from $MD2GDOC_EMULATOR_* (see gdocs_emulator.EmulatorConfig).
+    """
+
+    name = "emulator"
+
+    def __init__(self, emulator: Any = None) -> None:
+        if emulator is None:
+            from gdocs_emulator import DocsEmulator, EmulatorConfig
+            emulator = DocsEmulator(EmulatorConfig.from_env())
+        self.emulator = emulator
+        self._count_lock = threading.Lock()
+
+    def call(self, method: str, params: dict[str, Any] | None = None,
+             body: str | None = None) -> dict:
+        status, headers, data = self.emulator.handle(method, params, body)
+        with self._count_lock:
+            self.bytes_received += len(data)
+        self.last_response.size = len(data)
+        return _decode_response(status, {k.lower(): v for k, v in headers.items()}, data)
+
+
+class PlanningClient(DocsClient):
+    """Dry-run backend for --plan: nothing is sent, every call is logged.
+
+    Calls are answered by an in-memory gdocs_emulator. A document the
+    command touches is first read once, whole, through *source* (the real
+    backend) and loaded into the emulator. From then on its reads and
+    writes stay local, so the commands follow their real code paths, and
+    every batchUpdate window is checked by the emulator before it counts.
+    Each call is written to *sink* as one JSON line, a rejected window with
+    the request the emulator refused. finish() then writes the totals, the
+    rejections and the quota estimate.
+    """
+
+    name = "plan"
+
+    def __init__(self, source: DocsClient, sink: TextIO) -> None:
+        from gdocs_emulator import DocsEmulator
+
+        self.source = source
+        self.sink = sink
+        self.emulator = DocsEmulator()
+        self.local = EmulatorDocsClient(self.emulator)
+        self.seed_reads = 0
+        self.counts = {"reads": 0, "writes": 0, "requests": 0, "bytes": 0}
+        self.alignment: dict[str, int] = {}
+        self.rejected: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def _seed(self, doc_id: str) -> None:
+        from gdocs_emulator import EmulatorError, load_document
+
+        data = self.source.call("documents.get",
+                                {"documentId": doc_id, "includeTabsContent": True})
+        try:
+            loaded = load_document(data)
+        except (EmulatorError, KeyError, TypeError, ValueError) as e:
+            raise DocsApiError(0, f"--plan cannot model document {doc_id}: {e}") from e
+        self.emulator.docs[doc_id] = loaded
+        self.seed_reads += 1
+
+    def _emit(self, record: dict[str, Any]) -> None:
+        self.sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def call(self, method: str, params: dict[str, Any] | None = None,
+             body: str | None = None) -> dict:
+        doc_id = str((params or {}).get("documentId", ""))
+        with self._lock:
+            if doc_id and doc_id not in self.emulator.docs:
+                self._seed(doc_id)
+        payload = json.loads(body) if body else None
+        record = {"type": "call", "seq": 0, "method": method, "params": params or {},
+                  "bytes": len(body or ""), "body": payload}
+        try:
+            return self.local.call(method, params, body)
+        except DocsApiError as e:
+            # The real call would most likely be rejected the same way.
+            record["error"] = e.message
+            match = re.search(r"requests\[(\d+)\]", e.message)
+            if match and payload and int(match.group(1)) < len(payload.get("requests", [])):
+                record["rejected"] = {"index": int(match.group(1)),
+                                      "request": payload["requests"][int(match.group(1))]}
+            raise
+        finally:
+            with self._lock:
+                self._seq += 1
+                record["seq"] = self._seq
+                if "error" in record:
+                    self.rejected.append({"seq": self._seq, "method": method,
+                                          "error": record["error"]})
+                self.counts["writes" if method in _WRITE_METHODS else "reads"] += 1
+                self.counts["bytes"] += len(body or "")
+                if method == "documents.batchUpdate":
+                    self.counts["requests"] += len(payload.get("requests", []))
+                self._emit(record)
+
+    def log_alignment(self, pass_no: int, matches: list[SegmentMatch]) -> None:
+        """Log update-tab's segment alignment for one pass.
+
+        Pass 1 is the alignment proper and is what the summary counts; pass
+        2 only re-aligns to place insertions.
+        """
+        with self._lock:
+            for m in matches:
+                if pass_no == 1:
+                    self.alignment[m.kind] = self.alignment.get(m.kind, 0) + 1
+                self._emit({
+                    "type": "alignment", "pass": pass_no, "kind": m.kind,
+                    "old": m.old_segment.text if m.old_segment else None,
+                    "new": m.new_segment.text if m.new_segment else None,
+                    "edits": len(m.edits),
+                })
+
+    def finish(self, reads_per_minute: float, writes_per_minute: float) -> None:
+        """Write the estimate line and a summary on stderr."""
+        reads, writes = self.counts["reads"], self.counts["writes"]
+        # Time the token buckets would hold the run to: a tenth of a
+        # minute's budget goes out at once, the rest at the quota rate.
+        paced = max(max(0.0, n - max(1.0, rate / 10)) / rate * 60
+                    for n, rate in ((reads, reads_per_minute), (writes, writes_per_minute)))
+        estimate = {
+            "type": "estimate", **self.counts,
+            "setup_reads": self.seed_reads,
+            "reads_per_minute": reads_per_minute,
+            "writes_per_minute": writes_per_minute,
+            "quota_minutes": {"reads": round(reads / reads_per_minute, 3),
+                              "writes": round(writes / writes_per_minute, 3)},
+            "paced_seconds": round(paced, 1),
+        }
+        if self.alignment:
+            estimate["alignment"] = self.alignment
+        if self.rejected:
+            estimate["rejected"] = self.rejected
+        self._emit(estimate)
+        self.sink.flush()
+        print(f"Plan: {writes} writes ({self.counts['requests']} requests, "
+              f"{_format_bytes(self.counts['bytes'])}), {reads} reads; "
+              f"{writes / writes_per_minute:.2f} write and {reads / reads_per_minute:.2f} "
+              f"read quota-minutes, at least {paced:.0f}s of pacing. Nothing was sent"
+              + (f" ({self.seed_reads} read(s) to load the document)." if self.seed_reads
+                 else "."), file=sys.stderr)
+        if self.alignment:
+            print("Alignment: " + ", ".join(f"{n} {kind}" for kind, n
+                                            in sorted(self.alignment.items())),
+                  file=sys.stderr)
+        for r in self.rejected:
+            print(f"Rejected: call {r['seq']} ({r['method']}): {r['error']}", file=sys.stderr)
+
+
+_CLIENT: DocsClient | None = None
+
+
+def make_client(backend: str = "auto") -> DocsClient:
+    """Return a DocsClient for *backend* ("auto", "gws", "http" or "emulator").
+
+    "auto" picks the HTTP backend when an access token source is configured
+    (or $MD2GDOC_API_BASE points at a local fake server) and falls back to
+    the gws subprocess backend otherwise.
+    """
+    api_base = os.environ.get("MD2GDOC_API_BASE", "")
+    if backend == "auto":
+        backend = "http" if (api_base or TokenProvider.available()) else "gws"
+    if backend == "http":
+        return HttpDocsClient(api_base or _DOCS_API_BASE)
+    if backend == "gws":
+        return GwsCliClient()
+    if backend == "emulator":
+        return EmulatorDocsClient()
+    raise ValueError(f"unknown backend: {backend}")
+
+
+def set_client(client: DocsClient | None) -> None:
+    """Install *client* as the transport used by _gws()."""
+    global _CLIENT
+    if _CLIENT is not None and _CLIENT is not client:
+        _CLIENT.close()
+    _CLIENT = client
+
+
+def get_client() -> DocsClient:
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = make_client(os.environ.get("MD2GDOC_BACKEND", "auto"))
+    return _CLIENT
+
+
+# ---------------------------------------------------------------------------
+# Quota scheduling
+# ---------------------------------------------------------------------------
+
+
+# Default Docs API per-user quotas (requests per minute).
+DOCS_READS_PER_MINUTE = 300
+DOCS_WRITES_PER_MINUTE = 60
+
+# batchUpdate sizing: stay well under the API's request-size limits.
+MAX_BATCH_REQUESTS = 500
+MAX_BATCH_BYTES = 1_000_000
+
+_WRITE_METHODS = ("documents.create", "documents.batchUpdate")
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at *rate_per_minute*.
+
+    The burst capacity is a tenth of a minute's budget, so a run never gets
+    much more than one quota-minute of calls into any 60 s window.
+    """
+
+    def __init__(self, rate_per_minute: float) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, rate_per_minute / 10.0)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns seconds slept."""
+        slept = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return slept
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+            slept += wait
+
+    def penalize(self, seconds: float) -> None:
+        """Empty the bucket and hold refills back for *seconds* after a 429."""
+        with self._lock:
+            self._tokens = 0.0
+            self._stamp = max(self._stamp, time.monotonic() + seconds)
+
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket whose level lives in shared memory.
+
+    Buckets built from the same *shared* pair (see .shared) draw from one
+    budget, so a process pool stays inside a single user's quota.
+    CLOCK_MONOTONIC is system-wide on Linux, so stamps compare across
+    processes.
+    """
+
+    def __init__(self, rate_per_minute: float, shared: tuple[Any, Any] | None = None) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, rate_per_minute / 10.0)
+        if shared is None:
+            shared = (multiprocessing.Array("d", [self.capacity, time.monotonic()], lock=False),
+                      multiprocessing.Lock())
+        self.shared = shared
+        self._state, self._lock = shared
+
+    @property
+    def _tokens(self) -> float:
+        return self._state[0]
+
+    @_tokens.setter
+    def _tokens(self, value: float) -> None:
+        self._state[0] = value
+
+    @property
+    def _stamp(self) -> float:
+        return self._state[1]
+
+    @_stamp.setter
+    def _stamp(self, value: float) -> None:
+        self._state[1] = value
+
+
+@dataclass
+class ApiStats:
+    """Counters the scheduler keeps for one process."""
+
+    reads: int = 0
+    writes: int = 0
+    throttled: int = 0
+    waited: float = 0.0
+    bytes_sent: int = 0
+    # What optimize_requests() removed before sending.
+    requests_saved: int = 0
+    bytes_saved: int = 0
+
+
+class ApiScheduler:
+    """Central pacing for every Docs API call.
+
+    Reads and writes draw from separate token buckets sized to the Docs
+    per-minute quotas, so a long run settles at quota speed instead of
+    bursting into 429s. A 429 empties the bucket and is retried after the
+    server's Retry-After, or a full-jitter exponential backoff when none is
+    given. batches() packs request lists by count and serialized bytes.
+    """
+
+    def __init__(self, reads_per_minute: float = DOCS_READS_PER_MINUTE,
+                 writes_per_minute: float = DOCS_WRITES_PER_MINUTE,
+                 max_requests: int = MAX_BATCH_REQUESTS,
+                 max_bytes: int = MAX_BATCH_BYTES,
+                 retries: int = 8, base_backoff: float = 1.0,
+                 max_backoff: float = 64.0) -> None:
+        self.reads = TokenBucket(reads_per_minute)
+        self.writes = TokenBucket(writes_per_minute)
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.stats = ApiStats()
+        self._lock = threading.Lock()
+
+    def call(self, client: DocsClient, method: str,
+             params: dict[str, Any] | None, body: str | None) -> dict:
+        is_write = method in _WRITE_METHODS
+        bucket = self.writes if is_write else self.reads
+        with _TRACER.span(method, "api", backend=client.name,
+                          bytes_sent=len(body or "")) as span:
+            for attempt in range(self.retries):
+                started = time.perf_counter()
+                waited = bucket.acquire()
+                if waited and _TRACER.enabled:
+                    _TRACER.add("quota wait", "quota", started, time.perf_counter(),
+                                {"retry": attempt})
+                with self._lock:
+                    self.stats.waited += waited
+                    if is_write:
+                        self.stats.writes += 1
+                    else:
+                        self.stats.reads += 1
+                    self.stats.bytes_sent += len(body or "")
+                span.set(retries=attempt, waited_s=round(waited, 3))
+                try:
+                    result = client.call(method, params, body)
+                    span.set(bytes_received=getattr(client.last_response, "size", 0))
+                    return result
+                except RateLimitError as e:
+                    cap = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+                    wait = e.retry_after if e.retry_after is not None else random.uniform(0, cap)
+                    bucket.penalize(wait)
+                    with self._lock:
+                        self.stats.throttled += 1
+                    print(f"Rate limit hit, retrying in {wait:.1f}s…", file=sys.stderr)
+            raise DocsApiError(429, "exceeded retry limit")
+
+    def record_savings(self, report: OptimizeReport) -> None:
+        with self._lock:
+            self.stats.requests_saved += report.requests_saved
+            self.stats.bytes_saved += report.bytes_saved
+
+    def batches(self, requests: list[Request]) -> list[list[str]]:
+        """Split *requests* into batches of JSON-encoded requests.
+
+        Each batch holds at most max_requests requests and max_bytes of
+        encoded payload (a single oversized request still gets its own
+        batch). Order is preserved.
+        """
+        out: list[list[str]] = []
+        current: list[str] = []
+        size = 0
+        with _TRACER.span("encode batches", "encode", requests=len(requests)):
+            for req in requests:
+                encoded = json.dumps(req)
+                if current and (len(current) >= self.max_requests
+                                or size + len(encoded) + 1 > self.max_bytes):
+                    out.append(current)
+                    current, size = [], 0
+                current.append(encoded)
+                size += len(encoded) + 1
+            if current:
+                out.append(current)
+        return out
+
+
+_SCHEDULER = ApiScheduler(
+    reads_per_minute=float(os.environ.get("MD2GDOC_READS_PER_MINUTE",
+                                          DOCS_READS_PER_MINUTE)),
+    writes_per_minute=float(os.environ.get("MD2GDOC_WRITES_PER_MINUTE",
+                                           DOCS_WRITES_PER_MINUTE)),
+)
+
+
+def set_scheduler(scheduler: ApiScheduler) -> None:
+    """Install *scheduler* as the pacing layer used by _docs_call()."""
+    global _SCHEDULER
+    _SCHEDULER = scheduler
+
+
+def _docs_call(method: str, params: dict[str, Any] | None = None,
+               body: str | None = None) -> dict:
+    """Call *method* on the active DocsClient through the quota scheduler.
+
+    Raises DocsApiError for any non-retryable failure so callers can decide
+    whether it is fatal.
+    """
+    return _SCHEDULER.call(get_client(), method, params, body)
+
+
+def _fail(e: DocsApiError) -> NoReturn:
+    print(f"gws error:\n{e.message}", file=sys.stderr)
+    sys.exit(1)
+
+
+def _gws(*args: str) -> dict:
+    """Run a gws-style Docs call through the active DocsClient.
+
+    Accepts the same argv shape as the gws CLI ("docs", "documents", "get",
+    "--params", JSON, "--json", JSON) so callers are backend-agnostic.
+    Exits the process on any non-retryable error.
+    """
+    positional: list[str] = []
+    params: dict[str, Any] | None = None
+    body: str | None = None
+    it = iter(args)
+    for arg in it:
+        if arg == "--params":
+            params = json.loads(next(it))
+        elif arg == "--json":
+            body = next(it)
+        else:
+            positional.append(arg)
+    if positional and positional[0] == "docs":
+        positional = positional[1:]
+    try:
+        return _docs_call(".".join(positional), params, body)
+    except DocsApiError as e:
+        _fail(e)
+
+
+# ---------------------------------------------------------------------------
+# Document snapshots
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class DocumentSnapshot:
+    """A full documents.get response pinned to the revision it reflects."""
+
+    document_id: str
+    revision_id: str
+    doc: dict
+
+
+# Requests the cache knows how to replay onto a snapshot without a GET.
+_LOCALLY_APPLICABLE = ("addDocumentTab", "updateDocumentTabProperties")
+
+
+class SnapshotCache:
+    """Revision-aware cache of full (includeTabsContent) document reads.
+
+    Snapshots are keyed by (documentId, revisionId); only the latest revision
+    of each document is retained. A snapshot is served once a cheap
+    `fields=revisionId` probe confirms the document has not moved. A write
+    drops the snapshot unless it was pinned to the snapshot's revision with
+    writeControl and only touched tab properties, in which case the change is
+    replayed locally and the snapshot advances to the write's new revision.
+    """
+
+    def __init__(self) -> None:
+        self._snapshots: dict[tuple[str, str], DocumentSnapshot] = {}
+        self._latest: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def current(self, doc_id: str) -> DocumentSnapshot | None:
+        with self._lock:
+            rev = self._latest.get(doc_id)
+            return self._snapshots.get((doc_id, rev)) if rev else None
+
+    def store(self, doc: dict) -> DocumentSnapshot | None:
+        doc_id = doc.get("documentId", "")
+        rev = doc.get("revisionId", "")
+        if not doc_id or not rev or "tabs" not in doc:
+            return None
+        snap = DocumentSnapshot(doc_id, rev, doc)
+        with self._lock:
+            old = self._latest.get(doc_id)
+            if old is not None:
+                self._snapshots.pop((doc_id, old), None)
+            self._snapshots[(doc_id, rev)] = snap
+            self._latest[doc_id] = rev
+        return snap
+
+    def invalidate(self, doc_id: str) -> None:
+        with self._lock:
+            rev = self._latest.pop(doc_id, None)
+            if rev is not None:
+                self._snapshots.pop((doc_id, rev), None)
+
+    def note_write(self, doc_id: str, requests: list[Request], response: dict,
+                   pinned_revision: str | None) -> None:
+        """Advance or drop the snapshot for *doc_id* after a batchUpdate."""
+        new_rev = response.get("writeControl", {}).get("requiredRevisionId", "")
+        snap = self.current(doc_id)
+        if (snap is None or not new_rev or pinned_revision != snap.revision_id
+                or not all(any(k in r for k in _LOCALLY_APPLICABLE) for r in requests)):
+            self.invalidate(doc_id)
+            return
+        doc = snap.doc
+        for req, reply in zip(requests, response.get("replies", [])):
+            if "addDocumentTab" in req:
+                props = (reply or {}).get("addDocumentTab", {}).get("tabProperties")
+                if not props:
+                    self.invalidate(doc_id)
+                    return
+                doc.setdefault("tabs", []).append({
+                    "tabProperties": dict(props),
+                    "documentTab": {"body": {"content": [
+                        {"endIndex": 1, "sectionBreak": {}},
+                        {"startIndex": 1, "endIndex": 2, "paragraph": {
+                            "elements": [{"startIndex": 1, "endIndex": 2,
+                                          "textRun": {"content": "\n", "textStyle": {}}}],
+                            "paragraphStyle": {"namedStyleType": "NORMAL_TEXT"},
+                        }},
+                    ]}},
+                })
+            else:
+                upd = req["updateDocumentTabProperties"]
+                tab = _find_tab(doc.get("tabs", []), upd["tabProperties"].get("tabId", ""))
+                if tab is None:
+                    self.invalidate(doc_id)
+                    return
+                for name in upd.get("fields", "").split(","):
+                    name = name.strip()
+                    if name and name in upd["tabProperties"]:
+                        tab["tabProperties"][name] = upd["tabProperties"][name]
+        doc["revisionId"] = new_rev
+        self.store(doc)
+
+
+_SNAPSHOTS = SnapshotCache()
+
+
+class LocalReplica:
+    """One tab of a fetched document, kept current by replaying our writes.
+
+    update-tab predicts the tab after each batchUpdate from this instead of
+    reading it back. The replay runs on gdocs_emulator; when the tab holds
+    something the emulator cannot model, or a request fails to replay, the
+    replica goes stale and callers fall back to a live read.
+    """
+
+    def __init__(self, doc: dict, tab_id: str) -> None:
+        self.revision_id: str = doc.get("revisionId", "")
+        self.stale = False
+        self._emulator: Any = None
+        try:
+            from gdocs_emulator import DocsEmulator, EmulatorError, load_document
+        except ImportError:
+            self.stale = True
+            return
+        tab = _find_tab(doc.get("tabs", []), tab_id)
+        if tab is None:
+            self.stale = True
+            return
+        # Only the target tab is modelled; its child tabs are left out.
+        tab = {k: v for k, v in tab.items() if k != "childTabs"}
+        try:
+            loaded = load_document({"documentId": doc.get("documentId", ""), "tabs": [tab]})
+        except EmulatorError as e:
+            print(f"Local replica unavailable ({e.message}); verifying live",
+                  file=sys.stderr)
+            self.stale = True
+            return
+        self._emulator = DocsEmulator()
+        self._emulator.docs[loaded.doc_id] = loaded
+        self._doc_id = loaded.doc_id
+
+    def apply(self, requests: list[Request], response: dict) -> None:
+        """Replay *requests*, which the API accepted with *response*."""
+        self.revision_id = response.get("writeControl", {}).get("requiredRevisionId", "")
+        if self.stale:
+            return
+        from gdocs_emulator import EmulatorError
+        try:
+            self._emulator.call("documents.batchUpdate", {"documentId": self._doc_id},
+                                json.dumps({"requests": requests}))
+        except EmulatorError as e:
+            print(f"Local replay failed ({e.message}); verifying live", file=sys.stderr)
+            self.stale = True
+
+    def document(self) -> dict:
+        """The predicted document, shaped like a documents.get response."""
+        doc = self._emulator.document(self._doc_id)
+        doc["revisionId"] = self.revision_id
+        return doc
+
+
+def render_expected_tab(doc: dict, tab_id: str, body: str, tab_map: dict[str, str]) -> dict:
+    """Return tab *tab_id* of *doc* as create would write *body* into it.
+
+    The body goes through create's request builder into an empty copy of
+    the tab on gdocs_emulator, deferred links included (*tab_map* maps
+    filename stems to tab ids). The result is a one-tab document shaped
+    like a documents.get response. update-tab aligns against it rather than
+    against the markdown, since extraction cannot round-trip everything
+    the builder writes: code block contents, callout types and list
+    nesting only compare equal document to document.
+    """
+    from gdocs_emulator import DocsEmulator, load_document
+
+    tab = _find_tab(doc.get("tabs", []), tab_id)
+    props = dict(tab.get("tabProperties", {})) if tab else {"tabId": tab_id}
+    doc_id = doc.get("documentId", "")
+    emulator = DocsEmulator()
+    emulator.docs[doc_id] = load_document({"documentId": doc_id, "tabs": [
+        {"tabProperties": props, "documentTab": {"body": {"content": []}}}]})
+
+    def write(requests: list[Request]) -> None:
+        emulator.call("documents.batchUpdate", {"documentId": doc_id},
+                      json.dumps({"requests": requests}))
+
+    # Without a sender or verify_indices the builder queues every request
+    # and sends nothing, so they can be applied here.
+    state = BuildState(tab_id=tab_id, doc_id=doc_id, tab_map=tab_map, fresh_tab=True)
+    build_requests_from_text(body, state)
+    if state.requests:
+        write(_send_order(state.requests))
+    if state.deferred_links:
+        heading_map = _build_heading_map(emulator.document(doc_id))
+        write(_deferred_link_requests(tab_id, state.deferred_links, heading_map, tab_map))
+    return emulator.document(doc_id)
+
+
+# Child tabs nest at most this deep in the Docs editor.
+_TAB_NESTING = 3
+
+
+def _tabs_mask(tab_fields: str) -> str:
+    """Return a documents.get mask selecting *tab_fields* on every tab.
+
+    The API has no per-tab selector, so child tabs are spelled out level by
+    level and every tab in the document is returned, trimmed to the mask.
+    """
+    mask = tab_fields
+    for _ in range(_TAB_NESTING):
+        mask = f"{tab_fields},childTabs({mask})"
+    return f"documentId,revisionId,tabs({mask})"
+
+
+_PARAGRAPH_FIELDS = (
+    "paragraph(elements(startIndex,endIndex,textRun(content,textStyle("
+    "bold,italic,strikethrough,link,weightedFontFamily))),"
+    "paragraphStyle(namedStyleType,headingId,borderBottom),bullet)"
+)
+
+# Partial-response masks, one per kind of read. Each carries exactly what
+# its callers touch; a full snapshot in the cache satisfies all of them.
+FIELDS_TAB_PROPERTIES = _tabs_mask("tabProperties")
+FIELDS_HEADINGS = _tabs_mask(
+    "tabProperties,documentTab(body(content(paragraph("
+    "elements(textRun(content)),paragraphStyle(headingId)))))"
+)
+FIELDS_TABLE_INDICES = _tabs_mask(
+    "tabProperties,documentTab(body(content(startIndex,endIndex,"
+    "table(tableRows(tableCells(content(startIndex)))))))"
+)
+FIELDS_TAB_CONTENT = _tabs_mask(
+    "tabProperties,documentTab(body(content(startIndex,endIndex,"
+    f"{_PARAGRAPH_FIELDS},table(rows,columns,tableRows(tableCells("
+    f"content(startIndex,endIndex,{_PARAGRAPH_FIELDS})))))))"
+)
+
+
+def get_document(doc_id: str, fields: str | None = None) -> dict:
+    """Return *doc_id* with all tab content, via the snapshot cache.
+
+    With *fields*, only that partial-response mask is downloaded (see the
+    FIELDS_* constants) unless a current full snapshot can answer instead.
+    Masked responses are not cached.
+
+    The returned dict is shared with the cache and must be treated as
+    read-only.
+    """
+    snap = _SNAPSHOTS.current(doc_id)
+    if snap is not None and get_revision(doc_id) == snap.revision_id:
+        return snap.doc
+    params = {"documentId": doc_id, "includeTabsContent": "true"}
+    if fields:
+        return _gws("docs", "documents", "get",
+                    "--params", json.dumps({**params, "fields": fields}))
+    doc = _gws("docs", "documents", "get", "--params", json.dumps(params))
+    _SNAPSHOTS.store(doc)
+    return doc
+
+
+def get_revision(doc_id: str) -> str:
+    """Return the current revisionId of *doc_id*; a read of a few bytes."""
+    probe = _gws("docs", "documents", "get",
+                 "--params", json.dumps({"documentId": doc_id, "fields": "revisionId"}))
+    return probe.get("revisionId", "")
+
+
+def _is_revision_mismatch(e: DocsApiError) -> bool:
+    """Whether *e* rejected a write because its requiredRevisionId is stale."""
+    return e.status == 400 and "required revision" in e.message.lower()
+
+
+def batch_update(doc_id: str, requests: list[Request], pin: bool = False,
+                 encoded: list[str] | None = None, revision: str | None = None) -> dict:
+    """Send one batchUpdate and keep the snapshot cache coherent.
+
+    With *pin*, the write carries writeControl.requiredRevisionId of the
+    cached snapshot so it can be replayed locally; if the document moved in
+    the meantime the write is retried unpinned and the snapshot dropped.
+    Any other error is fatal, pinned or not.
+    With *revision*, the write is pinned to that revision instead and is
+    never retried: requests built from an older read must not land, and a
+    revision mismatch raises RevisionMismatchError for the caller to report.
+    *encoded*, when given, is the JSON encoding of each request (as produced
+    by ApiScheduler.batches) and is spliced into the body as-is.
+    """
+    pinned: str | None = revision
+    snap = _SNAPSHOTS.current(doc_id) if pin and revision is None else None
+    if snap is not None:
+        pinned = snap.revision_id
+    if encoded is not None and pinned is None:
+        body = '{"requests": [' + ", ".join(encoded) + "]}"
+    else:
+        payload: dict[str, Any] = {"requests": requests}
+        if pinned is not None:
+            payload["writeControl"] = {"requiredRevisionId": pinned}
+        body = json.dumps(payload)
+    try:
+        resp = _docs_call("documents.batchUpdate", {"documentId": doc_id}, body)
+    except DocsApiError as e:
+        if revision is not None and _is_revision_mismatch(e):
+            raise RevisionMismatchError(e.status, e.message) from e
+        if pinned is None or revision is not None or not _is_revision_mismatch(e):
+            _fail(e)
+        _SNAPSHOTS.invalidate(doc_id)
+        return batch_update(doc_id, requests, encoded=encoded)
+    _SNAPSHOTS.note_write(doc_id, requests, resp, pinned)
+    return resp
+
+
+def send_requests(doc_id: str, requests: list[Request]) -> None:
+    """Submit *requests* in order, in batches sized by the scheduler."""
+    start = 0
+    for encoded in _SCHEDULER.batches(requests):
+        batch = requests[start:start + len(encoded)]
+        start += len(encoded)
+        batch_update(doc_id, batch, encoded=encoded)
+
+
+# Built (pre-optimizer) requests per streamed window. The optimizer keeps
+# roughly a quarter of them, so a window fills about one batchUpdate.
+STREAM_WINDOW_REQUESTS = 2000
+
+
+class RequestSender:
+    """Send request windows for one document on a background thread.
+
+    Windows go out strictly in submission order, so each window's inserts
+    land before anything queued later. Batches are cut across window
+    boundaries: a window's trailing partial batch is held back and sent at
+    the head of the next one, so streaming costs no extra batchUpdates. The
+    queue holds at most *depth* windows: a builder that gets ahead of the
+    network blocks rather than buffering the whole tab. A failure in the
+    sender (including _fail's SystemExit) is re-raised in the builder on
+    its next submit() or drain().
+
+    Use as a context manager; leaving the block sends what is queued.
+    """
+
+    _FLUSH: list[Request] = []
+    _STOP: list[Request] = []
+
+    def __init__(self, doc_id: str, depth: int = 2) -> None:
+        self.doc_id = doc_id
+        self._queue: queue.Queue[list[Request]] = queue.Queue(maxsize=depth)
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        carry: list[Request] = []
+        while True:
+            item = self._queue.get()
+            try:
+                if self._error is None:
+                    final = item is self._FLUSH or item is self._STOP
+                    carry = self._send(carry + item, hold_last=not final)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+            if item is self._STOP:
+                return
+
+    def _send(self, requests: list[Request], hold_last: bool) -> list[Request]:
+        """Send *requests* in batches; return any partial last batch held back."""
+        batches = _SCHEDULER.batches(requests)
+        carry: list[Request] = []
+        if hold_last and batches and len(batches[-1]) < _SCHEDULER.max_requests:
+            carry = requests[len(requests) - len(batches.pop()):]
+        start = 0
+        for encoded in batches:
+            batch_update(self.doc_id, requests[start:start + len(encoded)],
+                         encoded=encoded)
+            start += len(encoded)
+        return carry
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, window: list[Request]) -> None:
+        self._check()
+        self._queue.put(window)
+
+    def drain(self) -> None:
+        """Block until every submitted request has been sent."""
+        self._queue.put(self._FLUSH)
+        self._queue.join()
+        self._check()
+
+    def close(self) -> None:
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._check()
+
+    def __enter__(self) -> RequestSender:
+        return self
+
+    def __exit__(self, exc_type: Any, *_exc: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Already failing: stop after the batch in flight, keep the
+            # original exception.
+            self._error = self._error or RuntimeError("aborted")
+            self._queue.put(self._STOP)
+
+
+def create_document(title: str) -> tuple[str, str]:
+    """Create a new Google Doc and return (doc_id, first_tab_id)."""
+    resp = _gws("docs", "documents", "create",
                 "--json", json.dumps({"title": title}))
     doc_id = resp["documentId"]
+    # The create response is the full new document — seed the cache with it.
+    _SNAPSHOTS.store(resp)
     # First tab always has tabId "t.0".
     first_tab_id = resp["tabs"][0]["tabProperties"]["tabId"]
     return doc_id, first_tab_id
@@ -2835,12 +4937,19 @@ def add_tab(doc_id: str, title: str) -> str:
             }
         ]
     }
-    resp = _gws("docs", "documents", "batchUpdate",
-                "--params", json.dumps({"documentId": doc_id}),
-                "--json", json.dumps(body))
+    resp = batch_update(doc_id, body["requests"], pin=True)
     return resp["replies"][0]["addDocumentTab"]["tabProperties"]["tabId"]
 
 
+def add_tabs(doc_id: str, titles: list[str]) -> list[str]:
+    """Add one tab per title in a single batchUpdate; return their tabIds in order."""
+    if not titles:
+        return []
+    requests = [{"addDocumentTab": {"tabProperties": {"title": t}}} for t in titles]
+    resp = batch_update(doc_id, requests, pin=True)
+    return [r["addDocumentTab"]["tabProperties"]["tabId"] for r in resp["replies"]]
+
+
 def rename_tab(doc_id: str, tab_id: str, title: str) -> None:
     """Rename *tab_id* in *doc_id*."""
     body = {
@@ -2853,19 +4962,12 @@ def rename_tab(doc_id: str, tab_id: str, title: str) -> None:
             }
         ]
     }
-    _gws("docs", "documents", "batchUpdate",
-         "--params", json.dumps({"documentId": doc_id}),
-         "--json", json.dumps(body))
+    batch_update(doc_id, body["requests"], pin=True)
 
 
 def write_tab(doc_id: str, requests: list[Request]) -> None:
-    """Submit *requests* to the API in batches of 500."""
-    batch_size = 500
-    for i in range(0, len(requests), batch_size):
-        batch = requests[i:i + batch_size]
-        _gws("docs", "documents", "batchUpdate",
-             "--params", json.dumps({"documentId": doc_id}),
-             "--json", json.dumps({"requests": batch}))
+    """Submit *requests* to the API in scheduler-sized batches."""
+    send_requests(doc_id, requests)
 
 
 # ---------------------------------------------------------------------------
@@ -2921,6 +5023,95 @@ def _build_heading_map(doc: dict) -> dict[str, dict[str, str]]:
     return result
 
 
+def _deferred_link_requests(
+    tab_id: str,
+    deferred: list[tuple[int, int, str]],
+    heading_map: dict[str, dict[str, str]],
+    tab_map: dict[str, str],
+) -> list[Request]:
+    """Return the link style requests resolving *deferred* links in *tab_id*.
+
+    *heading_map* is _build_heading_map() of the written document and
+    *tab_map* maps filename stems to tab ids. Unresolvable links are
+    coloured red instead.
+    """
+    same_tab_headings = heading_map.get(tab_id, {})
+    patch_requests: list[Request] = []
+
+    for start, end, href in deferred:
+        link_style: dict | None = None
+
+        if href.startswith("#"):
+            # Same-tab fragment link.
+            slug = _slug(href[1:])
+            heading_id = same_tab_headings.get(slug)
+            if heading_id:
+                link_style = {"headingId": heading_id}
+            else:
+                print(f"  warn: no headingId for slug {slug!r} in tab {tab_id}",
+                      file=sys.stderr)
+
+        elif _RELATIVE_MD_RE.match(href):
+            path_part, _, fragment = href.partition("#")
+            stem = Path(path_part).stem
+            target_tab_id = tab_map.get(stem)
+            if target_tab_id:
+                if fragment:
+                    # Try to resolve to a specific heading in the target tab.
+                    # Cross-tab headingId is not supported by the API, so we
+                    # fall back to a tab-level link.
+                    target_headings = heading_map.get(target_tab_id, {})
+                    slug = _slug(fragment)
+                    # tabId link is the best we can do cross-tab.
+                    link_style = {"tabId": target_tab_id}
+                    if slug not in target_headings:
+                        print(
+                            f"  info: cross-tab heading #{fragment!r} in", 
+                            f"{stem!r} not resolvable to headingId; linking to tab",
+                            file=sys.stderr,
+                        )
+                else:
+                    link_style = {"tabId": target_tab_id}
+            else:
+                print(f"  warn: no tab found for stem {stem!r}", file=sys.stderr)
+
+        if link_style is None:
+            # Unresolvable link — mark text red so it's visible for manual fix.
+            patch_requests.append({
+                "updateTextStyle": {
+                    "range": {
+                        "startIndex": start,
+                        "endIndex": end,
+                        "segmentId": "",
+                        "tabId": tab_id,
+                    },
+                    "textStyle": {
+                        "foregroundColor": {
+                            "color": {
+                                "rgbColor": {"red": 0.85, "green": 0.1, "blue": 0.1}
+                            }
+                        }
+                    },
+                    "fields": "foregroundColor",
+                }
+            })
+            continue
+
+        patch_requests.append({
+            "updateTextStyle": {
+                "range": {
+                    "startIndex": start,
+                    "endIndex": end,
+                    "segmentId": "",
+                    "tabId": tab_id,
+                },
+                "textStyle": {"link": link_style},
+                "fields": "link",
+            }
+        })
+    return patch_requests
+
+
 def resolve_deferred_links(
     doc_id: str,
     tab_id_list: list[str],
@@ -2944,105 +5135,215 @@ def resolve_deferred_links(
 
     print(f"Resolving {total} deferred link(s)\u2026", file=sys.stderr)
 
-    # GET the full doc to build heading maps.
-    doc = _gws("docs", "documents", "get",
-               "--params", json.dumps({
-                   "documentId": doc_id,
-                   "includeTabsContent": "true",
-               }))
+    # Heading ids and text are all the heading maps need.
+    doc = get_document(doc_id, FIELDS_HEADINGS)
 
     heading_map = _build_heading_map(doc)  # {tab_id: {slug: headingId}}
 
-    # Reverse tab_map: tab_id → stem (for looking up target tab from stem).
-    stem_to_tab: dict[str, str] = {stem: tid for stem, tid in tab_map.items()}
-
     for tab_id, deferred in deferred_per_tab.items():
         if not deferred:
             continue
+        patch_requests = _deferred_link_requests(tab_id, deferred, heading_map, tab_map)
+        if patch_requests:
+            print(f"  patching {len(patch_requests)} link(s) in tab {tab_id}",
+                  file=sys.stderr)
+            send_requests(doc_id, patch_requests)
 
-        same_tab_headings = heading_map.get(tab_id, {})
-        patch_requests: list[Request] = []
 
-        for start, end, href in deferred:
-            link_style: dict | None = None
+# ---------------------------------------------------------------------------
+# Async execution
+# ---------------------------------------------------------------------------
 
-            if href.startswith("#"):
-                # Same-tab fragment link.
-                slug = _slug(href[1:])
-                heading_id = same_tab_headings.get(slug)
-                if heading_id:
-                    link_style = {"headingId": heading_id}
-                else:
-                    print(f"  warn: no headingId for slug {slug!r} in tab {tab_id}",
-                          file=sys.stderr)
-
-            elif _RELATIVE_MD_RE.match(href):
-                path_part, _, fragment = href.partition("#")
-                stem = Path(path_part).stem
-                target_tab_id = stem_to_tab.get(stem)
-                if target_tab_id:
-                    if fragment:
-                        # Try to resolve to a specific heading in the target tab.
-                        # Cross-tab headingId is not supported by the API, so we
-                        # fall back to a tab-level link.
-                        target_headings = heading_map.get(target_tab_id, {})
-                        slug = _slug(fragment)
-                        # tabId link is the best we can do cross-tab.
-                        link_style = {"tabId": target_tab_id}
-                        if slug not in target_headings:
-                            print(
-                                f"  info: cross-tab heading #{fragment!r} in", 
-                                f"{stem!r} not resolvable to headingId; linking to tab",
-                                file=sys.stderr,
-                            )
-                    else:
-                        link_style = {"tabId": target_tab_id}
-                else:
-                    print(f"  warn: no tab found for stem {stem!r}", file=sys.stderr)
-
-            if link_style is None:
-                # Unresolvable link — mark text red so it's visible for manual fix.
-                patch_requests.append({
-                    "updateTextStyle": {
-                        "range": {
-                            "startIndex": start,
-                            "endIndex": end,
-                            "segmentId": "",
-                            "tabId": tab_id,
-                        },
-                        "textStyle": {
-                            "foregroundColor": {
-                                "color": {
-                                    "rgbColor": {"red": 0.85, "green": 0.1, "blue": 0.1}
-                                }
-                            }
-                        },
-                        "fields": "foregroundColor",
-                    }
-                })
-                continue
 
-            patch_requests.append({
-                "updateTextStyle": {
-                    "range": {
-                        "startIndex": start,
-                        "endIndex": end,
-                        "segmentId": "",
-                        "tabId": tab_id,
-                    },
-                    "textStyle": {"link": link_style},
-                    "fields": "link",
-                }
-            })
+# Default cap on Docs API calls in flight from one AsyncDocsClient.
+DEFAULT_CONCURRENCY = 8
 
-        if patch_requests:
-            print(f"  patching {len(patch_requests)} link(s) in tab {tab_id}",
-                  file=sys.stderr)
-            batch_size = 500
-            for i in range(0, len(patch_requests), batch_size):
-                _gws("docs", "documents", "batchUpdate",
-                     "--params", json.dumps({"documentId": doc_id}),
-                     "--json", json.dumps({"requests": patch_requests[i:i+batch_size]}))
+
+async def _gather(*aws: Any) -> list[Any]:
+    """asyncio.gather that lets every awaitable settle before exiting.
+
+    Errors are reported with sys.exit() on worker threads. A SystemExit that
+    escapes a task stops the event loop while sibling calls are still in
+    flight, so each one is held until all are done and the first re-raised.
+    """
+    async def settle(aw: Any) -> Any:
+        try:
+            return await aw
+        except SystemExit as exc:
+            return exc
+
+    results = await asyncio.gather(*(settle(aw) for aw in aws))
+    for result in results:
+        if isinstance(result, SystemExit):
+            raise result
+    return results
+
+
+class AsyncDocsClient:
+    """Awaitable front end to the active DocsClient.
+
+    Each call runs on a worker thread through the shared ApiScheduler, so
+    quota pacing, 429 retries and the snapshot cache behave exactly as in
+    synchronous code. A semaphore caps how many calls are in flight at once;
+    the token buckets still decide how fast they may start.
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY) -> None:
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run blocking *fn* on a worker thread under the concurrency cap."""
+        async with self._sem:
+            return await asyncio.to_thread(fn, *args)
+
+    async def get_document(self, doc_id: str, fields: str | None = None) -> dict:
+        return await self.run(get_document, doc_id, fields)
+
+    async def get_revision(self, doc_id: str) -> str:
+        return await self.run(get_revision, doc_id)
+
+    async def get_documents(self, doc_ids: list[str],
+                            fields: str | None = None) -> dict[str, dict]:
+        """Fetch each distinct document once, concurrently."""
+        unique = list(dict.fromkeys(doc_ids))
+        docs = await _gather(*(self.get_document(d, fields) for d in unique))
+        return dict(zip(unique, docs))
+
+    async def batch_update(self, doc_id: str, requests: list[Request],
+                           pin: bool = False, revision: str | None = None) -> dict:
+        return await self.run(batch_update, doc_id, requests, pin, None, revision)
+
+    async def send_requests(self, doc_id: str, requests: list[Request]) -> None:
+        """Send *requests* in order as scheduler-sized batches.
+
+        Batches of one call go out one after another; concurrent calls
+        (one per tab, say) interleave freely.
+        """
+        start = 0
+        for encoded in _SCHEDULER.batches(requests):
+            batch = requests[start:start + len(encoded)]
+            start += len(encoded)
+            await self.run(batch_update, doc_id, batch, False, encoded)
+
+
+def _async_client(args: argparse.Namespace) -> AsyncDocsClient:
+    return AsyncDocsClient(getattr(args, "concurrency", DEFAULT_CONCURRENCY))
+
+
+# ---------------------------------------------------------------------------
+# File watching
+# ---------------------------------------------------------------------------
+
+
+class FileWatcher:
+    """Reports markdown files in one directory that were written.
+
+    changes() blocks for up to *timeout* seconds and returns the paths
+    written since the previous call, which may be none.
+    """
+
+    name = "base"
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    def changes(self, timeout: float) -> set[Path]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class PollingWatcher(FileWatcher):
+    """Portable fallback: compares each file's (mtime, size) every tick."""
+
+    name = "polling"
+
+    def __init__(self, directory: Path, interval: float = 0.5) -> None:
+        super().__init__(directory)
+        self.interval = interval
+        self._seen = self._scan()
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        seen: dict[Path, tuple[int, int]] = {}
+        for path in self.directory.glob("*.md"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            seen[path] = (st.st_mtime_ns, st.st_size)
+        return seen
+
+    def changes(self, timeout: float) -> set[Path]:
+        deadline = time.monotonic() + timeout
+        while True:
+            current = self._scan()
+            changed = {p for p, sig in current.items() if self._seen.get(p) != sig}
+            self._seen = current
+            remaining = deadline - time.monotonic()
+            if changed or remaining <= 0:
+                return changed
+            time.sleep(min(self.interval, remaining))
+
+
+class InotifyWatcher(FileWatcher):
+    """Linux inotify via ctypes; wakes when a file is closed after writing
+    or renamed into the directory (editors that save atomically)."""
+
+    name = "inotify"
+
+    _IN_CLOSE_WRITE = 0x00000008
+    _IN_MOVED_TO = 0x00000080
+    # struct inotify_event header: wd, mask, cookie, len; then len name bytes.
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, directory: Path) -> None:
+        import ctypes
+        import ctypes.util
+
+        super().__init__(directory)
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(fd, os.fsencode(directory),
+                                    self._IN_CLOSE_WRITE | self._IN_MOVED_TO)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(err, f"cannot watch {directory}")
+        self._fd = fd
+
+    def changes(self, timeout: float) -> set[Path]:
+        ready, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        changed: set[Path] = set()
+        while ready:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                _wd, _mask, _cookie, length = self._EVENT.unpack_from(data, pos)
+                pos += self._EVENT.size
+                name = data[pos:pos + length].rstrip(b"\0")
+                pos += length
+                if name.endswith(b".md"):
+                    changed.add(self.directory / os.fsdecode(name))
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def open_watcher(directory: Path) -> FileWatcher:
+    """Return an inotify watcher on Linux, else (or if that fails) a polling one."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); polling for changes", file=sys.stderr)
+    return PollingWatcher(directory)
 
 
 # ---------------------------------------------------------------------------
@@ -3051,6 +5352,10 @@ def resolve_deferred_links(
 
 
 def cmd_create(args: argparse.Namespace) -> None:
+    asyncio.run(cmd_create_async(args, _async_client(args)))
+
+
+async def cmd_create_async(args: argparse.Namespace, client: AsyncDocsClient) -> None:
     files = [Path(f) for f in args.files]
     for f in files:
         if not f.exists():
@@ -3060,7 +5365,7 @@ def cmd_create(args: argparse.Namespace) -> None:
     title = args.title or derive_tab_title(files[0])
     print(f"Creating document: {title!r}", file=sys.stderr)
 
-    doc_id, first_tab_id = create_document(title)
+    doc_id, first_tab_id = await client.run(create_document, title)
     print(f"Document ID: {doc_id}", file=sys.stderr)
 
     # Build tab_map: filename stem → tab_id (for intra-doc link resolution).
@@ -3069,48 +5374,60 @@ def cmd_create(args: argparse.Namespace) -> None:
 
     # Pre-create all additional tabs so we have their IDs for tab_map before
     # writing content (links in tab 0 might reference tab 3, for example).
-    for idx, path in enumerate(files[1:], start=1):
-        tab_title = derive_tab_title(path)
-        tab_id = add_tab(doc_id, tab_title)
-        tab_id_list.append(tab_id)
+    tab_titles = [derive_tab_title(path) for path in files]
+    tab_id_list.extend(await client.run(add_tabs, doc_id, tab_titles[1:]))
+    for idx, (tab_title, tab_id) in enumerate(zip(tab_titles[1:], tab_id_list[1:]), start=1):
         print(f"Created tab {idx}: {tab_title!r} ({tab_id})", file=sys.stderr)
 
     for path, tab_id in zip(files, tab_id_list):
         tab_map[path.stem] = tab_id
 
-    # First tab: rename then write.
-    first_title = derive_tab_title(files[0])
-    rename_tab(doc_id, first_tab_id, first_title)
-    print(f"Writing tab: {first_title!r} ({first_tab_id})\u2026", file=sys.stderr)
-    state = BuildState(tab_id=first_tab_id, doc_id=doc_id, tab_map=tab_map)
-    build_requests(files[0], state)
-    _flush_requests(state)
-    deferred_per_tab: dict[str, list[tuple[int, int, str]]] = {}
-    deferred_per_tab[first_tab_id] = state.deferred_links
+    await client.run(rename_tab, doc_id, first_tab_id, tab_titles[0])
 
-    # Remaining tabs.
-    for path, tab_id in zip(files[1:], tab_id_list[1:]):
-        tab_title = derive_tab_title(path)
+    # Every request carries its own tabId, so tab bodies are independent of
+    # each other and can be built and flushed concurrently. Each worker owns
+    # its BuildState; the API scheduler is shared and thread-safe.
+    def write_one(path: Path, tab_id: str,
+                  tab_title: str) -> tuple[list[tuple[int, int, str]], str]:
         print(f"Writing tab: {tab_title!r} ({tab_id})\u2026", file=sys.stderr)
-        state = BuildState(tab_id=tab_id, doc_id=doc_id, tab_map=tab_map)
-        build_requests(path, state)
-        _flush_requests(state)
-        deferred_per_tab[tab_id] = state.deferred_links
+        with _TRACER.span("write tab", "command", tab=tab_title), \
+                RequestSender(doc_id) as sender:
+            state = BuildState(tab_id=tab_id, doc_id=doc_id, tab_map=tab_map,
+                               verify_indices=args.verify_indices, fresh_tab=True,
+                               sender=sender)
+            pushed_hash = build_tab(path, state)
+        return state.deferred_links, pushed_hash
+
+    slots = asyncio.Semaphore(max(1, min(args.jobs, len(files))))
+
+    async def write_in_slot(path: Path, tab_id: str,
+                            tab_title: str) -> tuple[list[tuple[int, int, str]], str]:
+        async with slots:
+            return await asyncio.to_thread(write_one, path, tab_id, tab_title)
+
+    written = await _gather(*(
+        write_in_slot(path, tab_id, tab_title)
+        for path, tab_id, tab_title in zip(files, tab_id_list, tab_titles)
+    ))
+    deferred_per_tab = {tab_id: deferred for tab_id, (deferred, _) in zip(tab_id_list, written)}
 
     # Second pass: resolve deferred fragment and relative-file links.
-    resolve_deferred_links(doc_id, tab_id_list, tab_map, deferred_per_tab)
+    await client.run(resolve_deferred_links, doc_id, tab_id_list, tab_map, deferred_per_tab)
 
     # Write back gdoc_url and gdoc_tab_id into each source file's frontmatter.
     doc_url = f"https://docs.google.com/document/d/{doc_id}/edit"
-    for path, tab_id in zip(files, tab_id_list):
-        patch_frontmatter(path, {
-            "gdoc_url": doc_url,
-            "gdoc_tab_id": tab_id,
-        })
-        print(f"Updated frontmatter: {path.name}", file=sys.stderr)
+    for path, tab_id, (_, pushed_hash) in zip(files, tab_id_list, written):
+        if not getattr(args, "plan", False):
+            patch_frontmatter(path, {
+                "gdoc_url": doc_url,
+                "gdoc_tab_id": tab_id,
+                "gdoc_pushed_hash": pushed_hash,
+            })
+            print(f"Updated frontmatter: {path.name}", file=sys.stderr)
 
     print(doc_id)
 
+
 def cmd_add_tab(args: argparse.Namespace) -> None:
     path = Path(args.file)
     if not path.exists():
@@ -3124,8 +5441,7 @@ def cmd_add_tab(args: argparse.Namespace) -> None:
     tab_id = add_tab(doc_id, tab_title)
 
     # Build a minimal tab_map from the existing doc's tabs.
-    doc = _gws("docs", "documents", "get",
-               "--params", json.dumps({"documentId": doc_id}))
+    doc = get_document(doc_id, FIELDS_TAB_PROPERTIES)
     tab_map: dict[str, str] = {}
     for tab in doc.get("tabs", []):
         props = tab.get("tabProperties", {})
@@ -3134,24 +5450,31 @@ def cmd_add_tab(args: argparse.Namespace) -> None:
         if existing_title and existing_id:
             tab_map[existing_title] = existing_id
 
-    state = BuildState(tab_id=tab_id, doc_id=doc_id, tab_map=tab_map)
-    build_requests(path, state)
-    _flush_requests(state)
+    # Not fresh_tab: an existing document's named styles may be customised
+    # (e.g. bold headings), so the resets a new document makes redundant are
+    # still needed here.
+    with RequestSender(doc_id) as sender:
+        state = BuildState(tab_id=tab_id, doc_id=doc_id, tab_map=tab_map,
+                           verify_indices=args.verify_indices, sender=sender)
+        pushed_hash = build_tab(path, state)
 
     # Second pass: resolve deferred links.
     deferred_per_tab = {tab_id: state.deferred_links}
     resolve_deferred_links(doc_id, [tab_id], tab_map, deferred_per_tab)
 
     # Write back gdoc_url and gdoc_tab_id into the source file's frontmatter.
-    doc_url = f"https://docs.google.com/document/d/{doc_id}/edit"
-    patch_frontmatter(path, {
-        "gdoc_url": doc_url,
-        "gdoc_tab_id": tab_id,
-    })
-    print(f"Updated frontmatter: {path.name}", file=sys.stderr)
+    if not getattr(args, "plan", False):
+        doc_url = f"https://docs.google.com/document/d/{doc_id}/edit"
+        patch_frontmatter(path, {
+            "gdoc_url": doc_url,
+            "gdoc_tab_id": tab_id,
+            "gdoc_pushed_hash": pushed_hash,
+        })
+        print(f"Updated frontmatter: {path.name}", file=sys.stderr)
 
     print(tab_id)
 
+
 # ---------------------------------------------------------------------------
 # Markdown rendering from live API content
 # ---------------------------------------------------------------------------
@@ -3298,7 +5621,27 @@ def _render_text_run(
         else:
             text = f"[[#{heading_id}|{display}]]"
 
-    return text
+    return text
+
+
+def _merged_text_runs(para: dict) -> list[dict]:
+    """The textRuns of *para*, adjacent runs with the same style joined.
+
+    A FIELDS_TAB_CONTENT read keeps runs split on styles the mask leaves
+    out, such as the red of an unresolved link. Rendered one by one they
+    come out as ``~~a~~~~b~~``, and a replica built from the read, which
+    knows only the masked styles, would extract differently.
+    """
+    runs: list[dict] = []
+    for pel in para.get("elements", []):
+        run = pel.get("textRun")
+        if run is None:
+            continue
+        if runs and runs[-1].get("textStyle", {}) == run.get("textStyle", {}):
+            runs[-1] = {**runs[-1], "content": runs[-1].get("content", "") + run.get("content", "")}
+        else:
+            runs.append(run)
+    return runs
 
 
 def _render_paragraph_as_markdown(
@@ -3328,11 +5671,10 @@ def _render_paragraph_as_markdown(
         return "---"
 
     # Build inline content from text runs.
-    inline = ""
-    for pel in para.get("elements", []):
-        run = pel.get("textRun")
-        if run is not None:
-            inline += _render_text_run(run, tab_slug_map=tab_slug_map, heading_slug_map=heading_slug_map, url_slug_map=url_slug_map, strip_bold=strip_bold)
+    inline = "".join(
+        _render_text_run(run, tab_slug_map=tab_slug_map, heading_slug_map=heading_slug_map, url_slug_map=url_slug_map, strip_bold=strip_bold)
+        for run in _merged_text_runs(para)
+    )
 
     # Task list checkboxes: \u2610 (unchecked) or \u2611 (checked) prefix.
     # These were written by md2gdoc from '- [ ]' / '- [x]' syntax.
@@ -3368,115 +5710,51 @@ def _render_paragraph_as_markdown(
     return inline
 
 
-def _collect_table_regions(regions: list[Region]) -> list[list[list[Region]]]:
-    """Group consecutive table_cell regions into a 2-D grid.
-
-    Returns a list of tables; each table is a list of rows; each row is a list
-    of cell Regions. Assumes regions are in document order.
-    """
-    tables: list[list[list[Region]]] = []
-    i = 0
-    while i < len(regions):
-        if regions[i].kind != "table_cell":
-            i += 1
-            continue
-        # Collect all consecutive table_cell regions from the same table.
-        table_start_api = regions[i].table_start_api
-        cells: list[Region] = []
-        while i < len(regions) and regions[i].kind == "table_cell" and regions[i].table_start_api == table_start_api:
-            cells.append(regions[i])
-            i += 1
-        if not cells:
-            continue
-        # Determine grid dimensions.
-        max_row = max(c.row for c in cells)
-        max_col = max(c.col for c in cells)
-        grid: list[list[Region | None]] = [
-            [None] * (max_col + 1) for _ in range(max_row + 1)
-        ]
-        for c in cells:
-            grid[c.row][c.col] = c
-        tables.append(grid)  # type: ignore[arg-type]
-    return tables
-
-
-def render_tab_as_markdown(
-    regions: list[Region],
+def iter_tab_markdown(
+    doc: dict,
+    tab_id: str,
     tab_slug_map: dict[str, str] | None = None,
     heading_slug_map: dict[str, str] | None = None,
     url_slug_map: dict[str, str] | None = None,
-) -> str:
-    """Render a list of Regions extracted from a live tab as a markdown string.
+) -> Iterator[str]:
+    """Yield the markdown of *tab_id* in chunks, walking its body once.
 
-    Paragraph regions are rendered using their *raw_para* dict to recover inline
-    styles (bold, italic, code, links). Table cell regions are grouped into
-    GFM tables. Internal tab links are rendered as Obsidian wikilinks when
-    *tab_slug_map* is provided.
+    Paragraphs recover inline styles (bold, italic, code, links) from their
+    text runs; tables render as GFM tables. Internal tab links are rendered
+    as Obsidian wikilinks when *tab_slug_map* is provided. Blocks are
+    separated by single newlines; joined, the chunks are the whole tab.
     """
-    lines: list[str] = []
-    bullet_counters: dict = {}
-    i = 0
-    while i < len(regions):
-        region = regions[i]
-
-        if region.kind == "paragraph":
-            if not region.raw_para.get("bullet"):
-                bullet_counters = {}
-            md = _render_paragraph_as_markdown(
-                region.raw_para, bullet_counters,
-                tab_slug_map=tab_slug_map, heading_slug_map=heading_slug_map,
-                url_slug_map=url_slug_map,
-            )
-            if md.strip():
-                lines.append(md)
-            i += 1
-            continue
+    first = True
+    for block in _iter_tab_blocks(doc, tab_id, tab_slug_map, heading_slug_map, url_slug_map):
+        if block[0] == "paragraph":
+            lines = [block[1]]
+        else:
+            grid = block[1]
+            rows = [["" if cell is None else cell[0] for cell in row] for row in grid]
+            lines = ["| " + " | ".join(rows[0]) + " |",
+                     "| " + " | ".join(":---" for _ in rows[0]) + " |"]
+            lines.extend("| " + " | ".join(row) + " |" for row in rows[1:])
+            lines.append("")
+        for line in lines:
+            if not first:
+                yield "\n"
+            first = False
+            yield line
 
-        if region.kind == "table_cell":
-            table_start_api = region.table_start_api
-            cells: list[Region] = []
-            j = i
-            while j < len(regions) and regions[j].kind == "table_cell" and regions[j].table_start_api == table_start_api:
-                cells.append(regions[j])
-                j += 1
-
-            if cells:
-                max_row = max(c.row for c in cells)
-                max_col = max(c.col for c in cells)
-                grid: list[list[str]] = [[""] * (max_col + 1) for _ in range(max_row + 1)]
-                for c in cells:
-                    cell_md = _render_paragraph_as_markdown(
-                        c.raw_para, {},
-                        tab_slug_map=tab_slug_map, heading_slug_map=heading_slug_map,
-                        url_slug_map=url_slug_map, strip_bold=c.is_table_header,
-                    ) if c.raw_para else c.text
-                    grid[c.row][c.col] = cell_md
-
-                if grid:
-                    header = "| " + " | ".join(grid[0]) + " |"
-                    separator = "| " + " | ".join(":---" for _ in grid[0]) + " |"
-                    lines.append(header)
-                    lines.append(separator)
-                    for row in grid[1:]:
-                        lines.append("| " + " | ".join(row) + " |")
-                    lines.append("")
-
-            i = j
-            continue
 
-        i += 1
+def write_tab_markdown(sink: TextIO, doc: dict, tab_id: str, **maps: Any) -> None:
+    """Stream the markdown of *tab_id* (see iter_tab_markdown) into *sink*."""
+    for chunk in iter_tab_markdown(doc, tab_id, **maps):
+        sink.write(chunk)
 
-    return "\n".join(lines)
 
+def cmd_extract_tab(args: argparse.Namespace) -> None:
+    asyncio.run(cmd_extract_tab_async(args, _async_client(args)))
 
 
-def cmd_extract_tab(args: argparse.Namespace) -> None:
+async def cmd_extract_tab_async(args: argparse.Namespace, client: AsyncDocsClient) -> None:
     doc_id = args.document
-    doc = _gws("docs", "documents", "get",
-               "--params", json.dumps({
-                   "documentId": doc_id,
-                   "includeTabsContent": "true",
-               }))
+    doc = await client.get_document(doc_id, FIELDS_TAB_CONTENT)
 
     tab_id, _tab_title = find_tab_by_title_or_id(doc, args.tab)
     files_list = sorted(Path(args.files_dir).glob("*.md")) if getattr(args, "files_dir", None) else []
@@ -3487,227 +5765,928 @@ def cmd_extract_tab(args: argparse.Namespace) -> None:
     )
     url_slug_map = load_url_slug_map_from_files(files_list) if files_list else None
     heading_slug_map = _build_heading_slug_map(doc, tab_id)
-    regions = extract_tab_regions(doc, tab_id)
-    print(render_tab_as_markdown(regions, tab_slug_map=tab_slug_map, heading_slug_map=heading_slug_map, url_slug_map=url_slug_map))
+    write_tab_markdown(sys.stdout, doc, tab_id, tab_slug_map=tab_slug_map,
+                       heading_slug_map=heading_slug_map, url_slug_map=url_slug_map)
+    sys.stdout.write("\n")
+
+
+@dataclass
+class ExtractJob:
+    """One tab for extract-all to render, shipped to a pool worker."""
+
+    path: Path
+    tab_id: str
+    # {"tabs": [tab]} with child tabs left out; enough to render the tab.
+    doc: dict
+    # Frontmatter block for a file that does not exist yet.
+    frontmatter: str
+    tab_slug_map: dict[str, str]
+    url_slug_map: dict[str, str]
+
+
+def _extract_one(job: ExtractJob) -> bool:
+    """Render *job* into its file; return False if the file was already current.
+
+    An existing file keeps its frontmatter and is only rewritten when its
+    body differs from the rendered one, so unchanged files keep their mtime.
+    """
+    md = "".join(iter_tab_markdown(
+        job.doc, job.tab_id, tab_slug_map=job.tab_slug_map,
+        heading_slug_map=_build_heading_slug_map(job.doc, job.tab_id),
+        url_slug_map=job.url_slug_map,
+    ))
+    try:
+        frontmatter, body = _split_frontmatter(job.path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        frontmatter, body = job.frontmatter, None
+    if body == md:
+        return False
+    _write_atomic(job.path, frontmatter + md)
+    return True
+
+
+def _plan_extract_all(doc: dict, out_dir: Path) -> list[ExtractJob]:
+    """Assign every tab of *doc* a file in *out_dir*.
+
+    A file whose gdoc_url and gdoc_tab_id frontmatter already name the tab
+    keeps it; other tabs get <title slug>.md, suffixed on collision.
+    """
+    doc_id = doc.get("documentId", "")
+    doc_url = f"https://docs.google.com/document/d/{doc_id}/edit"
+    existing: dict[str, Path] = {}
+    taken: set[str] = set()
+    for path in sorted(out_dir.glob("*.md")):
+        taken.add(path.name)
+        try:
+            fm_doc, fm_tab = _frontmatter_target(path)
+        except (OSError, UnicodeDecodeError, yaml.YAMLError):
+            continue
+        if fm_doc == doc_id and fm_tab:
+            existing.setdefault(fm_tab, path)
+
+    tabs = _iter_tabs(doc.get("tabs", []))
+    paths: dict[str, Path] = {}
+    frontmatter: dict[str, str] = {}
+    for tab in tabs:
+        props = tab.get("tabProperties", {})
+        tab_id = props.get("tabId", "")
+        if tab_id in existing:
+            paths[tab_id] = existing[tab_id]
+            continue
+        stem = _slugify(props.get("title", "")) or _slugify(tab_id)
+        name, n = f"{stem}.md", 1
+        while name in taken:
+            n += 1
+            name = f"{stem}-{n}.md"
+        taken.add(name)
+        paths[tab_id] = out_dir / name
+        frontmatter[tab_id] = "---\n" + yaml.dump(
+            {"gdoc_url": doc_url, "gdoc_tab_id": tab_id},
+            default_flow_style=False, allow_unicode=True) + "---\n"
+
+    # Wikilinks resolve to the files being written, as with --files-dir.
+    tab_slug_map = {tab_id: _slugify(path.stem) for tab_id, path in paths.items()}
+    url_slug_map = {f"{doc_url}?tab={tab_id}": slug for tab_id, slug in tab_slug_map.items()}
+    jobs = []
+    for tab in tabs:
+        tab_id = tab["tabProperties"]["tabId"]
+        leaf = {k: v for k, v in tab.items() if k != "childTabs"}
+        jobs.append(ExtractJob(paths[tab_id], tab_id, {"tabs": [leaf]},
+                               frontmatter.get(tab_id, ""), tab_slug_map, url_slug_map))
+    return jobs
+
+
+def cmd_extract_all(args: argparse.Namespace) -> None:
+    asyncio.run(cmd_extract_all_async(args, _async_client(args)))
+
+
+async def cmd_extract_all_async(args: argparse.Namespace, client: AsyncDocsClient) -> None:
+    """Mirror every tab of a document into a directory of markdown files.
+
+    The document is read once; tabs are rendered on a process pool.
+    """
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    started = time.monotonic()
+    doc = await client.get_document(args.document, FIELDS_TAB_CONTENT)
+    jobs = _plan_extract_all(doc, out_dir)
+
+    workers = max(1, min(args.jobs, len(jobs)))
+    if workers == 1:
+        written = [_extract_one(job) for job in jobs]
+    else:
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            written = await asyncio.gather(*(
+                loop.run_in_executor(pool, _extract_one, job) for job in jobs))
+    for job, changed in zip(jobs, written):
+        if changed:
+            print(job.path)
+    print(f"{sum(written)} written, {len(jobs) - sum(written)} unchanged "
+          f"in {time.monotonic() - started:.1f}s", file=sys.stderr)
 
 
 def cmd_update_tab(args: argparse.Namespace) -> None:
+    asyncio.run(cmd_update_tab_async(args, _async_client(args)))
+
+
+async def cmd_update_tab_async(args: argparse.Namespace, client: AsyncDocsClient) -> None:
     """Push local markdown changes to a live Google Doc tab.
 
     Uses segment-based diffing to make minimal, surgical edits that
     preserve comments and other annotations in the document.
     """
     doc_id = args.document
-    local_path = Path(args.file)
+    path = Path(args.file)
+    files_list = sorted(Path(args.files_dir).glob("*.md")) if getattr(args, "files_dir", None) else []
+
+    # 0. A body whose hash matches the last successful push to this same tab
+    #    needs no read at all.
+    fm, local_body = _load_frontmatter(path.read_text(encoding="utf-8"))
+    target = _tab_target(fm)
+    pushed_hash = _hash_body(local_body)
+    if (not getattr(args, "force", False) and target == (doc_id, args.tab)
+            and fm.get("gdoc_pushed_hash") == pushed_hash):
+        print("Already in sync (unchanged since last push)", file=sys.stderr)
+        sys.exit(0)
 
     # 1. Fetch document
-    doc = _gws("docs", "documents", "get",
-               "--params", json.dumps({
-                   "documentId": doc_id,
-                   "includeTabsContent": "true",
-               }))
+    doc = await client.get_document(doc_id, FIELDS_TAB_CONTENT)
 
-    tab_id, _tab_title = find_tab_by_title_or_id(doc, args.tab)
+    transport = get_client()
+    ok, message, doc_after = await update_tab(
+        client, doc, args.tab, local_body, files_list, getattr(args, "verify", False),
+        on_align=transport.log_alignment if isinstance(transport, PlanningClient) else None,
+    )
+    if (ok and not getattr(args, "plan", False)
+            and target == (doc_id, find_tab_by_title_or_id(doc_after, args.tab)[0])):
+        _record_push(path, pushed_hash)
+    print(message, file=sys.stderr)
+    sys.exit(0 if ok else 1)
+
+
+def _record_push(path: Path, pushed_hash: str) -> None:
+    """Store *pushed_hash* as gdoc_pushed_hash unless the file already says so."""
+    fm, _ = _load_frontmatter(path.read_text(encoding="utf-8"))
+    if fm.get("gdoc_pushed_hash") != pushed_hash:
+        patch_frontmatter(path, {"gdoc_pushed_hash": pushed_hash})
+
+
+def _stem_tab_map(doc: dict, files_list: list[Path]) -> dict[str, str]:
+    """Map filename stems to tab ids, as create's tab_map does.
+
+    Stems come from *files_list*'s gdoc_tab_id frontmatter, else from the
+    tab titles of *doc*. Slugified stems are mapped too, since extracted
+    wikilinks spell them that way.
+    """
+    slugs = load_tab_slug_map_from_files(files_list) if files_list else _build_tab_slug_map(doc)
+    tab_map = {slug: tab_id for tab_id, slug in slugs.items()}
+    for path in files_list:
+        fm, _ = _load_frontmatter(path.read_text(encoding="utf-8"))
+        if fm.get("gdoc_tab_id"):
+            tab_map[path.stem] = str(fm["gdoc_tab_id"])
+    return tab_map
+
+
+def _cell_texts(doc: dict, tab_id: str) -> list[str]:
+    """The full text of every table cell in *tab_id*, in order.
+
+    Extraction shows only a cell's last paragraph, so code blocks compare
+    equal whatever they hold unless their cells are compared too.
+    """
+    tab = _find_tab(doc.get("tabs", []), tab_id)
+    texts: list[str] = []
+    for el in tab.get("documentTab", {}).get("body", {}).get("content", []) if tab else []:
+        for row in el.get("table", {}).get("tableRows", []):
+            for cell in row.get("tableCells", []):
+                texts.append("".join(_paragraph_text_from_api(p["paragraph"])
+                                     for p in cell.get("content", []) if "paragraph" in p))
+    return texts
+
+
+async def update_tab(client: AsyncDocsClient, doc: dict, tab: str, local_body: str,
+                     files_list: list[Path], verify: bool = False,
+                     on_align: Callable[[int, list[SegmentMatch]], None] | None = None,
+                     ) -> tuple[bool, str, dict]:
+    """Make tab *tab* of *doc* match *local_body*; return (ok, message, doc after).
+
+    The target is the tab as create would write *local_body*
+    (render_expected_tab). Pass 1 edits and deletes blocks in place, pass 2
+    inserts the missing ones, and a third pass catches edits that could
+    only be made once pass 2's headings existed, such as links to them.
+
+    *doc* is a FIELDS_TAB_CONTENT read; every write is pinned to its
+    revision. The returned document has the same shape, with the tab as
+    predicted (or re-read) after the writes and the new revisionId, so it
+    can serve as the read for a later call. *on_align*, if given, is called
+    with the pass number and the alignment of each pass.
+    """
+    from gdocs_emulator import EmulatorError, apply_fields_mask, parse_fields_mask
+
+    doc_id = doc["documentId"]
+    tab_id, _tab_title = find_tab_by_title_or_id(doc, tab)
 
     # Build maps for wikilink resolution
-    files_list = sorted(Path(args.files_dir).glob("*.md")) if getattr(args, "files_dir", None) else []
     tab_slug_map = (
         load_tab_slug_map_from_files(files_list)
         if files_list
         else _build_tab_slug_map(doc)
     )
     url_slug_map = load_url_slug_map_from_files(files_list) if files_list else None
-    heading_slug_map = _build_heading_slug_map(doc, tab_id)
-
-    # 2. Extract with source map
-    extracted_md, source_spans = extract_tab_with_source_map(
-        doc, tab_id, tab_slug_map=tab_slug_map, heading_slug_map=heading_slug_map,
-        url_slug_map=url_slug_map,
-    )
 
-    # 3. Strip frontmatter from local file and parse to segments
-    local_text = local_path.read_text(encoding="utf-8")
-    local_body = _strip_frontmatter(local_text)
-
-    # 4. Check if already in sync (using normalized comparison)
-    if _normalize_for_comparison(extracted_md) == _normalize_for_comparison(local_body):
-        print("Already in sync", file=sys.stderr)
-        sys.exit(0)
+    def extract(current: dict) -> tuple[str, SourceMap]:
+        return extract_tab_with_source_map(
+            current, tab_id, tab_slug_map=tab_slug_map,
+            heading_slug_map=_build_heading_slug_map(current, tab_id),
+            url_slug_map=url_slug_map,
+        )
 
-    # 5. Parse both sides to segments
-    old_segments = parse_to_segments(extracted_md, source_spans)
-    new_segments = parse_to_segments(local_body)
+    # 1. Render the target and extract both sides the same way
+    with _TRACER.span("render expected", "build"):
+        try:
+            expected = render_expected_tab(doc, tab_id, local_body,
+                                           _stem_tab_map(doc, files_list))
+        except EmulatorError as e:
+            return False, f"Cannot model the local file ({e.message})", doc
+    # Extracted as a read would see it; runs are bound from the full render,
+    # which also has the styles the read mask leaves out.
+    with _TRACER.span("extract tab", "extract"):
+        expected_md, expected_spans = extract(
+            apply_fields_mask(expected, parse_fields_mask(FIELDS_TAB_CONTENT)))
+        extracted_md, source_spans = extract(doc)
+    expected_sync = (_normalize_for_comparison(expected_md), _cell_texts(expected, tab_id))
+    expected_lists = TabBody(expected, tab_id).lists
+    expected_slugs = _build_heading_slug_map(expected, tab_id)
+
+    def in_sync(current: dict, md: str) -> bool:
+        return (_normalize_for_comparison(md), _cell_texts(current, tab_id)) == expected_sync
+
+    if in_sync(doc, extracted_md):
+        return True, "Already in sync", doc
+
+    def align(pass_no: int, current: dict, md: str, spans: SourceMap,
+              ) -> tuple[list[SegmentMatch], dict[str, str]]:
+        """Align *current* with the target; return the matches and heading ids."""
+        live_ids: dict[str, str] = {}
+        for heading_id, slug in _build_heading_slug_map(current, tab_id).items():
+            live_ids.setdefault(slug, heading_id)
+        heading_ids = {eid: live_ids[slug] for eid, slug in expected_slugs.items()
+                       if slug in live_ids}
+        with _TRACER.span("align segments", "diff") as span:
+            old_segments = parse_to_segments(md, spans)
+            bind_segments(old_segments, current, tab_id)
+            new_segments = parse_to_segments(expected_md, expected_spans)
+            bind_segments(new_segments, expected, tab_id, heading_ids)
+            matches = align_segments(old_segments, new_segments)
+            span.set(old=len(old_segments), new=len(new_segments))
+        if on_align is not None:
+            on_align(pass_no, matches)
+        return matches, heading_ids
+
+    # Writes are pinned to the revision they were computed from, and the
+    # tab after each write is predicted locally rather than read back.
+    replica = LocalReplica(doc, tab_id)
+
+    async def write(requests: list[Request], what: str) -> None:
+        try:
+            resp = await client.batch_update(doc_id, requests,
+                                             revision=replica.revision_id or None)
+        except RevisionMismatchError:
+            # Any other error has already been reported by batch_update.
+            # Exiting lets watch retry once from a fresh read.
+            print(f"{what} failed: the document changed since it was read; "
+                  f"nothing from this pass was applied, run update-tab again",
+                  file=sys.stderr)
+            sys.exit(1)
+        replica.apply(requests, resp)
 
-    # 6. Align segments and compute edits
-    matches = align_segments(old_segments, new_segments)
+    async def current_tab() -> tuple[dict, str, SourceMap]:
+        # Updated indices come from the replica, or a re-fetch if it went stale
+        if replica.stale:
+            current = await client.get_document(doc_id, FIELDS_TAB_CONTENT)
+            replica.revision_id = current.get("revisionId", "")
+        else:
+            current = replica.document()
+        with _TRACER.span("extract tab", "extract"):
+            md, spans = extract(current)
+        return current, md, spans
 
     # === PASS 1: Apply edits and deletions only ===
-    # Filter to edits and deletions (skip insertions for now)
-    pass1_actionable = [m for m in matches if m.edits or m.kind == "deleted"]
+    matches, _ = align(1, doc, extracted_md, source_spans)
+    requests = collect_update_requests(
+        [m for m in matches if m.edits or m.kind == "deleted"], tab_id)
+    if requests:
+        await write(requests, "Pass 1 (edits/deletions)")
 
-    if pass1_actionable:
-        requests = collect_update_requests(pass1_actionable, tab_id, tab_slug_map, doc_id)
+    # === PASS 2: Apply insertions with fresh anchor points ===
+    if any(m.kind == "inserted" for m in matches) or requests:
+        current, md, spans = await current_tab()
+        matches, heading_ids = align(2, current, md, spans)
+        requests = collect_update_requests(
+            [m for m in matches if m.kind == "inserted"], tab_id,
+            TabBody(current, tab_id), expected_lists, heading_ids)
         if requests:
-            try:
-                _gws("docs", "documents", "batchUpdate",
-                     "--params", json.dumps({"documentId": doc_id}),
-                     "--json", json.dumps({"requests": requests}))
-            except subprocess.CalledProcessError as e:
-                print(f"Pass 1 (edits/deletions) failed: {e}", file=sys.stderr)
-                sys.exit(1)
+            await write(requests, "Pass 2 (insertions)")
+
+            # === PASS 3: Edits that needed the inserted headings ===
+            current, md, spans = await current_tab()
+            if not in_sync(current, md):
+                matches, _ = align(3, current, md, spans)
+                requests = collect_update_requests([m for m in matches if m.edits], tab_id)
+                if requests:
+                    await write(requests, "Pass 3 (edits)")
+
+    # Verify sync: against the replica, and live only with --verify or
+    # when the prediction disagrees with the target
+    def verified(doc_after: dict) -> bool:
+        with _TRACER.span("verify sync", "extract"):
+            md, _ = extract(doc_after)
+            return in_sync(doc_after, md)
+
+    ok = False
+    doc_after = doc
+    if not (replica.stale or verify):
+        doc_after = _with_tab(doc, replica.document())
+        ok = verified(doc_after)
+    if not ok:
+        doc_after = await client.get_document(doc_id, FIELDS_TAB_CONTENT)
+        ok = verified(doc_after)
+
+    if ok:
+        return True, "Sync complete", doc_after
+    return False, "Sync completed but verification failed \u2014 run extract-tab to inspect", doc_after
+
+
+def _with_tab(doc: dict, replica_doc: dict) -> dict:
+    """Return *doc* with its copy of the replica's one tab replaced.
+
+    The replica leaves child tabs out, so the old tab's childTabs are kept.
+    """
+    (tab,) = replica_doc["tabs"]
+    tab_id = tab["tabProperties"]["tabId"]
 
-    # === PASS 2: Apply insertions with fresh anchor points ===
-    insertions = [m for m in matches if m.kind == "inserted"]
-    
-    if insertions:
-        # Re-fetch document to get updated indices
-        doc = _gws("docs", "documents", "get",
-                   "--params", json.dumps({
-                       "documentId": doc_id,
-                       "includeTabsContent": "true",
-                   }))
-        
-        # Re-extract with source map
-        extracted_md, source_spans = extract_tab_with_source_map(
-            doc, tab_id, tab_slug_map=tab_slug_map, heading_slug_map=heading_slug_map,
-            url_slug_map=url_slug_map,
-        )
-        
-        # Re-parse and re-align to get accurate insertion points
-        old_segments = parse_to_segments(extracted_md, source_spans)
-        matches = align_segments(old_segments, new_segments)
-        
-        # Now get insertions with correct insert_after_api values
-        pass2_actionable = [m for m in matches if m.kind == "inserted"]
-        
-        if pass2_actionable:
-            requests = collect_update_requests(pass2_actionable, tab_id, tab_slug_map, doc_id)
-            if requests:
-                try:
-                    _gws("docs", "documents", "batchUpdate",
-                         "--params", json.dumps({"documentId": doc_id}),
-                         "--json", json.dumps({"requests": requests}))
-                except subprocess.CalledProcessError as e:
-                    print(f"Pass 2 (insertions) failed: {e}", file=sys.stderr)
-                    sys.exit(1)
-
-    # 9. Verify sync
-    doc_after = _gws("docs", "documents", "get",
-                     "--params", json.dumps({
-                         "documentId": doc_id,
-                         "includeTabsContent": "true",
-                     }))
-    extracted_after, _ = extract_tab_with_source_map(
-        doc_after, tab_id, tab_slug_map=tab_slug_map, heading_slug_map=heading_slug_map,
-        url_slug_map=url_slug_map,
-    )
+    def swap(tabs: list[dict]) -> list[dict]:
+        out = []
+        for t in tabs:
+            if t.get("tabProperties", {}).get("tabId") == tab_id:
+                t = {**tab, **({"childTabs": t["childTabs"]} if "childTabs" in t else {})}
+            elif t.get("childTabs"):
+                t = {**t, "childTabs": swap(t["childTabs"])}
+            out.append(t)
+        return out
+
+    return {**doc, "revisionId": replica_doc["revisionId"], "tabs": swap(doc.get("tabs", []))}
 
-    if _normalize_for_comparison(extracted_after) == _normalize_for_comparison(local_body):
-        print("Sync complete", file=sys.stderr)
-        sys.exit(0)
-    else:
-        # Show the diff for debugging
-        print(
-            "Sync completed but verification failed \u2014 run extract-tab to inspect",
-            file=sys.stderr,
-        )
-        sys.exit(1)
 
 def cmd_sync_local(args: argparse.Namespace) -> None:
-    """Pull live doc changes to the local markdown file."""
-    import tempfile
+    asyncio.run(cmd_sync_local_async(args, _async_client(args)))
 
-    doc_id = args.document
-    local_path = Path(args.file)
 
-    # 1. Fetch document
-    doc = _gws("docs", "documents", "get",
-               "--params", json.dumps({
-                   "documentId": doc_id,
-                   "includeTabsContent": "true",
-               }))
+def _frontmatter_target(path: Path) -> tuple[str, str]:
+    """Return (document id, tab id) from *path*'s gdoc_url and gdoc_tab_id, or blanks."""
+    fm, _ = _load_frontmatter(path.read_text(encoding="utf-8"))
+    return _tab_target(fm)
 
-    tab_id, _tab_title = find_tab_by_title_or_id(doc, args.tab)
+
+def _tab_target(fm: dict) -> tuple[str, str]:
+    """Return (document id, tab id) from parsed frontmatter *fm*, or blanks."""
+    m = re.search(r"/d/([a-zA-Z0-9_-]+)", str(fm.get("gdoc_url", "")))
+    tab = fm.get("gdoc_tab_id")
+    return (m.group(1) if m else ""), (str(tab) if tab else "")
+
+
+def _sync_targets(args: argparse.Namespace) -> list[tuple[Path, str, str]]:
+    """Return (file, document id, tab) for each sync-local FILE.
+
+    --document and --tab apply to every file; without them each file's
+    gdoc_url and gdoc_tab_id frontmatter are used.
+    """
+    targets: list[tuple[Path, str, str]] = []
+    for name in args.files:
+        path = Path(name)
+        if not path.exists():
+            print(f"File not found: {path}", file=sys.stderr)
+            sys.exit(1)
+        doc_id, tab = args.document, args.tab
+        if not (doc_id and tab):
+            fm_doc, fm_tab = _frontmatter_target(path)
+            doc_id = doc_id or fm_doc
+            tab = tab or fm_tab
+        if not (doc_id and tab):
+            print(f"{path}: pass --document and --tab, or add gdoc_url and "
+                  f"gdoc_tab_id frontmatter", file=sys.stderr)
+            sys.exit(1)
+        targets.append((path, doc_id, tab))
+    return targets
+
+
+async def cmd_sync_local_async(args: argparse.Namespace, client: AsyncDocsClient) -> None:
+    """Pull live doc changes into one or more local markdown files.
+
+    Each distinct document is fetched once and all fetches run concurrently;
+    each file's body is then replaced on a worker thread.
+    """
+    targets = _sync_targets(args)
+    docs = await client.get_documents([doc_id for _, doc_id, _ in targets],
+                                     FIELDS_TAB_CONTENT)
+    outcomes = await _gather(*(
+        asyncio.to_thread(_sync_local_file, docs[doc_id], tab, path, args.files_dir,
+                          getattr(args, "force", False))
+        for path, doc_id, tab in targets
+    ))
+    failed = False
+    for (path, _, _), (ok, message) in zip(targets, outcomes):
+        print(message if len(targets) == 1 else f"{path}: {message}", file=sys.stderr)
+        failed = failed or not ok
+    if failed:
+        sys.exit(1)
+
+
+def _sync_local_file(doc: dict, tab: str, local_path: Path, files_dir: str | None,
+                     force: bool = False) -> tuple[bool, str]:
+    """Replace the body of *local_path* with the live content of *tab*.
+
+    This is not a merge: whatever the local body holds is overwritten. Unless
+    *force*, a file whose body no longer hashes to its gdoc_pushed_hash has
+    local edits that were never pushed and is left alone. When the file's
+    frontmatter names this tab, the new body's hash is recorded as pushed,
+    since the tab now matches it. Returns (ok, message).
+    """
+    tab_id, _tab_title = find_tab_by_title_or_id(doc, tab)
 
     # Build maps for wikilink resolution
     tab_slug_map = (
-        load_tab_slug_map_from_files(sorted(Path(args.files_dir).glob("*.md")))
-        if getattr(args, "files_dir", None)
+        load_tab_slug_map_from_files(sorted(Path(files_dir).glob("*.md")))
+        if files_dir
         else _build_tab_slug_map(doc)
     )
     heading_slug_map = _build_heading_slug_map(doc, tab_id)
 
-    # 2. Extract live content
-    regions = extract_tab_regions(doc, tab_id)
-    extracted_md = render_tab_as_markdown(
-        regions, tab_slug_map=tab_slug_map, heading_slug_map=heading_slug_map
-    )
+    # 1. Extract live content
+    extracted_md = "".join(iter_tab_markdown(
+        doc, tab_id, tab_slug_map=tab_slug_map, heading_slug_map=heading_slug_map
+    ))
 
-    # 3. Read local file and separate frontmatter from body
+    # 2. Read local file and separate frontmatter from body
     local_text = local_path.read_text(encoding="utf-8")
     frontmatter, local_body = _split_frontmatter(local_text)
+    fm, _ = _load_frontmatter(local_text)
 
-    # 4. Check if already in sync
+    # 3. Check if already in sync
     if extracted_md.strip() == local_body.strip():
-        print("Already in sync", file=sys.stderr)
-        sys.exit(0)
+        return True, "Already in sync"
+
+    # 4. Refuse to overwrite local edits made since the last push
+    pushed_hash = fm.get("gdoc_pushed_hash")
+    if not force and pushed_hash and pushed_hash != _hash_body(local_body):
+        return False, ("Local edits not pushed yet; push them with update-tab, "
+                       "or pass --force to replace them with the doc's content")
+
+    # 5. The live body replaces the local one; the frontmatter block is kept
+    #    byte for byte apart from gdoc_pushed_hash
+    try:
+        _write_atomic(local_path, frontmatter + extracted_md)
+        if _tab_target(fm) == (doc.get("documentId", ""), tab_id):
+            _record_push(local_path, _hash_body(extracted_md))
+    except OSError as e:
+        return False, f"Write failed: {e}"
+    return True, "Sync complete"
+
+
+@dataclass
+class WatchedFile:
+    """A published markdown file that `watch` keeps in step with its tab."""
+
+    path: Path
+    doc_id: str
+    tab: str
+    # Normalized local body and tab markdown as of the last time the two
+    # were reconciled; None until known.
+    local: str | None = None
+    remote: str | None = None
+    # Left alone after a conflict or failed push, until the file is saved.
+    held: bool = False
 
-    # 5. Generate diff (local as old, extracted as new)
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".md", delete=False) as f_loc:
-        f_loc.write(local_body)
-        local_body_path = f_loc.name
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".md", delete=False) as f_ext:
-        f_ext.write(extracted_md)
-        extracted_path = f_ext.name
 
-    patch_path: str | None = None
+def cmd_watch(args: argparse.Namespace) -> None:
     try:
-        # Generate patch
-        result = subprocess.run(
-            ["diff", "-u", local_body_path, extracted_path],
-            capture_output=True,
-            text=True,
+        asyncio.run(cmd_watch_async(args, _async_client(args)))
+    except KeyboardInterrupt:
+        print("Stopped watching", file=sys.stderr)
+
+
+async def cmd_watch_async(args: argparse.Namespace, client: AsyncDocsClient) -> None:
+    """Push saved files to their tabs and pull remote edits until interrupted.
+
+    Every *.md in the directory with gdoc_url and gdoc_tab_id frontmatter is
+    watched. Saves are debounced, then pushed through update_tab() against a
+    warm read of the document, so a save normally costs one batchUpdate. A
+    fields=revisionId probe per document every --interval seconds detects
+    remote edits; the document is then re-read and edited tabs are pulled
+    into files that have no unpushed changes of their own.
+    """
+    directory = Path(args.directory)
+    if not directory.is_dir():
+        print(f"Not a directory: {directory}", file=sys.stderr)
+        sys.exit(1)
+
+    watched: dict[Path, WatchedFile] = {}
+    # Latest FIELDS_TAB_CONTENT read of each document, kept current by our
+    # own writes; dropped whenever a call on the document fails.
+    docs: dict[str, dict] = {}
+
+    def track(path: Path) -> WatchedFile | None:
+        try:
+            doc_id, tab = _frontmatter_target(path)
+        except (OSError, UnicodeDecodeError, yaml.YAMLError):
+            doc_id = tab = ""
+        wf = watched.get(path)
+        if not (doc_id and tab):
+            watched.pop(path, None)
+            return None
+        if wf is None or (wf.doc_id, wf.tab) != (doc_id, tab):
+            wf = watched[path] = WatchedFile(path, doc_id, tab)
+        return wf
+
+    for path in sorted(directory.glob("*.md")):
+        track(path)
+    if not watched:
+        print(f"No files with gdoc_url and gdoc_tab_id frontmatter in {directory}",
+              file=sys.stderr)
+        sys.exit(1)
+
+    def local_body(wf: WatchedFile) -> str:
+        return _strip_frontmatter(wf.path.read_text(encoding="utf-8"))
+
+    def tab_markdown(wf: WatchedFile, doc: dict) -> str:
+        files_list = sorted(directory.glob("*.md"))
+        tab_id, _ = find_tab_by_title_or_id(doc, wf.tab)
+        md, _ = extract_tab_with_source_map(
+            doc, tab_id, tab_slug_map=load_tab_slug_map_from_files(files_list),
+            heading_slug_map=_build_heading_slug_map(doc, tab_id),
+            url_slug_map=load_url_slug_map_from_files(files_list),
         )
-        diff_output = result.stdout
-
-        if not diff_output.strip():
-            print("Already in sync", file=sys.stderr)
-            sys.exit(0)
-
-        # Write patch to temp file
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".patch", delete=False) as f_patch:
-            f_patch.write(diff_output)
-            patch_path = f_patch.name
-
-        # Apply patch to local body
-        patch_result = subprocess.run(
-            ["patch", "-p0", local_body_path],
-            stdin=open(patch_path),
-            capture_output=True,
-            text=True,
+        return _normalize_for_comparison(md)
+
+    async def push(wf: WatchedFile) -> None:
+        body = local_body(wf)
+        ok, message, doc_after = await update_tab(
+            client, docs[wf.doc_id], wf.tab, body, sorted(directory.glob("*.md")), args.verify,
         )
+        docs[wf.doc_id] = doc_after
+        if ok:
+            _record_push(wf.path, _hash_body(body))
+        wf.local = _normalize_for_comparison(body)
+        wf.remote = wf.local if ok else tab_markdown(wf, doc_after)
+        print(f"{wf.path.name}: {message}", file=sys.stderr)
+
+    async def pull(wf: WatchedFile, remote: str) -> None:
+        # reconcile() only pulls into a file unchanged since it was last
+        # reconciled, so there are no local edits to protect.
+        ok, message = await asyncio.to_thread(
+            _sync_local_file, docs[wf.doc_id], wf.tab, wf.path, str(directory), True)
+        if not ok:
+            wf.held = True
+            print(f"{wf.path.name}: pull failed: {message}", file=sys.stderr)
+            return
+        wf.local = _normalize_for_comparison(local_body(wf))
+        wf.remote = remote
+        print(f"{wf.path.name}: pulled remote edits", file=sys.stderr)
+
+    async def reconcile(wf: WatchedFile) -> None:
+        if wf.held:
+            return
+        local = _normalize_for_comparison(local_body(wf))
+        remote = tab_markdown(wf, docs[wf.doc_id])
+        if local == remote:
+            wf.local = wf.remote = local
+        elif wf.remote is None:
+            wf.remote, wf.held = remote, True
+            print(f"{wf.path.name}: differs from its tab; save it to push, "
+                  f"or run sync-local to pull", file=sys.stderr)
+        elif local != wf.local and remote != wf.remote:
+            wf.local, wf.remote, wf.held = None, remote, True
+            print(f"{wf.path.name}: changed both locally and in the doc; save it "
+                  f"again to push, or run sync-local --force to pull", file=sys.stderr)
+        elif remote != wf.remote:
+            await pull(wf, remote)
+        elif local != wf.local:
+            await push(wf)
+
+    async def sync_doc(doc_id: str, saved: set[Path], poll: bool,
+                       retry: bool = True) -> None:
+        """Reconcile the files on *doc_id*: saved ones always, the rest
+        only when the document is re-read."""
+        try:
+            warm = docs.get(doc_id)
+            fresh = warm is None or (
+                poll and await client.get_revision(doc_id) != warm.get("revisionId"))
+            if fresh:
+                docs[doc_id] = await client.get_document(doc_id, FIELDS_TAB_CONTENT)
+        except SystemExit:
+            docs.pop(doc_id, None)
+            return
+        for wf in [w for w in watched.values() if w.doc_id == doc_id]:
+            if wf.path in saved:
+                wf.held = False
+            elif not fresh:
+                continue
+            try:
+                await reconcile(wf)
+            except SystemExit:
+                # The error is already reported. A write pinned to a revision
+                # the document has moved past ends up here too, so a warm
+                # read earns one more attempt from a fresh one.
+                docs.pop(doc_id, None)
+                if retry and not fresh:
+                    await sync_doc(doc_id, saved, poll, retry=False)
+                    return
+                wf.held = True
+                print(f"{wf.path.name}: not synced; save it again to retry",
+                      file=sys.stderr)
+                return
+
+    async def sync(saved: set[Path], poll: bool) -> None:
+        saved = {p for p in saved if p.is_file() and track(p)}
+        doc_ids = {watched[p].doc_id for p in saved}
+        if poll:
+            doc_ids.update(wf.doc_id for wf in watched.values())
+        await _gather(*(sync_doc(d, saved, poll) for d in sorted(doc_ids)))
+
+    watcher = open_watcher(directory)
+    print(f"Watching {len(watched)} files in {directory} ({watcher.name}); "
+          f"Ctrl-C to stop", file=sys.stderr)
+    pending: set[Path] = set()
+    push_at = next_poll = time.monotonic()
+    try:
+        while True:
+            now = time.monotonic()
+            wake = min(next_poll, push_at) if pending else next_poll
+            changed = await asyncio.to_thread(watcher.changes, max(0.0, wake - now))
+            now = time.monotonic()
+            if changed:
+                pending |= changed
+                push_at = now + args.debounce
+            poll = now >= next_poll
+            if poll or (pending and now >= push_at):
+                due: set[Path] = set()
+                if now >= push_at:
+                    due, pending = pending, set()
+                await sync(due, poll)
+                if poll:
+                    next_poll = time.monotonic() + args.interval
+    finally:
+        watcher.close()
+
+
+# ---------------------------------------------------------------------------
+# Manifest publishing
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class PublishJob:
+    """One manifest document and the work planned for it."""
+
+    name: str
+    root: Path
+    files: list[Path]
+    title: str | None = None
+    document_id: str = ""
+    # "create", "update" or "skip".
+    action: str = "create"
+    # Files whose body changed since the last publish ("update" only).
+    changed: list[Path] = field(default_factory=list)
+    # Manifest-relative path -> body hash.
+    fingerprint: dict[str, str] = field(default_factory=dict)
+
+    def key(self, path: Path) -> str:
+        return os.path.relpath(path, self.root)
+
 
-        if patch_result.returncode != 0:
-            print(f"Patch failed: {patch_result.stderr}", file=sys.stderr)
+@dataclass
+class PublishResult:
+    name: str
+    action: str
+    document_id: str = ""
+    ok: bool = True
+    error: str = ""
+    reads: int = 0
+    writes: int = 0
+    throttled: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    seconds: float = 0.0
+    # The worker's trace events under --trace, merged by the parent.
+    trace: list[dict] = field(default_factory=list)
+
+
+def _publish_state_path(manifest: Path) -> Path:
+    return manifest.with_name(f".{manifest.name}.state.json")
+
+
+def load_manifest(manifest: Path) -> list[PublishJob]:
+    """Parse a publish manifest into jobs (action not yet planned).
+
+    The manifest is YAML with a `documents` list; each entry has `files`
+    (paths relative to the manifest) and optionally `name`, `title` and
+    `document_id`.
+    """
+    data = yaml.safe_load(manifest.read_text(encoding="utf-8")) or {}
+    entries = data.get("documents") if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        print(f"{manifest}: expected a non-empty 'documents' list", file=sys.stderr)
+        sys.exit(1)
+    jobs: list[PublishJob] = []
+    seen: set[str] = set()
+    for i, entry in enumerate(entries):
+        files = entry.get("files") if isinstance(entry, dict) else None
+        if not files:
+            print(f"{manifest}: document {i} has no files", file=sys.stderr)
+            sys.exit(1)
+        paths = [(manifest.parent / f).resolve() for f in files]
+        for p in paths:
+            if not p.exists():
+                print(f"File not found: {p}", file=sys.stderr)
+                sys.exit(1)
+        name = str(entry.get("name") or entry.get("title") or paths[0].stem)
+        if name in seen:
+            print(f"{manifest}: duplicate document name {name!r}", file=sys.stderr)
             sys.exit(1)
+        seen.add(name)
+        jobs.append(PublishJob(name=name, root=manifest.parent.resolve(), files=paths, title=entry.get("title"),
+                               document_id=str(entry.get("document_id") or "")))
+    return jobs
 
-        # Read patched content
-        patched_body = Path(local_body_path).read_text(encoding="utf-8")
 
-        # 6. Reconstruct file with frontmatter
-        if frontmatter:
-            new_content = frontmatter + "\n" + patched_body
-        else:
-            new_content = patched_body
+def plan_publish(jobs: list[PublishJob], state: dict[str, Any],
+                 force: bool = False) -> None:
+    """Decide create/update/skip for each job in place.
+
+    A document is created when no document id is known (from the manifest or
+    the first file's gdoc_url). Otherwise only files whose body hash differs
+    from the last successful publish are pushed; files without a
+    gdoc_tab_id are added as new tabs.
+    """
+    for job in jobs:
+        job.fingerprint = {
+            job.key(p): _hash_body(_strip_frontmatter(p.read_text(encoding="utf-8")))
+            for p in job.files
+        }
+        if not job.document_id:
+            fm, _ = parse(job.files[0].read_text(encoding="utf-8"))
+            m = re.search(r"/d/([a-zA-Z0-9_-]+)", str(fm.get("gdoc_url", "")))
+            job.document_id = m.group(1) if m else ""
+        if not job.document_id:
+            job.action = "create"
+            continue
+        previous = state.get(job.name, {})
+        old = previous.get("files", {}) if previous.get("document_id") == job.document_id else {}
+        job.changed = [p for p in job.files
+                       if force or old.get(job.key(p)) != job.fingerprint[job.key(p)]]
+        job.action = "update" if job.changed else "skip"
+
+
+def _publish_init(backend: str, reads: tuple[float, Any], writes: tuple[float, Any],
+                  optimize: bool = True, trace: bool = False) -> None:
+    """Process-pool initializer: own transport, shared quota buckets."""
+    global OPTIMIZE_REQUESTS
+    OPTIMIZE_REQUESTS = optimize
+    _TRACER.enabled = trace
+    set_client(make_client(backend))
+    scheduler = ApiScheduler(reads[0], writes[0])
+    scheduler.reads = SharedTokenBucket(*reads)
+    scheduler.writes = SharedTokenBucket(*writes)
+    set_scheduler(scheduler)
+
+
+def _publish_one(job: PublishJob, verify_indices: bool = False,
+                 force: bool = False) -> PublishResult:
+    """Run one planned job in this process and account for its API usage."""
+    result = PublishResult(name=job.name, action=job.action, document_id=job.document_id)
+    client = get_client()
+    stats_before = ApiStats(**vars(_SCHEDULER.stats))
+    received_before = client.bytes_received
+    started = time.monotonic()
+    out = io.StringIO()
+    try:
+        with redirect_stdout(out), _TRACER.span(f"publish {job.name}", "command",
+                                                action=job.action):
+            if job.action == "create":
+                cmd_create(argparse.Namespace(
+                    files=[str(p) for p in job.files], title=job.title,
+                    jobs=4, verify_indices=verify_indices))
+                result.document_id = out.getvalue().split()[-1]
+            else:
+                for path in job.changed:
+                    fm, _ = parse(path.read_text(encoding="utf-8"))
+                    tab_id = str(fm.get("gdoc_tab_id", ""))
+                    if not tab_id:
+                        cmd_add_tab(argparse.Namespace(
+                            file=str(path), document=job.document_id, title=None,
+                            verify_indices=verify_indices))
+                        continue
+                    try:
+                        cmd_update_tab(argparse.Namespace(
+                            document=job.document_id, tab=tab_id, file=str(path),
+                            files_dir=None, force=force))
+                    except SystemExit as e:
+                        # update-tab always exits; 0 means in sync.
+                        if e.code not in (0, None):
+                            raise
+    except SystemExit as e:
+        result.ok = False
+        result.error = f"exit status {e.code}"
+    except Exception as e:  # noqa: BLE001 - reported per document
+        result.ok = False
+        result.error = f"{type(e).__name__}: {e}"
+    stats = _SCHEDULER.stats
+    result.reads = stats.reads - stats_before.reads
+    result.writes = stats.writes - stats_before.writes
+    result.throttled = stats.throttled - stats_before.throttled
+    result.bytes_sent = stats.bytes_sent - stats_before.bytes_sent
+    result.bytes_received = client.bytes_received - received_before
+    result.seconds = time.monotonic() - started
+    result.trace = _TRACER.drain()
+    return result
 
-        local_path.write_text(new_content, encoding="utf-8")
-        print("Sync complete", file=sys.stderr)
 
-    finally:
-        Path(local_body_path).unlink(missing_ok=True)
-        Path(extracted_path).unlink(missing_ok=True)
-        if patch_path:
-            Path(patch_path).unlink(missing_ok=True)
+def _format_bytes(n: int) -> str:
+    if n < 1024:
+        return f"{n} B"
+    if n < 1024 * 1024:
+        return f"{n / 1024:.1f} KB"
+    return f"{n / (1024 * 1024):.1f} MB"
+
+
+def cmd_publish(args: argparse.Namespace) -> None:
+    """Publish every document in a manifest, skipping unchanged ones."""
+    manifest = Path(args.manifest)
+    if not manifest.exists():
+        print(f"File not found: {manifest}", file=sys.stderr)
+        sys.exit(1)
+    jobs = load_manifest(manifest)
+    state_path = _publish_state_path(manifest)
+    state: dict[str, Any] = {}
+    if state_path.exists():
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    plan_publish(jobs, state, force=args.force)
+
+    for job in jobs:
+        detail = ""
+        if job.action == "update":
+            detail = f" ({len(job.changed)}/{len(job.files)} files changed)"
+        elif job.action == "create":
+            detail = f" ({len(job.files)} tabs)"
+        print(f"{job.action:>6}  {job.name}{detail}", file=sys.stderr)
+
+    pending = [job for job in jobs if job.action != "skip"]
+    results: dict[str, PublishResult] = {
+        job.name: PublishResult(name=job.name, action="skip", document_id=job.document_id)
+        for job in jobs if job.action == "skip"
+    }
+    started = time.monotonic()
+    if pending:
+        # Every worker draws from the same two buckets, so the pool as a
+        # whole stays inside one user's quota.
+        reads = SharedTokenBucket(args.reads_per_minute)
+        writes = SharedTokenBucket(args.writes_per_minute)
+        workers = max(1, min(args.jobs, len(pending)))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_publish_init,
+            initargs=(args.backend, (args.reads_per_minute, reads.shared),
+                      (args.writes_per_minute, writes.shared), OPTIMIZE_REQUESTS,
+                      _TRACER.enabled),
+        ) as pool:
+            futures = [(job, pool.submit(_publish_one, job, args.verify_indices, args.force))
+                       for job in pending]
+            for job, future in futures:
+                results[job.name] = result = future.result()
+                _TRACER.extend(result.trace)
+                if result.ok:
+                    state[job.name] = {
+                        "document_id": result.document_id,
+                        "files": job.fingerprint,
+                    }
+        state_path.write_text(json.dumps(state, indent=2, sort_keys=True) + "\n",
+                              encoding="utf-8")
+
+    print(f"{'document':<32} {'action':<7} {'reads':>5} {'writes':>6} "
+          f"{'429s':>4} {'sent':>9} {'received':>9} {'time':>7}")
+    for job in jobs:
+        r = results[job.name]
+        status = r.action if r.ok else "FAILED"
+        print(f"{r.name[:32]:<32} {status:<7} {r.reads:>5} {r.writes:>6} "
+              f"{r.throttled:>4} {_format_bytes(r.bytes_sent):>9} "
+              f"{_format_bytes(r.bytes_received):>9} {r.seconds:>6.1f}s")
+    failed = [r for r in results.values() if not r.ok]
+    print(f"{len(pending) - len(failed)} published, {len(jobs) - len(pending)} unchanged, "
+          f"{len(failed)} failed in {time.monotonic() - started:.1f}s", file=sys.stderr)
+    for r in failed:
+        print(f"  {r.name}: {r.error}", file=sys.stderr)
+    if failed:
+        sys.exit(1)
 
 
 # ---------------------------------------------------------------------------
@@ -3721,6 +6700,50 @@ def main() -> None:
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog=__doc__,
     )
+    parser.add_argument(
+        "--backend",
+        choices=("auto", "gws", "http", "emulator"),
+        default=os.environ.get("MD2GDOC_BACKEND", "auto"),
+        help="Docs API transport: in-process HTTP with pooled connections, the "
+             "gws CLI (one subprocess per call), an in-process offline "
+             "emulator, or auto (http when a token source or "
+             "$MD2GDOC_API_BASE is set, else gws).",
+    )
+    parser.add_argument(
+        "--reads-per-minute",
+        type=float,
+        default=float(os.environ.get("MD2GDOC_READS_PER_MINUTE", DOCS_READS_PER_MINUTE)),
+        metavar="N",
+        help=f"Read quota to pace documents.get calls to (default {DOCS_READS_PER_MINUTE}).",
+    )
+    parser.add_argument(
+        "--writes-per-minute",
+        type=float,
+        default=float(os.environ.get("MD2GDOC_WRITES_PER_MINUTE", DOCS_WRITES_PER_MINUTE)),
+        metavar="N",
+        help=f"Write quota to pace create/batchUpdate calls to (default {DOCS_WRITES_PER_MINUTE}).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        metavar="N",
+        help=f"Maximum Docs API calls in flight at once (default {DEFAULT_CONCURRENCY}); "
+             "the per-minute quotas still apply.",
+    )
+    parser.add_argument(
+        "--no-optimize",
+        action="store_true",
+        help="Send requests exactly as built, without merging adjacent inserts "
+             "and styles or dropping redundant resets.",
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        metavar="FILE",
+        help="Write a Chrome trace-event JSON of the run to FILE (open it in "
+             "chrome://tracing or ui.perfetto.dev) and print a span summary.",
+    )
     sub = parser.add_subparsers(dest="command", required=True)
 
     p_create = sub.add_parser(
@@ -3732,6 +6755,25 @@ def main() -> None:
         metavar="TITLE",
         help="Document title (defaults to the first H1 of the first file).",
     )
+    p_create.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=4,
+        metavar="N",
+        help="Number of tabs to build and write concurrently (default 4).",
+    )
+    p_create.add_argument(
+        "--verify-indices",
+        action="store_true",
+        help="Debug: flush and re-read the document around every table to "
+             "cross-check the predicted cell indices against the live doc.",
+    )
+    p_create.add_argument(
+        "--plan",
+        action="store_true",
+        help="Dry run: print the API calls, batchUpdate bodies included, as JSONL "
+             "with a closing cost estimate, without creating anything.",
+    )
     p_create.add_argument(
         "files",
         nargs="+",
@@ -3754,6 +6796,18 @@ def main() -> None:
         metavar="TITLE",
         help="Tab title (defaults to the first H1 or filename stem).",
     )
+    p_add.add_argument(
+        "--verify-indices",
+        action="store_true",
+        help="Debug: flush and re-read the document around every table to "
+             "cross-check the predicted cell indices against the live doc.",
+    )
+    p_add.add_argument(
+        "--plan",
+        action="store_true",
+        help="Dry run: read the document once and print the calls adding the tab "
+             "would make as JSONL with a cost estimate, without writing.",
+    )
     p_add.add_argument(
         "file",
         metavar="FILE",
@@ -3783,6 +6837,30 @@ def main() -> None:
         help="Directory of local markdown files with gdoc_tab_id frontmatter for exact wikilink slug resolution.",
     )
 
+    p_extract_all = sub.add_parser(
+        "extract-all",
+        help="Extract every tab of a Google Doc into a directory of markdown files.",
+    )
+    p_extract_all.add_argument(
+        "--document",
+        required=True,
+        metavar="DOC_ID",
+        help="Target document ID.",
+    )
+    p_extract_all.add_argument(
+        "--out",
+        required=True,
+        metavar="DIR",
+        help="Directory to write one markdown file per tab into (created if missing).",
+    )
+    p_extract_all.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=4,
+        metavar="N",
+        help="Number of tabs to render in parallel processes (default 4).",
+    )
+
     p_update = sub.add_parser(
         "update-tab",
         help="Push local markdown changes to a live Google Doc tab.",
@@ -3805,6 +6883,25 @@ def main() -> None:
         default=None,
         help="Directory of local markdown files with gdoc_tab_id frontmatter for exact wikilink slug resolution.",
     )
+    p_update.add_argument(
+        "--verify",
+        action="store_true",
+        help="Re-read the tab after writing to verify the sync, instead of "
+             "checking the locally predicted result.",
+    )
+    p_update.add_argument(
+        "--force",
+        action="store_true",
+        help="Compare with the tab even if the body is unchanged since the last "
+             "push recorded in gdoc_pushed_hash (e.g. to undo edits made in the doc).",
+    )
+    p_update.add_argument(
+        "--plan",
+        action="store_true",
+        help="Dry run: read the document once and print the segment alignment and "
+             "the calls the update would make as JSONL with a cost estimate, "
+             "without writing.",
+    )
     p_update.add_argument(
         "file",
         metavar="FILE",
@@ -3813,19 +6910,18 @@ def main() -> None:
 
     p_sync = sub.add_parser(
         "sync-local",
-        help="Pull live doc changes to the local markdown file.",
+        help="Pull live doc changes to local markdown files.",
     )
     p_sync.add_argument(
         "--document",
-        required=True,
         metavar="DOC_ID",
-        help="Target document ID.",
+        help="Target document ID (default: each file's gdoc_url).",
     )
     p_sync.add_argument(
         "--tab",
-        required=True,
         metavar="TITLE_OR_ID",
-        help="Tab title (case-insensitive) or exact tab ID.",
+        help="Tab title (case-insensitive) or exact tab ID "
+             "(default: each file's gdoc_tab_id).",
     )
     p_sync.add_argument(
         "--files-dir",
@@ -3834,24 +6930,120 @@ def main() -> None:
         help="Directory of local markdown files with gdoc_tab_id frontmatter for exact wikilink slug resolution.",
     )
     p_sync.add_argument(
-        "file",
+        "--force",
+        action="store_true",
+        help="Replace the body even if it has local edits not pushed since the "
+             "last push recorded in gdoc_pushed_hash.",
+    )
+    p_sync.add_argument(
+        "files",
+        nargs="+",
         metavar="FILE",
-        help="Local markdown file to update.",
+        help="Local markdown files to update; documents are fetched concurrently.",
     )
 
+    p_watch = sub.add_parser(
+        "watch",
+        help="Keep a folder of published files and their tabs in sync.",
+    )
+    p_watch.add_argument(
+        "--debounce",
+        type=float,
+        default=0.5,
+        metavar="SECONDS",
+        help="Wait this long after the last save before pushing (default 0.5).",
+    )
+    p_watch.add_argument(
+        "--interval",
+        type=float,
+        default=15.0,
+        metavar="SECONDS",
+        help="Check each document for remote edits this often (default 15).",
+    )
+    p_watch.add_argument(
+        "--verify",
+        action="store_true",
+        help="Re-read each tab after pushing to verify it (see update-tab).",
+    )
+    p_watch.add_argument(
+        "directory",
+        metavar="DIR",
+        help="Directory of markdown files with gdoc_url and gdoc_tab_id frontmatter.",
+    )
+
+    p_publish = sub.add_parser(
+        "publish",
+        help="Create or update every document listed in a manifest.",
+    )
+    p_publish.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=4,
+        metavar="N",
+        help="Number of documents to publish in parallel processes (default 4).",
+    )
+    p_publish.add_argument(
+        "--force",
+        action="store_true",
+        help="Push every file even if its body is unchanged since the last publish.",
+    )
+    p_publish.add_argument(
+        "--verify-indices",
+        action="store_true",
+        help="Debug: cross-check predicted table indices (see create).",
+    )
+    p_publish.add_argument(
+        "manifest",
+        metavar="MANIFEST",
+        help="YAML manifest mapping documents to ordered lists of files.",
+    )
 
     args = parser.parse_args()
+    global OPTIMIZE_REQUESTS
+    OPTIMIZE_REQUESTS = not args.no_optimize
+    set_client(make_client(args.backend))
+    set_scheduler(ApiScheduler(args.reads_per_minute, args.writes_per_minute))
+    _TRACER.enabled = args.trace is not None
+
+    planner: PlanningClient | None = None
+    if getattr(args, "plan", False):
+        # stdout carries the JSONL; the command's own output goes to stderr.
+        planner = PlanningClient(get_client(), sys.stdout)
+        set_client(planner)
+        # The dry run is not paced; finish() estimates the pacing instead.
+        set_scheduler(ApiScheduler(float("inf"), float("inf")))
+
+    try:
+        with _TRACER.span(args.command, "command"), \
+                redirect_stdout(sys.stderr) if planner else nullcontext():
+            if args.command == "create":
+                cmd_create(args)
+            elif args.command == "add-tab":
+                cmd_add_tab(args)
+            elif args.command == "extract-tab":
+                cmd_extract_tab(args)
+            elif args.command == "extract-all":
+                cmd_extract_all(args)
+            elif args.command == "update-tab":
+                cmd_update_tab(args)
+            elif args.command == "sync-local":
+                cmd_sync_local(args)
+            elif args.command == "watch":
+                cmd_watch(args)
+            elif args.command == "publish":
+                cmd_publish(args)
+    finally:
+        if planner is not None:
+            planner.finish(args.reads_per_minute, args.writes_per_minute)
+        if args.trace is not None:
+            _write_trace(args.trace)
+
 
-    if args.command == "create":
-        cmd_create(args)
-    elif args.command == "add-tab":
-        cmd_add_tab(args)
-    elif args.command == "extract-tab":
-        cmd_extract_tab(args)
-    elif args.command == "update-tab":
-        cmd_update_tab(args)
-    elif args.command == "sync-local":
-        cmd_sync_local(args)
+def _write_trace(path: Path) -> None:
+    """Write the --trace file and print the span summary to stderr."""
+    _TRACER.write(path)
+    print(f"\nTrace: {path} ({len(_TRACER.events)} events)\n{_TRACER.summary()}",
+          file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,66 @@
+"""Shared fixtures: md2gdoc and gdocs_emulator from ../skill, one tab per doc."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+SKILL_DIR = Path(__file__).resolve().parent.parent / "skill"
+sys.path.insert(0, str(SKILL_DIR))
+
+import md2gdoc  # noqa: E402
+from gdocs_emulator import (  # noqa: E402
+    DocsEmulator, apply_fields_mask, load_document, parse_fields_mask,
+)
+
+DOC_ID = "doc"
+TAB_ID = "t.0"
+BLANK = {"documentId": DOC_ID, "tabs": [{
+    "tabProperties": {"tabId": TAB_ID, "title": "Notes"},
+    "documentTab": {"body": {"content": []}},
+}]}
+
+
+def render(body: str) -> dict:
+    """The tab as create writes *body*, unmasked."""
+    return md2gdoc.render_expected_tab(BLANK, TAB_ID, body, {})
+
+
+def read(doc: dict) -> dict:
+    """*doc* as a FIELDS_TAB_CONTENT read returns it."""
+    return apply_fields_mask(doc, parse_fields_mask(md2gdoc.FIELDS_TAB_CONTENT))
+
+
+def extract(doc: dict) -> tuple[str, list]:
+    """Extract the tab of *doc* the way update-tab does."""
+    return md2gdoc.extract_tab_with_source_map(
+        read(doc), TAB_ID, heading_slug_map=md2gdoc._build_heading_slug_map(doc, TAB_ID))
+
+
+def bound_segments(doc: dict, heading_ids: dict[str, str] | None = None) -> list:
+    md, spans = extract(doc)
+    segments = md2gdoc.parse_to_segments(md, spans)
+    md2gdoc.bind_segments(segments, doc, TAB_ID, heading_ids)
+    return segments
+
+
+@pytest.fixture
+def emulator():
+    """A DocsEmulator installed as md2gdoc's transport."""
+    emulator = DocsEmulator()
+    md2gdoc.set_client(md2gdoc.EmulatorDocsClient(emulator))
+    yield emulator
+    md2gdoc.set_client(None)
+
+
+def load(emulator: DocsEmulator, body: str) -> dict:
+    """Put *body*, as create writes it, into *emulator*; return it as read."""
+    emulator.docs[DOC_ID] = load_document(render(body))
+    return read(emulator.document(DOC_ID))
+
+
+def apply(emulator: DocsEmulator, requests: list) -> None:
+    emulator.call("documents.batchUpdate", {"documentId": DOC_ID},
+                  md2gdoc.json.dumps({"requests": requests}))
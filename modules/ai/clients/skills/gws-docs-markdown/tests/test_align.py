@@ -0,0 +1,106 @@
+"""align_segments: anchors, similarity pairs, and tables paired cell by cell."""
+
+from __future__ import annotations
+
+import md2gdoc
+from conftest import DOC_ID, TAB_ID, apply, bound_segments, extract, load, render
+
+TABLES = """# Owners
+
+| Area | Owner |
+| --- | --- |
+| Build | Alice |
+| Deploy | Bob |
+
+Between the tables.
+
+| Area | Owner |
+| --- | --- |
+| Build | Alice |
+| Deploy | Bob |
+"""
+
+
+def _align(emulator, old_body: str, new_body: str) -> list[md2gdoc.SegmentMatch]:
+    """Align *old_body* as live against *new_body*, return the matches.
+
+    Their in-place edits and deletes are applied; inserts are not.
+    """
+    live = load(emulator, old_body)
+    matches = md2gdoc.align_segments(bound_segments(live), bound_segments(render(new_body)))
+    requests = md2gdoc.collect_update_requests(matches, TAB_ID)
+    if requests:
+        apply(emulator, requests)
+    return matches
+
+
+def _kinds(matches: list[md2gdoc.SegmentMatch]) -> list[tuple[str, str]]:
+    return sorted((m.kind, (m.old_segment or m.new_segment).kind) for m in matches)
+
+
+def test_unchanged_segments_need_no_edits(emulator):
+    body = "# Title\n\nOne.\n\nTwo.\n"
+    matches = _align(emulator, body, body)
+    assert [m for m in matches if m.kind != "matched" or m.edits] == []
+
+
+def test_moved_paragraph_is_deleted_and_inserted(emulator):
+    old = "# Title\n\nAlpha one.\n\nBeta two.\n\nGamma three.\n"
+    new = "# Title\n\nBeta two.\n\nGamma three.\n\nAlpha one.\n"
+    old_segments = bound_segments(load(emulator, old))
+    matches = md2gdoc.align_segments(old_segments, bound_segments(render(new)))
+
+    assert _kinds(matches) == [("deleted", "paragraph"), ("inserted", "paragraph")]
+    (inserted,) = [m for m in matches if m.kind == "inserted"]
+    (gamma,) = [seg for seg in old_segments if seg.text == "Gamma three."]
+    assert inserted.insert_after_api == gamma.span.api_end
+
+
+def test_edited_paragraph_pairs_within_its_gap(emulator):
+    old = "# A\n\nThe quick brown fox.\n\n# B\n\nThe quick brown dog.\n"
+    new = "# A\n\nThe quick brown fox jumps.\n\n# B\n\nThe quick brown dog.\n"
+    matches = _align(emulator, old, new)
+
+    (edited,) = [m for m in matches if m.edits]
+    assert edited.old_segment.text == "The quick brown fox."
+    assert extract(emulator.document(DOC_ID))[0] == extract(render(new))[0]
+
+
+def test_cell_edit_stays_in_its_table(emulator):
+    new = TABLES[:TABLES.rindex("Bob")] + "Carol" + TABLES[TABLES.rindex("Bob") + 3:]
+    matches = _align(emulator, TABLES, new)
+
+    (cell,) = [m for m in matches if m.edits]
+    assert cell.old_segment.kind == "cell"
+    assert cell.old_segment.path[-4:] == cell.new_segment.path[-4:]
+    assert cell.old_segment.text == "Bob" and cell.new_segment.text == "Carol"
+    assert not [m for m in matches if m.kind != "matched"]
+    assert md2gdoc._cell_texts(emulator.document(DOC_ID), TAB_ID) == \
+        md2gdoc._cell_texts(render(new), TAB_ID)
+
+
+def test_cells_are_paired_by_position_not_text(emulator):
+    """Swapping two cells edits both; no cell is anchored to the other's text."""
+    new = TABLES.replace("| Build | Alice |\n| Deploy | Bob |\n\nBetween",
+                         "| Build | Bob |\n| Deploy | Alice |\n\nBetween")
+    matches = _align(emulator, TABLES, new)
+
+    edited = sorted((m.old_segment.text, m.new_segment.text) for m in matches if m.edits)
+    assert edited == [("Alice", "Bob"), ("Bob", "Alice")]
+    assert all(m.old_segment.path[-4:] == m.new_segment.path[-4:]
+               for m in matches if m.edits)
+    assert md2gdoc._cell_texts(emulator.document(DOC_ID), TAB_ID) == \
+        md2gdoc._cell_texts(render(new), TAB_ID)
+
+
+def test_reshaped_table_is_replaced_not_edited_cell_by_cell(emulator):
+    new = TABLES.replace("| Area | Owner |\n| --- | --- |\n| Build | Alice |\n| Deploy | Bob |\n\n"
+                         "Between",
+                         "| Area | Owner | Backup |\n| --- | --- | --- |\n"
+                         "| Build | Alice | Dan |\n| Deploy | Bob | Eve |\n\nBetween")
+    matches = _align(emulator, TABLES, new)
+
+    assert ("deleted", "table") in _kinds(matches)
+    assert ("inserted", "table") in _kinds(matches)
+    assert not [m for m in matches if m.kind != "matched"
+                and (m.old_segment or m.new_segment).kind == "cell"]
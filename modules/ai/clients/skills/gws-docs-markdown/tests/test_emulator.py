@@ -0,0 +1,111 @@
+"""gdocs_emulator: update-tab builds and predicts tabs on it, so it is tested as product code."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+import md2gdoc
+from conftest import BLANK, DOC_ID, TAB_ID, read, render
+from gdocs_emulator import DocsEmulator, EmulatorConfig, EmulatorError, load_document
+
+
+@pytest.fixture
+def em() -> DocsEmulator:
+    em = DocsEmulator()
+    em.docs[DOC_ID] = load_document(BLANK)
+    return em
+
+
+def _batch(em: DocsEmulator, requests: list, revision: str | None = None) -> dict:
+    payload: dict = {"requests": requests}
+    if revision is not None:
+        payload["writeControl"] = {"requiredRevisionId": revision}
+    return em.call("documents.batchUpdate", {"documentId": DOC_ID}, json.dumps(payload))
+
+
+def _insert(index: int, text: str) -> dict:
+    return {"insertText": {"location": {"index": index, "tabId": TAB_ID}, "text": text}}
+
+
+def _content(em: DocsEmulator) -> list[dict]:
+    return md2gdoc._find_tab(em.document(DOC_ID)["tabs"], TAB_ID)["documentTab"]["body"]["content"]
+
+
+def test_new_tab_is_a_section_break_and_an_empty_paragraph(em):
+    content = _content(em)
+    assert [list(el)[-1] for el in content] == ["sectionBreak", "paragraph"]
+    assert (content[1]["startIndex"], content[1]["endIndex"]) == (1, 2)
+
+
+def test_indices_count_utf16_units(em):
+    _batch(em, [_insert(1, "a\U0001F600b\nc")])
+    first, second = _content(em)[1:]
+
+    assert (first["startIndex"], first["endIndex"]) == (1, 6)
+    assert second["startIndex"] == 6
+    _batch(em, [{"updateTextStyle": {"range": {"startIndex": 4, "endIndex": 5, "tabId": TAB_ID},
+                                     "textStyle": {"bold": True}, "fields": "bold"}}])
+    runs = [(r["textRun"]["content"], r["textRun"].get("textStyle", {}).get("bold", False))
+            for r in _content(em)[1]["paragraph"]["elements"]]
+    assert runs == [("a\U0001F600", False), ("b", True), ("\n", False)]
+
+
+def test_failed_batch_rolls_back_and_keeps_the_revision(em):
+    before = em.document(DOC_ID)
+    with pytest.raises(EmulatorError) as info:
+        _batch(em, [_insert(1, "kept? "), _insert(10_000, "out of range")])
+
+    assert info.value.status == 400
+    assert info.value.message.startswith("Invalid requests[1].insertText")
+    assert em.document(DOC_ID) == before
+
+
+def test_stale_revision_is_rejected_as_md2gdoc_expects(em):
+    revision = em.document(DOC_ID)["revisionId"]
+    reply = _batch(em, [_insert(1, "one")], revision=revision)
+    assert reply["writeControl"]["requiredRevisionId"] != revision
+
+    with pytest.raises(EmulatorError) as info:
+        _batch(em, [_insert(1, "two")], revision=revision)
+    assert md2gdoc._is_revision_mismatch(md2gdoc.DocsApiError(info.value.status,
+                                                              info.value.message))
+    assert em.tab_text(DOC_ID, TAB_ID) == "one\n"
+
+
+def test_delete_joins_paragraphs(em):
+    _batch(em, [_insert(1, "first\nsecond")])
+    _batch(em, [{"deleteContentRange": {"range": {"startIndex": 6, "endIndex": 7,
+                                                  "tabId": TAB_ID}}}])
+    assert em.tab_text(DOC_ID, TAB_ID) == "firstsecond\n"
+
+
+def test_rendered_document_loads_back_unchanged():
+    doc = render("# Title\n\n- a\n- b\n\n| x | y |\n| --- | --- |\n| 1 | \U0001F600 |\n\n"
+                 "```\ncode\n```\n")
+    em = DocsEmulator()
+    em.docs[DOC_ID] = load_document(doc)
+    loaded = em.document(DOC_ID)
+
+    # A loaded document starts its own revision count
+    assert loaded.pop("revisionId") and doc.pop("revisionId")
+    assert loaded == doc
+
+
+def test_fields_mask_trims_the_read():
+    doc = read(render("Some **bold** text.\n"))
+    para, *_ = [el for el in doc["tabs"][0]["documentTab"]["body"]["content"]
+               if "paragraph" in el]
+    assert set(para) <= {"startIndex", "endIndex", "paragraph"}
+    assert "textStyle" in para["paragraph"]["elements"][0]["textRun"]
+
+
+def test_injected_throttle_sends_retry_after():
+    em = DocsEmulator(EmulatorConfig(throttle_every=2, retry_after=3))
+    em.docs[DOC_ID] = load_document(BLANK)
+    assert em.handle("documents.get", {"documentId": DOC_ID}, None)[0] == 200
+    status, headers, _ = em.handle("documents.get", {"documentId": DOC_ID}, None)
+
+    assert status == 429
+    assert md2gdoc._parse_retry_after(headers["Retry-After"]) == 3.0
@@ -0,0 +1,50 @@
+"""Fenced code blocks queued with predicted indices, checked on the emulator."""
+
+from __future__ import annotations
+
+import md2gdoc
+from conftest import BLANK, DOC_ID, TAB_ID, extract, render
+from gdocs_emulator import load_document
+
+
+def _content(doc: dict) -> list[dict]:
+    return md2gdoc._find_tab(doc["tabs"], TAB_ID)["documentTab"]["body"]["content"]
+
+
+def _cell_paragraphs(table: dict) -> list[dict]:
+    (row,) = table["table"]["tableRows"]
+    (cell,) = row["tableCells"]
+    return [p["paragraph"] for p in cell["content"]]
+
+
+def test_fences_land_in_their_cells():
+    body = ("Intro \U0001F600 text.\n\n```\nfirst = 1\nsecond = 2\n```\n\n"
+            "Between.\n\n```python\nprint('\U0001F680')\n```\n\nAfter.\n")
+    doc = render(body)
+    tables = [el for el in _content(doc) if "table" in el]
+
+    assert len(tables) == 2
+    first = _cell_paragraphs(tables[0])
+    assert [md2gdoc._paragraph_text_from_api(p) for p in first[:2]] == [
+        "first = 1", "second = 2"]
+    (second, *_) = _cell_paragraphs(tables[1])
+    assert md2gdoc._paragraph_text_from_api(second) == "print('\U0001F680')"
+    for para in first[:2] + [second]:
+        for el in para["elements"]:
+            assert el["textRun"]["textStyle"]["weightedFontFamily"]["fontFamily"] == "Courier New"
+
+    md, _ = extract(doc)
+    assert "Between." in md and md.rstrip().endswith("After.")
+
+
+def test_predicted_fence_indices_match_read_back_indices(emulator):
+    """Queued fences land where the flush-and-read path puts them."""
+    body = ("# Title \U0001F600\n\n```\na\nb\n```\n\n| x | y |\n| --- | --- |\n| 1 | 2 |\n\n"
+            "```\nc \U0001F680\n```\n\nTail.\n")
+    emulator.docs[DOC_ID] = load_document(BLANK)
+    state = md2gdoc.BuildState(tab_id=TAB_ID, doc_id=DOC_ID, fresh_tab=True,
+                               verify_indices=True)
+    md2gdoc.build_requests_from_text(body, state)
+    md2gdoc._flush_requests(state)
+
+    assert extract(emulator.document(DOC_ID))[0] == extract(render(body))[0]
@@ -0,0 +1,110 @@
+"""optimize_requests output applied to the emulator matches what it replaced."""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+
+import md2gdoc
+from conftest import BLANK, DOC_ID, TAB_ID
+from gdocs_emulator import DocsEmulator, load_document
+
+BODY = """# Title with **bold** and *italic*
+
+Plain text, ~~struck~~ text, a `code` span and a [link](https://example.com).
+
+###### Small print that is *italic* by default
+
+- one **two**
+- three
+
+| A | B |
+| --- | --- |
+| **x** | y |
+
+```
+code block
+```
+
+Tail \U0001F600 paragraph.
+"""
+
+
+def _styled_chars(doc: dict) -> list[tuple]:
+    """Every character of the tab with its paragraph and text style.
+
+    False bold/italic/strikethrough equals an absent one: that is what a
+    dropped reset leaves behind.
+    """
+    out: list[tuple] = []
+
+    def walk(content: list[dict]) -> None:
+        for el in content:
+            if "table" in el:
+                for row in el["table"]["tableRows"]:
+                    for cell in row["tableCells"]:
+                        walk(cell["content"])
+            para = el.get("paragraph")
+            if para is None:
+                continue
+            pstyle = json.dumps(para.get("paragraphStyle", {}), sort_keys=True)
+            bullet = json.dumps(para.get("bullet"), sort_keys=True)
+            for run in para.get("elements", []):
+                text_run = run.get("textRun")
+                if text_run is None:
+                    continue
+                style = {k: v for k, v in text_run.get("textStyle", {}).items()
+                         if not (k in md2gdoc._RESET_FIELDS and v is False)}
+                style = json.dumps(style, sort_keys=True)
+                out.extend((ch, pstyle, bullet, style) for ch in text_run["content"])
+
+    walk(md2gdoc._find_tab(doc["tabs"], TAB_ID)["documentTab"]["body"]["content"])
+    return out
+
+
+def _applied(requests: list) -> dict:
+    emulator = DocsEmulator()
+    emulator.docs[DOC_ID] = load_document(BLANK)
+    emulator.call("documents.batchUpdate", {"documentId": DOC_ID},
+                  json.dumps({"requests": requests}))
+    return emulator.document(DOC_ID)
+
+
+def test_optimized_requests_are_equivalent():
+    state = md2gdoc.BuildState(tab_id=TAB_ID, doc_id=DOC_ID, fresh_tab=True)
+    md2gdoc.build_requests_from_text(BODY, state)
+    ordered = md2gdoc._send_order(state.requests)
+    optimized, report = md2gdoc.optimize_requests(ordered, fresh_tab=True)
+
+    assert report.requests_saved > 0
+    assert _styled_chars(_applied(optimized)) == _styled_chars(_applied(ordered))
+
+
+def test_add_tab_keeps_resets_for_customised_styles(emulator, tmp_path):
+    """A document may make HEADING_2 bold, so add-tab's bold False must be sent."""
+    doc = copy.deepcopy(BLANK)
+    doc["tabs"][0]["documentTab"]["namedStyles"] = {"styles": [
+        {"namedStyleType": "HEADING_2", "textStyle": {"bold": True}}]}
+    emulator.docs[DOC_ID] = load_document(doc)
+    sent: list[dict] = []
+    handle = emulator.handle
+
+    def recording_handle(method, params=None, body=None):
+        if method == "documents.batchUpdate":
+            sent.extend(json.loads(body)["requests"])
+        return handle(method, params, body)
+
+    emulator.handle = recording_handle
+    path = tmp_path / "notes.md"
+    path.write_text("## Plain heading\n\nBody.\n", encoding="utf-8")
+    md2gdoc.cmd_add_tab(argparse.Namespace(file=str(path), document=DOC_ID, title=None,
+                                           verify_indices=False, plan=False))
+
+    tab_id = next(t["tabProperties"]["tabId"] for t in emulator.document(DOC_ID)["tabs"]
+                  if t["tabProperties"]["tabId"] != TAB_ID)
+    resets = [r["updateTextStyle"] for r in sent
+              if "updateTextStyle" in r and r["updateTextStyle"]["range"]["tabId"] == tab_id
+              and r["updateTextStyle"]["range"]["startIndex"] == 1]
+    assert any("bold" in r["fields"].split(",") and r["textStyle"].get("bold") is False
+               for r in resets)
@@ -0,0 +1,53 @@
+"""--plan checks every window on the emulator and reports rejected requests."""
+
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+import md2gdoc
+from conftest import DOC_ID, TAB_ID, load
+
+
+def _plan(emulator) -> tuple[md2gdoc.PlanningClient, io.StringIO]:
+    sink = io.StringIO()
+    return md2gdoc.PlanningClient(md2gdoc.EmulatorDocsClient(emulator), sink), sink
+
+
+def _batch(planner: md2gdoc.PlanningClient, requests: list) -> dict:
+    return planner.call("documents.batchUpdate", {"documentId": DOC_ID},
+                        json.dumps({"requests": requests}))
+
+
+def _insert(index: int, text: str) -> dict:
+    return {"insertText": {"location": {"index": index, "segmentId": "", "tabId": TAB_ID},
+                           "text": text}}
+
+
+def test_rejected_request_is_reported(emulator, capsys):
+    load(emulator, "# Title\n\nBody text.\n")
+    planner, sink = _plan(emulator)
+    _batch(planner, [_insert(1, "Hello ")])
+    with pytest.raises(md2gdoc.DocsApiError):
+        _batch(planner, [_insert(1, "ok "), _insert(10_000, "out of range")])
+    planner.finish(60, 60)
+
+    lines = [json.loads(line) for line in sink.getvalue().splitlines()]
+    calls = [line for line in lines if line["type"] == "call"]
+    assert "error" not in calls[0]
+    assert calls[1]["rejected"]["index"] == 1
+    assert calls[1]["rejected"]["request"] == _insert(10_000, "out of range")
+    (rejected,) = lines[-1]["rejected"]
+    assert rejected["seq"] == calls[1]["seq"]
+    assert "Rejected: call" in capsys.readouterr().err
+
+
+def test_planned_writes_leave_source_untouched(emulator):
+    load(emulator, "Body text.\n")
+    planner, _ = _plan(emulator)
+    _batch(planner, [_insert(1, "Hello ")])
+
+    assert "Hello" not in json.dumps(emulator.document(DOC_ID))
+    assert "Hello" in json.dumps(planner.emulator.document(DOC_ID))
@@ -0,0 +1,131 @@
+"""Cached request plans: keys, and rebasing a stored plan into another tab."""
+
+from __future__ import annotations
+
+import pytest
+
+import md2gdoc
+from conftest import DOC_ID
+from gdocs_emulator import load_document
+
+BODY = """# Notes \U0001F600
+
+See [[other|the other tab]] and [[#notes|this heading]].
+
+| A | B |
+| --- | --- |
+| **x** | y |
+"""
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    return tmp_path
+
+
+def _state(tab_id: str, other_id: str, **kwargs) -> md2gdoc.BuildState:
+    return md2gdoc.BuildState(tab_id=tab_id, doc_id=DOC_ID, fresh_tab=True,
+                              tab_map={"notes": tab_id, "other": other_id}, **kwargs)
+
+
+def _doc(*tab_ids: str) -> dict:
+    return {"documentId": DOC_ID, "tabs": [
+        {"tabProperties": {"tabId": tab_id, "title": tab_id},
+         "documentTab": {"body": {"content": []}}} for tab_id in tab_ids]}
+
+
+class _Sink:
+    """Stands in for a RequestSender."""
+
+    def __init__(self) -> None:
+        self.sent: list = []
+
+    def submit(self, window: list) -> None:
+        self.sent.extend(window)
+
+
+def _without_heading_ids(obj):
+    if isinstance(obj, dict):
+        return {k: _without_heading_ids(v) for k, v in obj.items() if k != "headingId"}
+    if isinstance(obj, list):
+        return [_without_heading_ids(v) for v in obj]
+    return obj
+
+
+def test_plan_key_ignores_tab_ids_only():
+    key = md2gdoc.plan_key(BODY, _state("t.0", "t.1"))
+
+    assert md2gdoc.plan_key(BODY, _state("t.7", "t.3")) == key
+    assert md2gdoc.plan_key(BODY + "More.\n", _state("t.0", "t.1")) != key
+    assert md2gdoc.plan_key(BODY, _state("t.1", "t.0")) == key
+    swapped = md2gdoc.BuildState(tab_id="t.1", doc_id=DOC_ID, fresh_tab=True,
+                                 tab_map={"notes": "t.0", "other": "t.1"})
+    assert md2gdoc.plan_key(BODY, swapped) != key
+    stale = _state("t.0", "t.1")
+    stale.fresh_tab = False
+    assert md2gdoc.plan_key(BODY, stale) != key
+
+
+def test_relocate_moves_indices_and_tab_ids_only():
+    request = {"insertTable": {"rows": 3, "columns": 2,
+                               "location": {"index": 10, "tabId": "t.0"}}}
+    style = {"updateTextStyle": {
+        "range": {"startIndex": 4, "endIndex": 9, "tabId": "t.0"},
+        "textStyle": {"fontSize": {"magnitude": 11, "unit": "PT"},
+                      "link": {"tabId": "t.1"}}, "fields": "fontSize,link"}}
+
+    moved = md2gdoc._relocate([request, style], 5, {"t.0": "t.9", "t.1": "t.8"})
+    assert moved == [
+        {"insertTable": {"rows": 3, "columns": 2, "location": {"index": 15, "tabId": "t.9"}}},
+        {"updateTextStyle": {
+            "range": {"startIndex": 9, "endIndex": 14, "tabId": "t.9"},
+            "textStyle": {"fontSize": {"magnitude": 11, "unit": "PT"},
+                          "link": {"tabId": "t.8"}}, "fields": "fontSize,link"}}]
+    assert request["insertTable"]["location"] == {"index": 10, "tabId": "t.0"}
+
+
+def test_stored_plan_rebases_onto_other_tab_and_index():
+    state = _state("t.0", "t.1")
+    state.plan = [{"insertText": {"location": {"index": 3, "tabId": "t.0"}, "text": "ab"}},
+                  {"updateTextStyle": {"range": {"startIndex": 3, "endIndex": 5,
+                                                 "tabId": "t.0"},
+                                       "textStyle": {"link": {"tabId": "t.1"}},
+                                       "fields": "link"}}]
+    state.deferred_links = [(3, 5, "#notes")]
+    state.index = 5
+    md2gdoc.store_plan("k", state, base=3)
+
+    target = _state("t.5", "t.6")
+    target.index = 40
+    target.sender = _Sink()
+    assert md2gdoc.load_plan("k", target)
+
+    assert target.sender.sent == md2gdoc._relocate(state.plan, 37, {"t.0": "t.5", "t.1": "t.6"})
+    assert target.deferred_links == [(40, 42, "#notes")]
+    assert target.index == 42
+    assert not md2gdoc.load_plan("missing", target)
+
+
+def test_cached_plan_writes_the_same_tab(emulator, tmp_path, capsys):
+    path = tmp_path / "notes.md"
+    path.write_text(BODY, encoding="utf-8")
+
+    emulator.docs[DOC_ID] = load_document(_doc("t.0", "t.1"))
+    built = _state("t.0", "t.1")
+    md2gdoc.build_tab(path, built)
+    first = md2gdoc._find_tab(emulator.document(DOC_ID)["tabs"], "t.0")
+
+    emulator.docs[DOC_ID] = load_document(_doc("t.4", "t.3"))
+    cached = _state("t.4", "t.3")
+    calls = emulator.stats.calls["documents.batchUpdate"]
+    md2gdoc.build_tab(path, cached)
+    second = md2gdoc._find_tab(emulator.document(DOC_ID)["tabs"], "t.4")
+
+    assert "Reusing cached request plan" in capsys.readouterr().err
+    assert emulator.stats.calls["documents.batchUpdate"] > calls
+    assert cached.index == built.index
+    assert cached.deferred_links == built.deferred_links
+    # Heading ids are minted by the document, so they are the one difference
+    assert _without_heading_ids(second["documentTab"]) == _without_heading_ids(
+        md2gdoc._relocate(first["documentTab"], 0, {"t.0": "t.4", "t.1": "t.3"}))
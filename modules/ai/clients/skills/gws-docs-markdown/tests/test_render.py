@@ -0,0 +1,99 @@
+"""Rendering a live tab as markdown: streamed chunks and the source map."""
+
+from __future__ import annotations
+
+import io
+
+import md2gdoc
+from conftest import TAB_ID, extract, read, render
+
+BODY = """# Title \U0001F600
+
+Some **bold**, *italic*, ~~gone~~, `code` and [a link](https://example.com/x).
+
+## Section
+
+- one
+- two **\U0001F680**
+
+| A | B |
+| --- | --- |
+| \U0001F600 | **x** |
+
+Tail.
+"""
+
+EXTRACTED = """# Title \U0001F600
+
+Some **bold**, *italic*, ~~gone~~, `code` and [a link](https://example.com/x).
+
+## Section
+
+- one
+- two **\U0001F680**
+| A | B |
+| :--- | :--- |
+| \U0001F600 | **x** |
+
+Tail.
+
+"""
+
+
+def _paragraphs(doc: dict) -> dict[int, tuple[int, str]]:
+    """startIndex -> (endIndex, text) for every paragraph of the tab, cells included."""
+    out: dict[int, tuple[int, str]] = {}
+
+    def walk(content: list[dict]) -> None:
+        for el in content:
+            if "paragraph" in el:
+                out[el["startIndex"]] = (el["endIndex"], "".join(
+                    r["textRun"]["content"] for r in el["paragraph"]["elements"]
+                    if "textRun" in r))
+            for row in el.get("table", {}).get("tableRows", []):
+                for cell in row["tableCells"]:
+                    walk(cell["content"])
+
+    walk(md2gdoc._find_tab(doc["tabs"], TAB_ID)["documentTab"]["body"]["content"])
+    return out
+
+
+def test_extracted_markdown():
+    assert extract(render(BODY))[0] == EXTRACTED
+
+
+def test_streamed_chunks_are_the_whole_tab():
+    doc = read(render(BODY))
+    chunks = list(md2gdoc.iter_tab_markdown(doc, TAB_ID))
+    sink = io.StringIO()
+    md2gdoc.write_tab_markdown(sink, doc, TAB_ID)
+
+    assert len(chunks) > 1
+    assert sink.getvalue() == "".join(chunks) == (
+        "# Title \U0001F600\n"
+        "Some **bold**, *italic*, ~~gone~~, `code` and [a link](https://example.com/x).\n"
+        "## Section\n- one\n- two **\U0001F680**\n"
+        "| A | B |\n| :--- | :--- |\n| \U0001F600 | **x** |\n\nTail.")
+
+
+def test_source_map_points_at_the_document():
+    doc = render(BODY)
+    md, spans = extract(doc)
+    data = md.encode("utf-8")
+    paragraphs = _paragraphs(doc)
+
+    assert [s.md_start for s in spans][1:] == [s.md_end for s in spans][:-1]
+    assert spans[-1].md_end == len(data)
+    for span in spans:
+        if span.synthetic:
+            assert span.api_start is None
+            continue
+        end, text = paragraphs[span.api_start]
+        assert span.api_end == end
+        plain = text.rstrip("\n")
+        assert md2gdoc.utf16_len(plain) + 1 == end - span.api_start
+        if span.kind == "cell":
+            assert span.raw_text == plain
+        else:
+            rendered = data[span.md_start:span.md_end].decode()
+            assert rendered.strip().lstrip("#- ").startswith(plain[:4])
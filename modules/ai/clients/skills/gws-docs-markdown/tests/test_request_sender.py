@@ -0,0 +1,86 @@
+"""RequestSender: submission order and the partial batch carried across windows."""
+
+from __future__ import annotations
+
+import pytest
+
+import md2gdoc
+from conftest import BLANK, DOC_ID, TAB_ID, extract, render
+from gdocs_emulator import load_document
+
+
+def _requests(start: int, stop: int) -> list[dict]:
+    return [{"insertText": {"endOfSegmentLocation": {"tabId": "t.0"}, "text": str(i)}}
+            for i in range(start, stop)]
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """The batches RequestSender sends, with the scheduler cut at 3 requests."""
+    batches: list[list[str]] = []
+
+    def batch_update(doc_id, requests, pin=False, encoded=None, revision=None):
+        batches.append([r["insertText"]["text"] for r in requests])
+        return {}
+
+    monkeypatch.setattr(md2gdoc, "batch_update", batch_update)
+    monkeypatch.setattr(md2gdoc._SCHEDULER, "max_requests", 3)
+    return batches
+
+
+def _texts(start: int, stop: int) -> list[str]:
+    return [str(i) for i in range(start, stop)]
+
+
+def test_windows_are_packed_across_boundaries(sent):
+    with md2gdoc.RequestSender("doc") as sender:
+        for window in (_requests(0, 5), _requests(5, 7), _requests(7, 10)):
+            sender.submit(window)
+
+    assert sent == [_texts(0, 3), _texts(3, 6), _texts(6, 9), _texts(9, 10)]
+
+
+def test_drain_sends_the_carried_batch(sent):
+    with md2gdoc.RequestSender("doc") as sender:
+        sender.submit(_requests(0, 4))
+        sender.drain()
+        assert sent == [_texts(0, 3), _texts(3, 4)]
+        sender.submit(_requests(4, 5))
+
+    assert sent[-1] == ["4"]
+
+
+def test_sender_failure_surfaces_in_the_builder(monkeypatch, sent):
+    def failing(doc_id, requests, pin=False, encoded=None, revision=None):
+        raise md2gdoc.DocsApiError(400, "400: bad request")
+
+    monkeypatch.setattr(md2gdoc, "batch_update", failing)
+    sender = md2gdoc.RequestSender("doc")
+    sender.submit(_requests(0, 6))
+    with pytest.raises(md2gdoc.DocsApiError):
+        sender.drain()
+    with pytest.raises(md2gdoc.DocsApiError):
+        sender.submit(_requests(6, 7))
+    sender.__exit__(md2gdoc.DocsApiError, None, None)
+
+
+def test_streamed_build_matches_one_batch(emulator, monkeypatch):
+    """Windows cut mid-tab, with small batches, still land in order."""
+    monkeypatch.setattr(md2gdoc._SCHEDULER, "max_requests", 7)
+    monkeypatch.setattr(md2gdoc, "STREAM_WINDOW_REQUESTS", 20)
+    submitted: list[int] = []
+    submit = md2gdoc.RequestSender.submit
+    monkeypatch.setattr(md2gdoc.RequestSender, "submit",
+                        lambda self, window: (submitted.append(len(window)), submit(self, window)))
+    body = "".join(f"## Part {i}\n\nSome **bold** \U0001F600 text {i}.\n\n- a\n- b\n\n"
+                   for i in range(12))
+    emulator.docs[DOC_ID] = load_document(BLANK)
+    with md2gdoc.RequestSender(DOC_ID) as sender:
+        state = md2gdoc.BuildState(tab_id=TAB_ID, doc_id=DOC_ID, fresh_tab=True,
+                                   sender=sender)
+        md2gdoc.build_requests_from_text(body, state)
+        md2gdoc._flush_requests(state)
+
+    assert len(submitted) > 1
+    assert emulator.stats.calls["documents.batchUpdate"] == -(-sum(submitted) // 7)
+    assert extract(emulator.document(DOC_ID))[0] == extract(render(body))[0]
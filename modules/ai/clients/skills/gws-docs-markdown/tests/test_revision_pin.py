@@ -0,0 +1,44 @@
+"""Writes pinned to a cached revision: retried unpinned only when stale."""
+
+from __future__ import annotations
+
+import pytest
+
+import md2gdoc
+from conftest import DOC_ID, TAB_ID, apply, load
+
+
+def _insert(index: int, text: str) -> dict:
+    return {"insertText": {"location": {"index": index, "segmentId": "", "tabId": TAB_ID},
+                           "text": text}}
+
+
+def _writes(emulator) -> int:
+    return emulator.stats.calls.get("documents.batchUpdate", 0)
+
+
+@pytest.fixture
+def cached(emulator):
+    """A document whose read is in the snapshot cache."""
+    load(emulator, "Body text.\n")
+    md2gdoc._SNAPSHOTS.invalidate(DOC_ID)
+    md2gdoc.get_document(DOC_ID)
+    yield emulator
+    md2gdoc._SNAPSHOTS.invalidate(DOC_ID)
+
+
+def test_stale_pin_is_retried_unpinned(cached):
+    apply(cached, [_insert(1, "Moved. ")])
+    before = _writes(cached)
+    md2gdoc.batch_update(DOC_ID, [_insert(1, "Hello ")], pin=True)
+
+    assert _writes(cached) - before == 2
+    assert "Hello Moved. Body" in md2gdoc.json.dumps(cached.document(DOC_ID))
+
+
+def test_invalid_pinned_write_is_sent_once(cached):
+    before = _writes(cached)
+    with pytest.raises(SystemExit):
+        md2gdoc.batch_update(DOC_ID, [_insert(10_000, "nowhere")], pin=True)
+
+    assert _writes(cached) - before == 1
@@ -0,0 +1,52 @@
+"""In-place edits are computed on rendered runs and applied at API offsets."""
+
+from __future__ import annotations
+
+import md2gdoc
+from conftest import DOC_ID, TAB_ID, apply, bound_segments, extract, load, render
+
+
+def _edit(emulator, old_body: str, new_body: str) -> list:
+    """Apply update-tab's edits for *old_body* -> *new_body*; return the matches."""
+    live = load(emulator, old_body)
+    expected = render(new_body)
+    matches = md2gdoc.align_segments(bound_segments(live), bound_segments(expected))
+    apply(emulator, md2gdoc.collect_update_requests(matches, TAB_ID))
+    return matches
+
+
+def test_diff_segment_runs_offsets_are_utf16():
+    old = [("a \U0001F600 b", {}), (" bold", {"bold": True})]
+    new = [("a \U0001F600 c", {}), (" bold", {"bold": True})]
+    (edit,) = md2gdoc.diff_segment_runs(old, new)
+    # The emoji is two UTF-16 units, so "b" starts at 5, not 4
+    assert (edit.start, edit.end, edit.new_text) == (5, 6, "c")
+    assert edit.runs == [("c", {})]
+
+
+def test_diff_segment_runs_sees_style_changes():
+    (edit,) = md2gdoc.diff_segment_runs([("one two", {})],
+                                        [("one ", {}), ("two", {"italic": True})])
+    assert edit.new_text == "two"
+    assert edit.runs == [("two", {"italic": True})]
+
+
+def test_styled_paragraph_edit(emulator):
+    old_body = ("Intro with **bold words** and \U0001F600 emoji, a [link](https://example.com/a)"
+                " and a `code` span before the tail.\n")
+    new_body = ("Intro with **bold words** and \U0001F600 emoji, a [link](https://example.com/a)"
+                " and a `code` span before the *revised* tail.\n")
+    matches = _edit(emulator, old_body, new_body)
+
+    assert [m.kind for m in matches] == ["matched"]
+    assert all(e.runs is not None for e in matches[0].edits)
+    assert extract(emulator.document(DOC_ID))[0] == extract(render(new_body))[0]
+
+
+def test_edit_in_heading_keeps_heading(emulator):
+    matches = _edit(emulator, "# Release \U0001F680 notes for spring\n\nBody.\n",
+                    "# Release \U0001F680 notes for summer\n\nBody.\n")
+
+    assert [m.kind for m in matches] == ["matched"]
+    md, _ = extract(emulator.document(DOC_ID))
+    assert md.splitlines()[0] == "# Release \U0001F680 notes for summer"
@@ -0,0 +1,73 @@
+"""SourceMap lookups by markdown offset and by cell, and the segments bound to them."""
+
+from __future__ import annotations
+
+import md2gdoc
+from conftest import extract, render
+
+BODY = """# Café \U0001F600 notes
+
+Intro with **bold** and \U0001F680 rockets.
+
+- one é
+- two
+
+| Name | Emoji |
+| --- | --- |
+| Année | \U0001F600\U0001F600 |
+| Bob | plain |
+
+Tail.
+"""
+
+
+def _linear_find(spans: md2gdoc.SourceMap, offset: int) -> md2gdoc.SourceSpan | None:
+    for span in spans:
+        if span.md_start <= offset < span.md_end:
+            return None if span.synthetic else span
+    return None
+
+
+def test_find_at_agrees_with_a_linear_scan():
+    md, spans = extract(render(BODY))
+    size = len(md.encode("utf-8"))
+
+    assert len(spans) > 10
+    for offset in range(-1, size + 2):
+        assert spans.find_at(offset) == _linear_find(spans, offset), offset
+
+
+def test_find_cell_returns_each_cell():
+    md, spans = extract(render(BODY))
+    data = md.encode("utf-8")
+    cells = {(int(s.path[1]), int(s.path[3]), int(s.path[5])): s
+             for s in spans if s.kind == "cell"}
+
+    assert len(cells) == 6
+    for (table, row, col), span in cells.items():
+        assert spans.find_cell(table, row, col) == span
+    assert data[cells[0, 1, 0].md_start:cells[0, 1, 0].md_end].decode() == "Année"
+    assert cells[0, 1, 1].raw_text == "\U0001F600\U0001F600"
+    assert spans.find_cell(0, 3, 0) is None
+    assert spans.find_cell(1, 0, 0) is None
+
+
+def test_segments_bind_to_the_span_at_their_offset():
+    md, spans = extract(render(BODY))
+    data = md.encode("utf-8")
+    segments = md2gdoc.parse_to_segments(md, spans)
+    flat = [c for seg in segments for c in (seg.children or [seg])]
+
+    assert {seg.kind for seg in flat} >= {"heading", "paragraph", "list-item", "cell"}
+    for seg in flat:
+        assert seg.span is not None, seg
+        assert seg.text in data[seg.span.md_start:seg.span.md_end].decode()
+        if seg.kind == "cell":
+            # Cell offsets are approximate; cells are found by position
+            assert seg.span.path == seg.path
+        else:
+            assert seg.span.md_start <= seg.md_start < seg.span.md_end
+    # API ranges are UTF-16 units: the heading's two emoji halves count twice
+    (heading,) = [seg for seg in flat if seg.kind == "heading"]
+    assert heading.span.api_end - heading.span.api_start == \
+        md2gdoc.utf16_len("Café \U0001F600 notes\n")
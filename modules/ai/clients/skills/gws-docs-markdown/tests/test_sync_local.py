@@ -0,0 +1,56 @@
+"""sync-local replaces a file's body with its tab, but not over unpushed local edits."""
+
+from __future__ import annotations
+
+import md2gdoc
+from conftest import DOC_ID, TAB_ID, read, render
+
+PUSHED = "# Notes\n\nFirst version.\n"
+REMOTE = "# Notes\n\nEdited in the doc.\n"
+
+
+def _file(tmp_path, body: str, pushed: str):
+    path = tmp_path / "notes.md"
+    path.write_text(
+        "---\ntitle: Notes\n"
+        f"gdoc_url: https://docs.google.com/document/d/{DOC_ID}/edit\n"
+        f"gdoc_tab_id: {TAB_ID}\n"
+        f"gdoc_pushed_hash: {md2gdoc._hash_body(pushed)}\n---\n" + body,
+        encoding="utf-8")
+    return path
+
+
+def _sync(path, body: str, force: bool = False) -> tuple[bool, str]:
+    return md2gdoc._sync_local_file(read(render(body)), TAB_ID, path, None, force)
+
+
+def test_pull_replaces_the_body_and_records_it(tmp_path):
+    path = _file(tmp_path, PUSHED, PUSHED)
+    ok, message = _sync(path, REMOTE)
+
+    assert (ok, message) == (True, "Sync complete")
+    fm, body = md2gdoc._load_frontmatter(path.read_text(encoding="utf-8"))
+    assert "Edited in the doc." in body and "First version." not in body
+    assert fm["title"] == "Notes"
+    assert fm["gdoc_pushed_hash"] == md2gdoc._hash_body(body)
+    # The recorded hash lets the next pull through
+    assert _sync(path, REMOTE.replace("doc.", "doc again."))[0]
+
+
+def test_unpushed_local_edits_are_not_overwritten(tmp_path):
+    local = PUSHED.replace("First version.", "Local edit.")
+    path = _file(tmp_path, local, PUSHED)
+    before = path.read_text(encoding="utf-8")
+    ok, message = _sync(path, REMOTE)
+
+    assert not ok
+    assert "--force" in message
+    assert path.read_text(encoding="utf-8") == before
+
+
+def test_force_replaces_unpushed_local_edits(tmp_path):
+    path = _file(tmp_path, PUSHED.replace("First version.", "Local edit."), PUSHED)
+    ok, _ = _sync(path, REMOTE, force=True)
+
+    assert ok
+    assert "Edited in the doc." in path.read_text(encoding="utf-8")
@@ -0,0 +1,42 @@
+"""Predicted table cell indices against the emulator's real layout."""
+
+from __future__ import annotations
+
+import pytest
+
+import md2gdoc
+from conftest import DOC_ID, TAB_ID, apply, load, render
+
+
+def _tables(doc: dict) -> list[dict]:
+    tab = md2gdoc._find_tab(doc["tabs"], TAB_ID)
+    return [el for el in tab["documentTab"]["body"]["content"] if "table" in el]
+
+
+@pytest.mark.parametrize("rows, cols", [(1, 1), (2, 3), (12, 9)])
+def test_table_layout_matches_inserted_table(emulator, rows, cols):
+    load(emulator, "Before.\n")
+    apply(emulator, [{"insertTable": {"rows": rows, "columns": cols, "endOfSegmentLocation": {
+        "segmentId": "", "tabId": TAB_ID}}}])
+    (table,) = _tables(emulator.document(DOC_ID))
+
+    starts, end = md2gdoc._table_layout(table["startIndex"], rows, cols)
+    cells = [cell["content"][0]["startIndex"]
+             for row in table["table"]["tableRows"] for cell in row["tableCells"]]
+    assert starts == cells
+    assert end == table["endIndex"]
+
+
+def test_large_table_cells_get_their_own_text():
+    rows, cols = 15, 10
+    header = "| " + " | ".join(f"h{c}" for c in range(cols)) + " |\n"
+    sep = "|" + " --- |" * cols + "\n"
+    body = "".join("| " + " | ".join(f"r{r}c{c} \U0001F600" for c in range(cols)) + " |\n"
+                   for r in range(rows - 1))
+    (table,) = _tables(render("Intro.\n\n" + header + sep + body + "\nAfter.\n"))
+
+    texts = [[md2gdoc._paragraph_text_from_api(cell["content"][0]["paragraph"]).rstrip("\n")
+              for cell in row["tableCells"]] for row in table["table"]["tableRows"]]
+    assert texts[0] == [f"h{c}" for c in range(cols)]
+    for r in range(1, rows):
+        assert texts[r] == [f"r{r - 1}c{c} \U0001F600" for c in range(cols)]
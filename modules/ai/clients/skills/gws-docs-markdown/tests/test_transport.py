@@ -0,0 +1,58 @@
+"""Transport error classification: which failures are retried as quota errors."""
+
+from __future__ import annotations
+
+import subprocess
+
+import pytest
+
+import md2gdoc
+
+
+def _gws_fails(monkeypatch, stderr: str) -> None:
+    def run(cmd, **kwargs):
+        return subprocess.CompletedProcess(cmd, 1, stdout="", stderr=stderr)
+    monkeypatch.setattr(md2gdoc.subprocess, "run", run)
+
+
+@pytest.mark.parametrize("stderr", [
+    "HTTP 429 Too Many Requests",
+    '{"error": {"status": "RESOURCE_EXHAUSTED"}}',
+    "reason: rateLimitExceeded",
+    "reason: userRateLimitExceeded",
+])
+def test_gws_quota_errors_are_rate_limits(monkeypatch, stderr):
+    _gws_fails(monkeypatch, stderr)
+    with pytest.raises(md2gdoc.RateLimitError):
+        md2gdoc.GwsCliClient().call("documents.get", {"documentId": "d"})
+
+
+@pytest.mark.parametrize("stderr", [
+    "400: could not generate the request",
+    "400: separate tabs must have unique titles",
+    "404: Requested entity was not found. Make sure the id is accurate",
+])
+def test_gws_other_errors_are_not_retried(monkeypatch, stderr):
+    _gws_fails(monkeypatch, stderr)
+    with pytest.raises(md2gdoc.DocsApiError) as info:
+        md2gdoc.GwsCliClient().call("documents.get", {"documentId": "d"})
+    assert not isinstance(info.value, md2gdoc.RateLimitError)
+    assert info.value.status == int(stderr[:3])
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("7", 7.0),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),
+    ("soon", None),
+    (None, None),
+])
+def test_retry_after_header(header, expected):
+    headers = {"retry-after": header} if header is not None else {}
+    with pytest.raises(md2gdoc.RateLimitError) as info:
+        md2gdoc._decode_response(429, headers, b'{"error": {"message": "quota"}}')
+    assert info.value.retry_after == expected
+
+
+def test_retry_after_future_date(monkeypatch):
+    monkeypatch.setattr(md2gdoc.time, "time", lambda: 1445412470.0)
+    assert md2gdoc._parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 10.0
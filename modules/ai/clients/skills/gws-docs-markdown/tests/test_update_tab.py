@@ -0,0 +1,117 @@
+"""update_tab and edits_to_requests, applied to the emulator."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+import md2gdoc
+from conftest import DOC_ID, TAB_ID, apply, bound_segments, extract, load, render
+
+BASE = """# Runbook
+
+Deploys go out every **Tuesday** after the [review](https://example.com/review).
+
+## Steps
+
+- Freeze the branch
+- Run the checks
+- Tag the release
+
+| Step | Owner |
+| --- | --- |
+| Freeze | Alice |
+| Tag | Bob |
+
+```
+make release
+```
+
+See [[#steps|the steps]] before starting.
+"""
+
+
+def _update(emulator, old_body: str, new_body: str, verify: bool = False) -> tuple[bool, str]:
+    doc = load(emulator, old_body)
+    ok, message, _ = asyncio.run(md2gdoc.update_tab(
+        md2gdoc.AsyncDocsClient(), doc, TAB_ID, new_body, [], verify))
+    return ok, message
+
+
+def _assert_tab_is(emulator, body: str) -> None:
+    live = emulator.document(DOC_ID)
+    expected = render(body)
+    assert extract(live)[0] == extract(expected)[0]
+    assert md2gdoc._cell_texts(live, TAB_ID) == md2gdoc._cell_texts(expected, TAB_ID)
+
+
+@pytest.mark.parametrize("new_body", [
+    BASE.replace("every **Tuesday**", "every **Wednesday**"),
+    BASE.replace("- Run the checks\n", "- Run the checks\n- Write the notes\n"),
+    BASE.replace("- Run the checks\n", ""),
+    BASE.replace("| Tag | Bob |", "| Tag | Carol |"),
+    BASE.replace("make release", "make release\nmake publish"),
+    BASE.replace("## Steps\n", "## Steps\n\nFollow these in order.\n"),
+    BASE + "\n## Rollback\n\nRevert the tag, see [[#rollback|rollback]].\n",
+    BASE.replace("# Runbook\n\n", ""),
+], ids=["bold-word", "list-insert", "list-delete", "cell", "code", "paragraph-insert",
+        "new-heading-link", "first-block-delete"])
+def test_update_tab_reaches_the_local_file(emulator, new_body):
+    ok, message = _update(emulator, BASE, new_body)
+
+    assert ok, message
+    _assert_tab_is(emulator, new_body)
+
+
+def test_update_tab_verified_against_a_fresh_read(emulator):
+    new_body = BASE.replace("Alice", "Dana")
+    ok, message = _update(emulator, BASE, new_body, verify=True)
+
+    assert ok, message
+    _assert_tab_is(emulator, new_body)
+
+
+def test_update_tab_in_sync_sends_nothing(emulator):
+    doc = load(emulator, BASE)
+    writes = emulator.stats.calls.get("documents.batchUpdate", 0)
+    ok, message, _ = asyncio.run(md2gdoc.update_tab(
+        md2gdoc.AsyncDocsClient(), doc, TAB_ID, BASE, []))
+
+    assert (ok, message) == (True, "Already in sync")
+    assert emulator.stats.calls.get("documents.batchUpdate", 0) == writes
+
+
+def test_edits_to_requests_rewrites_a_cell(emulator):
+    live = load(emulator, BASE)
+    new_body = BASE.replace("| Freeze | Alice |", "| Freeze | Alice and Eve |")
+    matches = md2gdoc.align_segments(bound_segments(live), bound_segments(render(new_body)))
+    (cell,) = [m for m in matches if m.edits]
+    assert cell.old_segment.kind == "cell"
+
+    apply(emulator, md2gdoc.edits_to_requests(cell, TAB_ID))
+    _assert_tab_is(emulator, new_body)
+
+
+def test_deleted_segment_removes_its_block(emulator):
+    live = load(emulator, BASE)
+    new_body = BASE.replace("Deploys go out every **Tuesday** after the "
+                            "[review](https://example.com/review).\n\n", "")
+    matches = md2gdoc.align_segments(bound_segments(live), bound_segments(render(new_body)))
+    (deleted,) = [m for m in matches if m.kind == "deleted"]
+
+    apply(emulator, md2gdoc.edits_to_requests(deleted, TAB_ID))
+    _assert_tab_is(emulator, new_body)
+
+
+def test_update_tab_stops_when_the_doc_moved(emulator, capsys):
+    doc = load(emulator, BASE)
+    apply(emulator, [{"insertText": {"location": {"index": 1, "tabId": TAB_ID},
+                                     "text": "Edited elsewhere. "}}])
+    moved = emulator.document(DOC_ID)
+    with pytest.raises(SystemExit):
+        asyncio.run(md2gdoc.update_tab(md2gdoc.AsyncDocsClient(), doc, TAB_ID,
+                                       BASE.replace("Alice", "Dana"), []))
+
+    assert "the document changed since it was read" in capsys.readouterr().err
+    assert emulator.document(DOC_ID) == moved
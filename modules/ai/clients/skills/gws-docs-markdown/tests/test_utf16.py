@@ -0,0 +1,48 @@
+"""UTF-16 index arithmetic: astral characters count as two Docs index units."""
+
+from __future__ import annotations
+
+import pytest
+
+import md2gdoc
+from conftest import TAB_ID, load
+
+SAMPLES = ["", "plain ascii", "café ü", "\U0001F600", "a\U0001F600b\U0001F680c",
+           "\U0001F468‍\U0001F469‍\U0001F467", "\U00010348 gothic \U0001D11E clef",
+           "퟿￿"]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_utf16_len_matches_encoding(text):
+    assert md2gdoc.utf16_len(text) == len(text.encode("utf-16-le")) // 2
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_utf16_offsets_match_encoding(text):
+    offsets = md2gdoc.Utf16Offsets(text)
+    for i in range(len(text) + 1):
+        assert offsets(i) == len(text[:i].encode("utf-16-le")) // 2
+
+
+def _runs(doc: dict) -> list[tuple[str, dict]]:
+    tab = md2gdoc._find_tab(doc["tabs"], TAB_ID)
+    return [(el["textRun"]["content"], el["textRun"].get("textStyle", {}))
+            for block in tab["documentTab"]["body"]["content"] if "paragraph" in block
+            for el in block["paragraph"]["elements"] if "textRun" in el]
+
+
+def test_styles_after_astral_text_land_on_their_words(emulator):
+    """Each style starts at the right index however many astral characters precede it."""
+    doc = load(emulator, "\U0001F600\U0001F600 lead **bold** \U0001F680 *ital* ~~gone~~ "
+                         "`code` [link](https://example.com) \U0001F600 tail\n")
+    styled = {text: style for text, style in _runs(doc)}
+
+    assert styled["bold"].get("bold") is True
+    assert styled["ital"].get("italic") is True
+    assert styled["gone"].get("strikethrough") is True
+    assert styled["code"]["weightedFontFamily"]["fontFamily"] == "Courier New"
+    assert styled["link"]["link"]["url"] == "https://example.com"
+    for text, style in _runs(doc):
+        if text.strip() not in ("bold", "ital", "gone", "code", "link"):
+            assert not any(style.get(k) for k in md2gdoc._RESET_FIELDS), text
+            assert "link" not in style and "weightedFontFamily" not in style, text